@@ -9,7 +9,12 @@
 #
 
 import argparse
+import atexit
+import concurrent.futures
 import copy
+import functools
+import hashlib
+import json
 import os
 import pathlib
 import platform
@@ -121,7 +126,77 @@ def try_compile(compiler, source='', flags=[]):
     return try_compile_and_link(compiler, source, flags=flags + ['-c'])
 
 
+# Compiler probes are independent of each other and of the rest of configure.py,
+# so they are run concurrently and their results are kept in the build directory
+probe_executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+@functools.cache
+def compiler_identity(compiler):
+    path = os.path.realpath(which(compiler) or compiler)
+    try:
+        st = os.stat(path)
+        version = subprocess.run([compiler, '--version'], capture_output=True).stdout.decode('utf-8', 'replace')
+    except OSError:
+        return path
+    return f'{path}:{st.st_size}:{st.st_mtime_ns}:{version}'
+
+
+class ProbeCache:
+    """Results of the compiler probes, by the compiler, its version, the flags and the source"""
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        self.changed = False
+        try:
+            with open(path) as f:
+                self.results = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(compiler, source, flags):
+        h = hashlib.sha256()
+        for part in [compiler_identity(compiler), args.user_cflags, *flags, source]:
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def put(self, key, result):
+        self.results[key] = result
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.results, f)
+        os.replace(tmp, self.path)
+
+
+compiler_probe_cache = None
+
+
 def try_compile_and_link(compiler, source='', flags=[], verbose=False):
+    if verbose or compiler_probe_cache is None:
+        return run_compiler_probe(compiler, source, flags, verbose)
+    key = compiler_probe_cache.key(compiler, source, flags)
+    result = compiler_probe_cache.get(key)
+    if result is None:
+        result = run_compiler_probe(compiler, source, flags)
+        # A failure to compile a source including headers may be fixed by installing
+        # them, it's probed again next time
+        if result or '#include' not in source:
+            compiler_probe_cache.put(key, result)
+    return result
+
+
+def run_compiler_probe(compiler, source='', flags=[], verbose=False):
     os.makedirs(tempfile.tempdir, exist_ok=True)
     with tempfile.NamedTemporaryFile() as sfile:
         ofd, ofile = tempfile.mkstemp()
@@ -149,17 +224,25 @@ def flag_supported(flag, compiler):
     return try_compile(flags=['-Werror'] + split, compiler=compiler)
 
 
+def supported_flags(flags, compiler):
+    """Returns the flags which the compiler supports, probing them concurrently"""
+    supported = probe_executor.map(lambda flag: flag_supported(flag=flag, compiler=compiler), flags)
+    return [flag for flag, ok in zip(flags, supported) if ok]
+
+
 def linker_flags(compiler):
     src_main = 'int main(int argc, char **argv) { return 0; }'
+    threads_flag = '-Wl,--threads'
+    lld, gold, gold_threads = [probe_executor.submit(try_compile_and_link, source=src_main, flags=link_flags, compiler=compiler)
+                               for link_flags in [['-fuse-ld=lld'], ['-fuse-ld=gold'], ['-fuse-ld=gold', threads_flag]]]
     link_flags = ['-fuse-ld=lld']
-    if try_compile_and_link(source=src_main, flags=link_flags, compiler=compiler):
+    if lld.result():
         print('Note: using the lld linker')
         return ' '.join(link_flags)
     link_flags = ['-fuse-ld=gold']
-    if try_compile_and_link(source=src_main, flags=link_flags, compiler=compiler):
+    if gold.result():
         print('Note: using the gold linker')
-        threads_flag = '-Wl,--threads'
-        if try_compile_and_link(source=src_main, flags=link_flags + [threads_flag], compiler=compiler):
+        if gold_threads.result():
             link_flags.append(threads_flag)
         return ' '.join(link_flags)
     else:
@@ -254,7 +337,7 @@ def find_headers(repodir, excluded_dirs):
     return sorted(headers)
 
 
-def generate_compdb(compdb, ninja, buildfile, modes):
+def generate_compdb(compdb, ninja, buildfile, modes, changed_modes):
     # per-mode compdbs are built by taking the relevant entries from the
     # output of "ninja -t compdb" and combining them with the CMake-made
     # compdbs for Seastar in the relevant mode.
@@ -264,17 +347,35 @@ def generate_compdb(compdb, ninja, buildfile, modes):
     #   the same source file usually confuse indexers
     # - it contains lots of irrelevant entries (for linker invocations,
     #   header-only compilations, etc.)
+    #
+    # The compdb of a mode is only rebuilt if the build statements of the
+    # mode or the compdbs of its submodules changed since it was built.
+    def outdated(mode):
+        mode_out = outdir + '/' + mode
+        try:
+            mtime = os.path.getmtime(mode_out + '/' + compdb)
+        except OSError:
+            return True
+        return mode in changed_modes or any(os.path.getmtime(f) > mtime
+                                            for f in submodule_compdbs(mode) if os.path.exists(f))
+
+    def submodule_compdbs(mode):
+        return [outdir + '/' + mode + '/' + submodule + '/' + compdb for submodule in ['seastar', 'abseil']]
+
+    modes = [mode for mode in modes if outdated(mode)]
     os.makedirs(tempfile.tempdir, exist_ok=True)
     with tempfile.NamedTemporaryFile() as ninja_compdb:
-        subprocess.run([ninja, '-f', buildfile, '-t', 'compdb'], stdout=ninja_compdb.file.fileno())
-        ninja_compdb.file.flush()
+        if modes:
+            # Only the compilations of the outdated modes
+            subprocess.run([ninja, '-f', buildfile, '-t', 'compdb'] + [f'cxx.{mode}' for mode in modes],
+                           stdout=ninja_compdb.file.fileno())
+            ninja_compdb.file.flush()
 
         # build mode-specific compdbs
         for mode in modes:
             mode_out = outdir + '/' + mode
-            submodule_compdbs = [mode_out + '/' + submodule + '/' + compdb for submodule in ['seastar', 'abseil']]
             with open(mode_out + '/' + compdb, 'w+b') as combined_mode_specific_compdb:
-                subprocess.run(['./scripts/merge-compdb.py', ninja_compdb.name + ':' + mode_out] + submodule_compdbs, 
+                subprocess.run(['./scripts/merge-compdb.py', ninja_compdb.name + ':' + mode_out] + submodule_compdbs(mode),
                                stdout=combined_mode_specific_compdb)
 
     # sort modes by supposed indexing speed
@@ -334,16 +435,19 @@ int main() { return 0; }
 
 def check_for_boost(cxx):
     pkg_name = pkgname("boost-devel")
-    if not try_compile(compiler=cxx, source='#include <boost/version.hpp>'):
-        print(f'Boost not installed.  Please install {pkg_name}.')
-        sys.exit(1)
-
-    if not try_compile(compiler=cxx, source='''\
+    installed, recent = probe_executor.map(lambda source: try_compile(compiler=cxx, source=source), [
+            '#include <boost/version.hpp>',
+            '''\
             #include <boost/version.hpp>
             #if BOOST_VERSION < 105500
             #error Boost version too low
             #endif
-            '''):
+            '''])
+    if not installed:
+        print(f'Boost not installed.  Please install {pkg_name}.')
+        sys.exit(1)
+
+    if not recent:
         print(f'Installed boost version too old.  Please update {pkg_name}.')
         sys.exit(1)
 
@@ -754,6 +858,8 @@ arg_parser.add_argument('--use-cmake', action=argparse.BooleanOptionalAction, de
 arg_parser.add_argument('--coverage', action = 'store_true', help = 'Compile scylla with coverage instrumentation')
 arg_parser.add_argument('--build-dir', action='store', default='build',
                         help='Build directory path')
+arg_parser.add_argument('--probe-cache', action=argparse.BooleanOptionalAction, default=True,
+                        help='Reuse the results of the compiler probes of the previous runs, kept in the build directory')
 arg_parser.add_argument('-h', '--help', action='store_true', help='show this help message and exit')
 args = arg_parser.parse_args()
 if args.help:
@@ -765,6 +871,10 @@ PROFILES_LIST_FILE_NAME = "coverage_sources.list"
 outdir = args.build_dir
 tempfile.tempdir = f"{outdir}/tmp"
 
+if args.probe_cache:
+    compiler_probe_cache = ProbeCache(f'{outdir}/probe-cache.json')
+    atexit.register(compiler_probe_cache.save)
+
 if args.list_artifacts:
     for artifact in sorted(all_artifacts):
         print(artifact)
@@ -1678,9 +1788,7 @@ def get_warning_options(cxx):
         '-Wno-enum-constexpr-conversion',
     ]
 
-    warnings = [w
-                for w in warnings
-                if flag_supported(flag=w, compiler=cxx)]
+    warnings = supported_flags(warnings, compiler=cxx)
 
     return ' '.join(warnings + ['-Wno-error=deprecated-declarations'])
 
@@ -2173,9 +2281,7 @@ def get_extra_cxxflags(mode, mode_config, cxx, debuginfo):
             # gcc also has some trouble: https://gcc.gnu.org/bugzilla/show_bug.cgi?id=103554
             '-fno-slp-vectorize',
         ]
-        optimization_flags = [o
-                              for o in optimization_flags
-                              if flag_supported(flag=o, compiler=cxx)]
+        optimization_flags = supported_flags(optimization_flags, compiler=cxx)
         cxxflags += optimization_flags
 
     if flag_supported(flag='-Wstack-usage=4096', compiler=cxx):
@@ -2218,6 +2324,393 @@ def pick_rustc_target(*candidates):
     raise RuntimeError("none of the specified target is supported by rustc")
 
 
+MODE_FINGERPRINT_PREFIX = 'configure.py fingerprint: '
+
+
+def mode_fingerprint(mode, arch, scylla_product, scylla_version, scylla_release, headers, args):
+    '''Hash of everything the build statements of the mode are generated from'''
+    h = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        h.update(f.read())
+    # The output file names differ between running configure.py by hand and by ninja, and
+    # the mode's own options are in modes[mode]; selecting another mode doesn't affect this one
+    ignored_args = ('buildfile', 'buildfile_final_name', 'selected_modes', 'mode_o_levels')
+    configure_args = {k: v for k, v in vars(args).items() if k not in ignored_args}
+    h.update(json.dumps([mode, modes[mode], configure_args, compiler_identity(args.cxx), user_cflags, libs, linker_flags,
+                         has_sanitize_address_use_after_scope, arch, scylla_product, scylla_version, scylla_release,
+                         headers], sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def read_mode_fingerprint(mode_buildfile):
+    try:
+        with open(mode_buildfile) as f:
+            line = f.readline()
+    except OSError:
+        return None
+    _, _, fingerprint = line.partition(MODE_FINGERPRINT_PREFIX)
+    return fingerprint.strip() or None
+
+
+def write_mode_build_file(f, mode, arch, scylla_product, scylla_version, scylla_release, headers, args):
+    modeval = modes[mode]
+
+    fmt_lib = 'fmt'
+    f.write(textwrap.dedent('''\
+        cxx_ld_flags_{mode} = {cxx_ld_flags}
+        ld_flags_{mode} = $cxx_ld_flags_{mode} {lib_ldflags}
+        cxxflags_{mode} = {lib_cflags} {cxxflags} -iquote. -iquote $builddir/{mode}/gen
+        libs_{mode} = -l{fmt_lib}
+        seastar_libs_{mode} = {seastar_libs}
+        seastar_testing_libs_{mode} = {seastar_testing_libs}
+        rule cxx.{mode}
+          command = $cxx -MD -MT $out -MF $out.d {seastar_cflags} $cxxflags_{mode} $cxxflags $obj_cxxflags -c -o $out $in
+          description = CXX $out
+          depfile = $out.d
+        rule link.{mode}
+          command = $cxx  $ld_flags_{mode} $ldflags -o $out $in $libs $libs_{mode}
+          description = LINK $out
+          pool = link_pool
+        rule link_stripped.{mode}
+          command = $cxx  $ld_flags_{mode} -s $ldflags -o $out $in $libs $libs_{mode}
+          description = LINK (stripped) $out
+          pool = link_pool
+        rule link_build.{mode}
+          command = $cxx  $ld_flags_{mode} $ldflags_build -o $out $in $libs $libs_{mode}
+          description = LINK (build) $out
+          pool = link_pool
+        rule ar.{mode}
+          command = rm -f $out; ar cr $out $in; ranlib $out
+          description = AR $out
+        rule antlr3.{mode}
+            # We replace many local `ExceptionBaseType* ex` variables with a single function-scope one.
+            # Because we add such a variable to every function, and because `ExceptionBaseType` is not a global
+            # name, we also add a global typedef to avoid compilation errors.
+            command = sed -e '/^#if 0/,/^#endif/d' $in > $builddir/{mode}/gen/$in $
+                 && {antlr3_exec} $builddir/{mode}/gen/$in $
+                 && sed -i -e '/^.*On :.*$$/d' $builddir/{mode}/gen/${{stem}}Lexer.hpp $
+                 && sed -i -e '/^.*On :.*$$/d' $builddir/{mode}/gen/${{stem}}Lexer.cpp $
+                 && sed -i -e '/^.*On :.*$$/d' $builddir/{mode}/gen/${{stem}}Parser.hpp $
+                 && sed -i -e 's/^\\( *\\)\\(ImplTraits::CommonTokenType\\* [a-zA-Z0-9_]* = NULL;\\)$$/\\1const \\2/' $
+                    -e '/^.*On :.*$$/d' $
+                    -e '1i using ExceptionBaseType = int;' $
+                    -e 's/^{{/{{ ExceptionBaseType\\* ex = nullptr;/; $
+                        s/ExceptionBaseType\\* ex = new/ex = new/; $
+                        s/exceptions::syntax_exception e/exceptions::syntax_exception\\& e/' $
+                    $builddir/{mode}/gen/${{stem}}Parser.cpp
+            description = ANTLR3 $in
+        rule checkhh.{mode}
+          command = $cxx -MD -MT $out -MF $out.d {seastar_cflags} $cxxflags $cxxflags_{mode} $obj_cxxflags --include $in -c -o $out $builddir/{mode}/gen/empty.cc
+          description = CHECKHH $in
+          depfile = $out.d
+        rule test.{mode}
+          command = ./test.py --mode={mode} --repeat={test_repeat} --timeout={test_timeout}
+          pool = console
+          description = TEST {mode}
+        # This rule is unused for PGO stages. They use the rust lib from the parent mode.
+        rule rust_lib.{mode}
+          command = CARGO_BUILD_DEP_INFO_BASEDIR='.' cargo build --locked --manifest-path=rust/Cargo.toml --target-dir=$builddir/{mode} --profile=rust-{mode} $
+                    && touch $out
+          description = RUST_LIB $out
+        ''').format(mode=mode, antlr3_exec=args.antlr3_exec, fmt_lib=fmt_lib, test_repeat=args.test_repeat, test_timeout=args.test_timeout, **modeval))
+    f.write(
+        'build {mode}-build: phony {artifacts} {wasms}\n'.format(
+            mode=mode,
+            artifacts=str.join(' ', ['$builddir/' + mode + '/' + x for x in sorted(build_artifacts - wasms)]),
+            wasms = str.join(' ', ['$builddir/' + x for x in sorted(build_artifacts & wasms)]),
+        )
+    )
+    if profile_recipe := modes[mode].get('profile_recipe'):
+        f.write(profile_recipe)
+    include_cxx_target = f'{mode}-build' if not args.dist_only else ''
+    include_dist_target = f'dist-{mode}' if args.enable_dist is None or args.enable_dist else ''
+    f.write(f'build {mode}: phony {include_cxx_target} {include_dist_target}\n')
+    compiles = {}
+    swaggers = set()
+    serializers = {}
+    ragels = {}
+    antlr3_grammars = set()
+    rust_headers = {}
+
+    # We want LTO, but with the regular LTO, clang generates special LLVM IR files instead of
+    # regular ELF objects after the compile phase, and these special LLVM bitcode can only be
+    # used for LTO builds. The cost of compiling all tests with LTO is prohibitively high, so
+    # we can't use these IR files for tests -- we need to compile regular ELF objects as well.
+    # Therefore, we build FatLTO objects, which contain LTO compatible IR and the regular
+    # object code. And we enable LTO when linking the main Scylla executable, while disable
+    # it when linking anything else.
+
+    seastar_lib_ext = 'so' if modeval['build_seastar_shared_libs'] else 'a'
+    for binary in sorted(build_artifacts):
+        if modeval['is_profile'] and binary != "scylla":
+            # Just to avoid clutter in build.ninja
+            continue
+        profile_dep = modes[mode].get('profile_target', "")
+
+        if binary in other or binary in wasms:
+            continue
+        srcs = deps[binary]
+        objs = ['$builddir/' + mode + '/' + src.replace('.cc', '.o')
+                for src in srcs
+                if src.endswith('.cc')]
+        has_rust = False
+        for dep in deps[binary]:
+            if isinstance(dep, Antlr3Grammar):
+                objs += dep.objects(f'$builddir/{mode}/gen')
+            if isinstance(dep, Json2Code):
+                objs += dep.objects(f'$builddir/{mode}/gen')
+            if dep.endswith('.rs'):
+                has_rust = True
+                idx = dep.rindex('/src/')
+                obj = dep[:idx].replace('rust/','') + '.o'
+                objs.append(f'$builddir/{mode}/gen/rust/{obj}')
+        if has_rust:
+            parent_mode = modes[mode].get('parent_mode', mode)
+            objs.append(f'$builddir/{parent_mode}/rust-{parent_mode}/librust_combined.a')
+        if binary in cpp_apps:
+            # binary only needs the C++ standard library, no additional
+            # libraries.
+            f.write('build $builddir/{}/{}: {}.{} {}\n'.format(mode, binary, regular_link_rule, mode, str.join(' ', objs)))
+            # In debug/sanitize modes, we compile with fsanitizers,
+            # so must use the same options during the link:
+            if '-DSANITIZE' in modes[mode]['cxxflags']:
+                f.write('   libs = -fsanitize=address -fsanitize=undefined\n')
+            else:
+                f.write('   libs =\n')
+            f.write(f'build $builddir/{mode}/{binary}.stripped: strip $builddir/{mode}/{binary}\n')
+            f.write(f'build $builddir/{mode}/{binary}.debug: phony $builddir/{mode}/{binary}.stripped\n')
+            for src in srcs:
+                obj = '$builddir/' + mode + '/' + src.replace('.cc', '.o')
+                compiles[obj] = src
+            continue
+
+        do_lto = modes[mode]['has_lto'] and binary in lto_binaries
+        seastar_dep = f'$builddir/{mode}/seastar/libseastar.{seastar_lib_ext}'
+        seastar_testing_dep = f'$builddir/{mode}/seastar/libseastar_testing.{seastar_lib_ext}'
+        abseil_dep = ' '.join(f'$builddir/{mode}/abseil/{lib}' for lib in abseil_libs)
+        seastar_testing_libs = f'$seastar_testing_libs_{mode}'
+
+        local_libs = f'$seastar_libs_{mode} $libs'
+        objs.extend([f'$builddir/{mode}/abseil/{lib}' for lib in abseil_libs])
+
+        if do_lto:
+            local_libs += ' -flto=thin -ffat-lto-objects'
+        else:
+            local_libs += ' -fno-lto'
+        if binary in tests:
+            if binary in pure_boost_tests:
+                local_libs += ' ' + maybe_static(args.staticboost, '-lboost_unit_test_framework')
+            if binary not in tests_not_using_seastar_test_framework:
+                local_libs += f' {seastar_testing_libs}'
+            else:
+                local_libs += ' ' + '-lgnutls' + ' ' + '-lboost_unit_test_framework'
+            # Our code's debugging information is huge, and multiplied
+            # by many tests yields ridiculous amounts of disk space.
+            # So we strip the tests by default; The user can very
+            # quickly re-link the test unstripped by adding a "_g"
+            # to the test name, e.g., "ninja build/release/testname_g"
+            link_rule = perf_tests_link_rule if binary.startswith('test/perf/') else tests_link_rule
+            f.write('build $builddir/{}/{}: {}.{} {} | {} {} {}\n'.format(mode, binary, link_rule, mode, str.join(' ', objs), seastar_dep, seastar_testing_dep, abseil_dep))
+            f.write('   libs = {}\n'.format(local_libs))
+            f.write('build $builddir/{}/{}_g: {}.{} {} | {} {} {}\n'.format(mode, binary, regular_link_rule, mode, str.join(' ', objs), seastar_dep, seastar_testing_dep, abseil_dep))
+            f.write('   libs = {}\n'.format(local_libs))
+        else:
+            if binary == 'scylla':
+                local_libs += f' {seastar_testing_libs}'
+            f.write('build $builddir/{}/{}: {}.{} {} | {} {} {}\n'.format(mode, binary, regular_link_rule, mode, str.join(' ', objs), seastar_dep, seastar_testing_dep, abseil_dep))
+            f.write('   libs = {}\n'.format(local_libs))
+            f.write(f'build $builddir/{mode}/{binary}.stripped: strip $builddir/{mode}/{binary}\n')
+            f.write(f'build $builddir/{mode}/{binary}.debug: phony $builddir/{mode}/{binary}.stripped\n')
+        for src in srcs:
+            if src.endswith('.cc'):
+                obj = '$builddir/' + mode + '/' + src.replace('.cc', '.o')
+                compiles[obj] = src
+            elif src.endswith('.idl.hh'):
+                hh = '$builddir/' + mode + '/gen/' + src.replace('.idl.hh', '.dist.hh')
+                serializers[hh] = src
+            elif src.endswith('.json'):
+                swaggers.add(src)
+            elif src.endswith('.rl'):
+                hh = '$builddir/' + mode + '/gen/' + src.replace('.rl', '.hh')
+                ragels[hh] = src
+            elif src.endswith('.g'):
+                antlr3_grammars.add(src)
+            elif src.endswith('.rs'):
+                idx = src.rindex('/src/')
+                hh = '$builddir/' + mode + '/gen/' + src[:idx] + '.hh'
+                rust_headers[hh] = src
+            else:
+                raise Exception('No rule for ' + src)
+    f.write(
+        'build {mode}-objects: phony {objs}\n'.format(
+            mode=mode,
+            objs=' '.join(compiles)
+        )
+    )
+
+    f.write(
+        'build {mode}-headers: phony {header_objs}\n'.format(
+            mode=mode,
+            header_objs=' '.join(["$builddir/{mode}/{hh}.o".format(mode=mode, hh=hh) for hh in headers])
+        )
+    )
+
+    f.write(
+        'build {mode}-test: test.{mode} {test_executables} $builddir/{mode}/scylla {wasms}\n'.format(
+            mode=mode,
+            test_executables=' '.join(['$builddir/{}/{}'.format(mode, binary) for binary in sorted(tests)]),
+            wasms=' '.join([f'$builddir/{binary}' for binary in sorted(wasms)]),
+        )
+    )
+    f.write(
+        'build {mode}-check: phony {mode}-headers {mode}-test\n'.format(
+            mode=mode,
+        )
+    )
+    compiler_training_artifacts=[]
+    if mode == 'dev':
+        compiler_training_artifacts.append(f'$builddir/{mode}/scylla')
+    elif mode == 'release' or mode == 'debug':
+        compiler_training_artifacts.append(f'$builddir/{mode}/service/storage_proxy.o')
+    f.write(
+        'build {mode}-compiler-training: phony {artifacts}\n'.format(
+            mode=mode,
+            artifacts=str.join(' ', compiler_training_artifacts)
+        )
+    )
+
+    gen_dir = '$builddir/{}/gen'.format(mode)
+    gen_headers = []
+    for g in antlr3_grammars:
+        gen_headers += g.headers('$builddir/{}/gen'.format(mode))
+    for g in swaggers:
+        gen_headers += g.headers('$builddir/{}/gen'.format(mode))
+    gen_headers += list(serializers.keys())
+    gen_headers += list(ragels.keys())
+    gen_headers += list(rust_headers.keys())
+    gen_headers.append('$builddir/{}/gen/rust/cxx.h'.format(mode))
+    gen_headers_dep = ' '.join(gen_headers)
+
+    for hh in rust_headers:
+        src = rust_headers[hh]
+        f.write('build {}: rust_header {}\n'.format(hh, src))
+        cc = hh.replace('.hh', '.cc')
+        f.write('build {}: rust_source {}\n'.format(cc, src))
+        obj = cc.replace('.cc', '.o')
+        compiles[obj] = cc
+    for obj in compiles:
+        src = compiles[obj]
+        seastar_dep = f'$builddir/{mode}/seastar/libseastar.{seastar_lib_ext}'
+        abseil_dep = ' '.join(f'$builddir/{mode}/abseil/{lib}' for lib in abseil_libs)
+        f.write(f'build {obj}: cxx.{mode} {src} | {profile_dep} || {seastar_dep} {abseil_dep} {gen_headers_dep}\n')
+        if src in modeval['per_src_extra_cxxflags']:
+            f.write('    cxxflags = {seastar_cflags} $cxxflags $cxxflags_{mode} {extra_cxxflags}\n'.format(mode=mode, extra_cxxflags=modeval["per_src_extra_cxxflags"][src], **modeval))
+    for swagger in swaggers:
+        hh = swagger.headers(gen_dir)[0]
+        cc = swagger.sources(gen_dir)[0]
+        obj = swagger.objects(gen_dir)[0]
+        src = swagger.source
+        f.write('build {} | {} : swagger {} | {}/scripts/seastar-json2code.py\n'.format(hh, cc, src, args.seastar_path))
+        f.write(f'build {obj}: cxx.{mode} {cc} | {profile_dep}\n')
+    if serializers:
+        # All the IDL files of the mode are compiled by a single process, which only
+        # rewrites the outputs whose contents change (restat).
+        f.write('build {}: serializer {} | idl-compiler.py\n'.format(' '.join(serializers), ' '.join(serializers.values())))
+        f.write('    mode = {}\n'.format(mode))
+        f.write('    pairs = {}\n'.format(' '.join(f'{src}:{hh}' for hh, src in serializers.items())))
+    for hh in ragels:
+        src = ragels[hh]
+        f.write('build {}: ragel {}\n'.format(hh, src))
+    f.write('build {}: cxxbridge_header\n'.format('$builddir/{}/gen/rust/cxx.h'.format(mode)))
+    if 'parent_mode' not in modes[mode]:
+        librust = '$builddir/{}/rust-{}/librust_combined'.format(mode, mode)
+        f.write('build {}.a: rust_lib.{} rust/Cargo.lock\n  depfile={}.d\n'.format(librust, mode, librust))
+    for grammar in antlr3_grammars:
+        outs = ' '.join(grammar.generated('$builddir/{}/gen'.format(mode)))
+        f.write('build {}: antlr3.{} {}\n  stem = {}\n'.format(outs, mode, grammar.source,
+                                                               grammar.source.rsplit('.', 1)[0]))
+        for cc in grammar.sources('$builddir/{}/gen'.format(mode)):
+            obj = cc.replace('.cpp', '.o')
+            f.write(f'build {obj}: cxx.{mode} {cc} | {profile_dep} || {" ".join(serializers)}\n')
+            flags = '-Wno-parentheses-equality'
+            if cc.endswith('Parser.cpp'):
+                # Unoptimized parsers end up using huge amounts of stack space and overflowing their stack
+                flags += ' -O1' if modes[mode]['optimization-level'] in ['0', 'g', 's'] else ''
+
+                if '-DSANITIZE' in modeval['cxxflags'] and has_sanitize_address_use_after_scope:
+                    flags += ' -fno-sanitize-address-use-after-scope'
+            f.write('  obj_cxxflags = %s\n' % flags)
+    f.write(f'build $builddir/{mode}/gen/empty.cc: gen\n')
+    for hh in headers:
+        f.write('build $builddir/{mode}/{hh}.o: checkhh.{mode} {hh} | $builddir/{mode}/gen/empty.cc {profile_dep} || {gen_headers_dep}\n'.format(
+                mode=mode, hh=hh, gen_headers_dep=gen_headers_dep, profile_dep=profile_dep))
+
+    seastar_dep = f'$builddir/{mode}/seastar/libseastar.{seastar_lib_ext}'
+    seastar_testing_dep = f'$builddir/{mode}/seastar/libseastar_testing.{seastar_lib_ext}'
+    f.write('build {seastar_dep}: ninja $builddir/{mode}/seastar/build.ninja | always {profile_dep}\n'
+            .format(**locals()))
+    f.write('  pool = submodule_pool\n')
+    f.write('  subdir = $builddir/{mode}/seastar\n'.format(**locals()))
+    f.write('  target = seastar\n'.format(**locals()))
+    f.write('build {seastar_testing_dep}: ninja $builddir/{mode}/seastar/build.ninja | always {profile_dep}\n'
+            .format(**locals()))
+    f.write('  pool = submodule_pool\n')
+    f.write('  subdir = $builddir/{mode}/seastar\n'.format(**locals()))
+    f.write('  target = seastar_testing\n'.format(**locals()))
+    f.write('  profile_dep = {profile_dep}\n'.format(**locals()))
+
+    for lib in abseil_libs:
+        f.write('build $builddir/{mode}/abseil/{lib}: ninja $builddir/{mode}/abseil/build.ninja | always {profile_dep}\n'.format(**locals()))
+        f.write('  pool = submodule_pool\n')
+        f.write('  subdir = $builddir/{mode}/abseil\n'.format(**locals()))
+        f.write('  target = {lib}\n'.format(**locals()))
+        f.write('  profile_dep = {profile_dep}\n'.format(**locals()))
+
+    f.write('build $builddir/{mode}/seastar/apps/iotune/iotune: ninja $builddir/{mode}/seastar/build.ninja | $builddir/{mode}/seastar/libseastar.{seastar_lib_ext}\n'
+            .format(**locals()))
+    f.write('  pool = submodule_pool\n')
+    f.write('  subdir = $builddir/{mode}/seastar\n'.format(**locals()))
+    f.write('  target = iotune\n'.format(**locals()))
+    f.write('  profile_dep = {profile_dep}\n'.format(**locals()))
+    f.write(textwrap.dedent('''\
+        build $builddir/{mode}/iotune: copy $builddir/{mode}/seastar/apps/iotune/iotune
+        build $builddir/{mode}/iotune.stripped: strip $builddir/{mode}/iotune
+        build $builddir/{mode}/iotune.debug: phony $builddir/{mode}/iotune.stripped
+        ''').format(**locals()))
+    if args.dist_only:
+        include_scylla_and_iotune = ''
+        include_scylla_and_iotune_stripped = ''
+        include_scylla_and_iotune_debug = ''
+    else:
+        include_scylla_and_iotune = f'$builddir/{mode}/scylla $builddir/{mode}/iotune $builddir/{mode}/patchelf'
+        include_scylla_and_iotune_stripped = f'$builddir/{mode}/scylla.stripped $builddir/{mode}/iotune.stripped $builddir/{mode}/patchelf.stripped'
+        include_scylla_and_iotune_debug = f'$builddir/{mode}/scylla.debug $builddir/{mode}/iotune.debug'
+    f.write('build $builddir/{mode}/dist/tar/{scylla_product}-unstripped-{scylla_version}-{scylla_release}.{arch}.tar.gz: package {include_scylla_and_iotune} $builddir/SCYLLA-RELEASE-FILE $builddir/SCYLLA-VERSION-FILE $builddir/debian/debian $builddir/node_exporter/node_exporter | always\n'.format(**locals()))
+    f.write('  mode = {mode}\n'.format(**locals()))
+    f.write('build $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz: stripped_package {include_scylla_and_iotune_stripped} $builddir/SCYLLA-RELEASE-FILE $builddir/SCYLLA-VERSION-FILE $builddir/debian/debian $builddir/node_exporter/node_exporter.stripped | always\n'.format(**locals()))
+    f.write('  mode = {mode}\n'.format(**locals()))
+    f.write('build $builddir/{mode}/dist/tar/{scylla_product}-debuginfo-{scylla_version}-{scylla_release}.{arch}.tar.gz: debuginfo_package {include_scylla_and_iotune_debug} $builddir/SCYLLA-RELEASE-FILE $builddir/SCYLLA-VERSION-FILE $builddir/debian/debian $builddir/node_exporter/node_exporter.debug | always\n'.format(**locals()))
+    f.write('  mode = {mode}\n'.format(**locals()))
+    f.write('build $builddir/{mode}/dist/tar/{scylla_product}-package.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz\n'.format(**locals()))
+    f.write('  mode = {mode}\n'.format(**locals()))
+    f.write('build $builddir/{mode}/dist/tar/{scylla_product}-{arch}-package.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz\n'.format(**locals()))
+    f.write('  mode = {mode}\n'.format(**locals()))
+
+    f.write(f'build $builddir/dist/{mode}/redhat: rpmbuild $builddir/{mode}/dist/tar/{scylla_product}-unstripped-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
+    f.write(f'  mode = {mode}\n')
+    f.write(f'build $builddir/dist/{mode}/debian: debbuild $builddir/{mode}/dist/tar/{scylla_product}-unstripped-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
+    f.write(f'  mode = {mode}\n')
+    f.write(f'build dist-server-{mode}: phony $builddir/dist/{mode}/redhat $builddir/dist/{mode}/debian\n')
+    f.write(f'build dist-server-debuginfo-{mode}: phony $builddir/{mode}/dist/tar/{scylla_product}-debuginfo-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
+    f.write(f'build dist-cqlsh-{mode}: phony $builddir/{mode}/dist/tar/{scylla_product}-cqlsh-{scylla_version}-{scylla_release}.{arch}.tar.gz dist-cqlsh-rpm dist-cqlsh-deb\n')
+    f.write(f'build dist-python3-{mode}: phony dist-python3-tar dist-python3-rpm dist-python3-deb\n')
+    f.write(f'build dist-unified-{mode}: phony $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
+    f.write(f'build $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz: unified $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz $builddir/{mode}/dist/tar/{scylla_product}-python3-{scylla_version}-{scylla_release}.{arch}.tar.gz $builddir/{mode}/dist/tar/{scylla_product}-cqlsh-{scylla_version}-{scylla_release}.{arch}.tar.gz | always\n')
+    f.write(f'  mode = {mode}\n')
+    f.write(f'build $builddir/{mode}/dist/tar/{scylla_product}-unified-package-{scylla_version}-{scylla_release}.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
+    f.write(f'build $builddir/{mode}/dist/tar/{scylla_product}-unified-{arch}-package-{scylla_version}-{scylla_release}.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
+
+
 def write_build_file(f,
                      arch,
                      ninja,
@@ -2246,8 +2739,9 @@ def write_build_file(f,
             command = {seastar_path}/scripts/seastar-json2code.py --create-cc -f $in -o $out
             description = SWAGGER $out
         rule serializer
-            command = ./idl-compiler.py --ns ser -f $in -o $out
-            description = IDL compiler $out
+            command = ./idl-compiler.py --ns ser --cache-dir $builddir/idl-cache --batch $pairs
+            restat = 1
+            description = IDL compiler $mode
         rule ninja
             command = {ninja} -C $subdir $target
             restat = 1
@@ -2329,361 +2823,25 @@ def write_build_file(f,
             f.write(f'build $builddir/{wasm}: c2wasm {src}\n')
         f.write(f'build $builddir/{binary}: wasm2wat $builddir/{wasm}\n')
 
+    headers = find_headers('.', excluded_dirs=['idl', 'build', 'seastar', '.git'])
+    # The build statements of each mode are written to their own file, and only
+    # rewritten when something they depend on changes
+    changed_modes = []
     for mode in build_modes:
-        modeval = modes[mode]
-
-        fmt_lib = 'fmt'
-        f.write(textwrap.dedent('''\
-            cxx_ld_flags_{mode} = {cxx_ld_flags}
-            ld_flags_{mode} = $cxx_ld_flags_{mode} {lib_ldflags}
-            cxxflags_{mode} = {lib_cflags} {cxxflags} -iquote. -iquote $builddir/{mode}/gen
-            libs_{mode} = -l{fmt_lib}
-            seastar_libs_{mode} = {seastar_libs}
-            seastar_testing_libs_{mode} = {seastar_testing_libs}
-            rule cxx.{mode}
-              command = $cxx -MD -MT $out -MF $out.d {seastar_cflags} $cxxflags_{mode} $cxxflags $obj_cxxflags -c -o $out $in
-              description = CXX $out
-              depfile = $out.d
-            rule link.{mode}
-              command = $cxx  $ld_flags_{mode} $ldflags -o $out $in $libs $libs_{mode}
-              description = LINK $out
-              pool = link_pool
-            rule link_stripped.{mode}
-              command = $cxx  $ld_flags_{mode} -s $ldflags -o $out $in $libs $libs_{mode}
-              description = LINK (stripped) $out
-              pool = link_pool
-            rule link_build.{mode}
-              command = $cxx  $ld_flags_{mode} $ldflags_build -o $out $in $libs $libs_{mode}
-              description = LINK (build) $out
-              pool = link_pool
-            rule ar.{mode}
-              command = rm -f $out; ar cr $out $in; ranlib $out
-              description = AR $out
-            rule antlr3.{mode}
-                # We replace many local `ExceptionBaseType* ex` variables with a single function-scope one.
-                # Because we add such a variable to every function, and because `ExceptionBaseType` is not a global
-                # name, we also add a global typedef to avoid compilation errors.
-                command = sed -e '/^#if 0/,/^#endif/d' $in > $builddir/{mode}/gen/$in $
-                     && {antlr3_exec} $builddir/{mode}/gen/$in $
-                     && sed -i -e '/^.*On :.*$$/d' $builddir/{mode}/gen/${{stem}}Lexer.hpp $
-                     && sed -i -e '/^.*On :.*$$/d' $builddir/{mode}/gen/${{stem}}Lexer.cpp $
-                     && sed -i -e '/^.*On :.*$$/d' $builddir/{mode}/gen/${{stem}}Parser.hpp $
-                     && sed -i -e 's/^\\( *\\)\\(ImplTraits::CommonTokenType\\* [a-zA-Z0-9_]* = NULL;\\)$$/\\1const \\2/' $
-                        -e '/^.*On :.*$$/d' $
-                        -e '1i using ExceptionBaseType = int;' $
-                        -e 's/^{{/{{ ExceptionBaseType\\* ex = nullptr;/; $
-                            s/ExceptionBaseType\\* ex = new/ex = new/; $
-                            s/exceptions::syntax_exception e/exceptions::syntax_exception\\& e/' $
-                        $builddir/{mode}/gen/${{stem}}Parser.cpp
-                description = ANTLR3 $in
-            rule checkhh.{mode}
-              command = $cxx -MD -MT $out -MF $out.d {seastar_cflags} $cxxflags $cxxflags_{mode} $obj_cxxflags --include $in -c -o $out $builddir/{mode}/gen/empty.cc
-              description = CHECKHH $in
-              depfile = $out.d
-            rule test.{mode}
-              command = ./test.py --mode={mode} --repeat={test_repeat} --timeout={test_timeout}
-              pool = console
-              description = TEST {mode}
-            # This rule is unused for PGO stages. They use the rust lib from the parent mode.
-            rule rust_lib.{mode}
-              command = CARGO_BUILD_DEP_INFO_BASEDIR='.' cargo build --locked --manifest-path=rust/Cargo.toml --target-dir=$builddir/{mode} --profile=rust-{mode} $
-                        && touch $out
-              description = RUST_LIB $out
-            ''').format(mode=mode, antlr3_exec=args.antlr3_exec, fmt_lib=fmt_lib, test_repeat=args.test_repeat, test_timeout=args.test_timeout, **modeval))
-        f.write(
-            'build {mode}-build: phony {artifacts} {wasms}\n'.format(
-                mode=mode,
-                artifacts=str.join(' ', ['$builddir/' + mode + '/' + x for x in sorted(build_artifacts - wasms)]),
-                wasms = str.join(' ', ['$builddir/' + x for x in sorted(build_artifacts & wasms)]),
-            )
-        )
-        if profile_recipe := modes[mode].get('profile_recipe'):
-            f.write(profile_recipe)
-        include_cxx_target = f'{mode}-build' if not args.dist_only else ''
-        include_dist_target = f'dist-{mode}' if args.enable_dist is None or args.enable_dist else ''
-        f.write(f'build {mode}: phony {include_cxx_target} {include_dist_target}\n')
-        compiles = {}
-        swaggers = set()
-        serializers = {}
-        ragels = {}
-        antlr3_grammars = set()
-        rust_headers = {}
-
-        # We want LTO, but with the regular LTO, clang generates special LLVM IR files instead of
-        # regular ELF objects after the compile phase, and these special LLVM bitcode can only be
-        # used for LTO builds. The cost of compiling all tests with LTO is prohibitively high, so
-        # we can't use these IR files for tests -- we need to compile regular ELF objects as well.
-        # Therefore, we build FatLTO objects, which contain LTO compatible IR and the regular
-        # object code. And we enable LTO when linking the main Scylla executable, while disable
-        # it when linking anything else.
-
-        seastar_lib_ext = 'so' if modeval['build_seastar_shared_libs'] else 'a'
-        for binary in sorted(build_artifacts):
-            if modeval['is_profile'] and binary != "scylla":
-                # Just to avoid clutter in build.ninja
-                continue
-            profile_dep = modes[mode].get('profile_target', "")
-
-            if binary in other or binary in wasms:
-                continue
-            srcs = deps[binary]
-            objs = ['$builddir/' + mode + '/' + src.replace('.cc', '.o')
-                    for src in srcs
-                    if src.endswith('.cc')]
-            has_rust = False
-            for dep in deps[binary]:
-                if isinstance(dep, Antlr3Grammar):
-                    objs += dep.objects(f'$builddir/{mode}/gen')
-                if isinstance(dep, Json2Code):
-                    objs += dep.objects(f'$builddir/{mode}/gen')
-                if dep.endswith('.rs'):
-                    has_rust = True
-                    idx = dep.rindex('/src/')
-                    obj = dep[:idx].replace('rust/','') + '.o'
-                    objs.append(f'$builddir/{mode}/gen/rust/{obj}')
-            if has_rust:
-                parent_mode = modes[mode].get('parent_mode', mode)
-                objs.append(f'$builddir/{parent_mode}/rust-{parent_mode}/librust_combined.a')
-            if binary in cpp_apps:
-                # binary only needs the C++ standard library, no additional
-                # libraries.
-                f.write('build $builddir/{}/{}: {}.{} {}\n'.format(mode, binary, regular_link_rule, mode, str.join(' ', objs)))
-                # In debug/sanitize modes, we compile with fsanitizers,
-                # so must use the same options during the link:
-                if '-DSANITIZE' in modes[mode]['cxxflags']:
-                    f.write('   libs = -fsanitize=address -fsanitize=undefined\n')
-                else:
-                    f.write('   libs =\n')
-                f.write(f'build $builddir/{mode}/{binary}.stripped: strip $builddir/{mode}/{binary}\n')
-                f.write(f'build $builddir/{mode}/{binary}.debug: phony $builddir/{mode}/{binary}.stripped\n')
-                for src in srcs:
-                    obj = '$builddir/' + mode + '/' + src.replace('.cc', '.o')
-                    compiles[obj] = src
-                continue
-
-            do_lto = modes[mode]['has_lto'] and binary in lto_binaries
-            seastar_dep = f'$builddir/{mode}/seastar/libseastar.{seastar_lib_ext}'
-            seastar_testing_dep = f'$builddir/{mode}/seastar/libseastar_testing.{seastar_lib_ext}'
-            abseil_dep = ' '.join(f'$builddir/{mode}/abseil/{lib}' for lib in abseil_libs)
-            seastar_testing_libs = f'$seastar_testing_libs_{mode}'
-
-            local_libs = f'$seastar_libs_{mode} $libs'
-            objs.extend([f'$builddir/{mode}/abseil/{lib}' for lib in abseil_libs])
-
-            if do_lto:
-                local_libs += ' -flto=thin -ffat-lto-objects'
-            else:
-                local_libs += ' -fno-lto'
-            if binary in tests:
-                if binary in pure_boost_tests:
-                    local_libs += ' ' + maybe_static(args.staticboost, '-lboost_unit_test_framework')
-                if binary not in tests_not_using_seastar_test_framework:
-                    local_libs += f' {seastar_testing_libs}'
-                else:
-                    local_libs += ' ' + '-lgnutls' + ' ' + '-lboost_unit_test_framework'
-                # Our code's debugging information is huge, and multiplied
-                # by many tests yields ridiculous amounts of disk space.
-                # So we strip the tests by default; The user can very
-                # quickly re-link the test unstripped by adding a "_g"
-                # to the test name, e.g., "ninja build/release/testname_g"
-                link_rule = perf_tests_link_rule if binary.startswith('test/perf/') else tests_link_rule
-                f.write('build $builddir/{}/{}: {}.{} {} | {} {} {}\n'.format(mode, binary, link_rule, mode, str.join(' ', objs), seastar_dep, seastar_testing_dep, abseil_dep))
-                f.write('   libs = {}\n'.format(local_libs))
-                f.write('build $builddir/{}/{}_g: {}.{} {} | {} {} {}\n'.format(mode, binary, regular_link_rule, mode, str.join(' ', objs), seastar_dep, seastar_testing_dep, abseil_dep))
-                f.write('   libs = {}\n'.format(local_libs))
-            else:
-                if binary == 'scylla':
-                    local_libs += f' {seastar_testing_libs}'
-                f.write('build $builddir/{}/{}: {}.{} {} | {} {} {}\n'.format(mode, binary, regular_link_rule, mode, str.join(' ', objs), seastar_dep, seastar_testing_dep, abseil_dep))
-                f.write('   libs = {}\n'.format(local_libs))
-                f.write(f'build $builddir/{mode}/{binary}.stripped: strip $builddir/{mode}/{binary}\n')
-                f.write(f'build $builddir/{mode}/{binary}.debug: phony $builddir/{mode}/{binary}.stripped\n')
-            for src in srcs:
-                if src.endswith('.cc'):
-                    obj = '$builddir/' + mode + '/' + src.replace('.cc', '.o')
-                    compiles[obj] = src
-                elif src.endswith('.idl.hh'):
-                    hh = '$builddir/' + mode + '/gen/' + src.replace('.idl.hh', '.dist.hh')
-                    serializers[hh] = src
-                elif src.endswith('.json'):
-                    swaggers.add(src)
-                elif src.endswith('.rl'):
-                    hh = '$builddir/' + mode + '/gen/' + src.replace('.rl', '.hh')
-                    ragels[hh] = src
-                elif src.endswith('.g'):
-                    antlr3_grammars.add(src)
-                elif src.endswith('.rs'):
-                    idx = src.rindex('/src/')
-                    hh = '$builddir/' + mode + '/gen/' + src[:idx] + '.hh'
-                    rust_headers[hh] = src
-                else:
-                    raise Exception('No rule for ' + src)
-        f.write(
-            'build {mode}-objects: phony {objs}\n'.format(
-                mode=mode,
-                objs=' '.join(compiles)
-            )
-        )
-
-        headers = find_headers('.', excluded_dirs=['idl', 'build', 'seastar', '.git'])
-        f.write(
-            'build {mode}-headers: phony {header_objs}\n'.format(
-                mode=mode,
-                header_objs=' '.join(["$builddir/{mode}/{hh}.o".format(mode=mode, hh=hh) for hh in headers])
-            )
-        )
-
-        f.write(
-            'build {mode}-test: test.{mode} {test_executables} $builddir/{mode}/scylla {wasms}\n'.format(
-                mode=mode,
-                test_executables=' '.join(['$builddir/{}/{}'.format(mode, binary) for binary in sorted(tests)]),
-                wasms=' '.join([f'$builddir/{binary}' for binary in sorted(wasms)]),
-            )
-        )
-        f.write(
-            'build {mode}-check: phony {mode}-headers {mode}-test\n'.format(
-                mode=mode,
-            )
-        )
-        compiler_training_artifacts=[]
-        if mode == 'dev':
-            compiler_training_artifacts.append(f'$builddir/{mode}/scylla')
-        elif mode == 'release' or mode == 'debug':
-            compiler_training_artifacts.append(f'$builddir/{mode}/service/storage_proxy.o')
-        f.write(
-            'build {mode}-compiler-training: phony {artifacts}\n'.format(
-                mode=mode,
-                artifacts=str.join(' ', compiler_training_artifacts)
-            )
-        )
-
-        gen_dir = '$builddir/{}/gen'.format(mode)
-        gen_headers = []
-        for g in antlr3_grammars:
-            gen_headers += g.headers('$builddir/{}/gen'.format(mode))
-        for g in swaggers:
-            gen_headers += g.headers('$builddir/{}/gen'.format(mode))
-        gen_headers += list(serializers.keys())
-        gen_headers += list(ragels.keys())
-        gen_headers += list(rust_headers.keys())
-        gen_headers.append('$builddir/{}/gen/rust/cxx.h'.format(mode))
-        gen_headers_dep = ' '.join(gen_headers)
-
-        for hh in rust_headers:
-            src = rust_headers[hh]
-            f.write('build {}: rust_header {}\n'.format(hh, src))
-            cc = hh.replace('.hh', '.cc')
-            f.write('build {}: rust_source {}\n'.format(cc, src))
-            obj = cc.replace('.cc', '.o')
-            compiles[obj] = cc
-        for obj in compiles:
-            src = compiles[obj]
-            seastar_dep = f'$builddir/{mode}/seastar/libseastar.{seastar_lib_ext}'
-            abseil_dep = ' '.join(f'$builddir/{mode}/abseil/{lib}' for lib in abseil_libs)
-            f.write(f'build {obj}: cxx.{mode} {src} | {profile_dep} || {seastar_dep} {abseil_dep} {gen_headers_dep}\n')
-            if src in modeval['per_src_extra_cxxflags']:
-                f.write('    cxxflags = {seastar_cflags} $cxxflags $cxxflags_{mode} {extra_cxxflags}\n'.format(mode=mode, extra_cxxflags=modeval["per_src_extra_cxxflags"][src], **modeval))
-        for swagger in swaggers:
-            hh = swagger.headers(gen_dir)[0]
-            cc = swagger.sources(gen_dir)[0]
-            obj = swagger.objects(gen_dir)[0]
-            src = swagger.source
-            f.write('build {} | {} : swagger {} | {}/scripts/seastar-json2code.py\n'.format(hh, cc, src, args.seastar_path))
-            f.write(f'build {obj}: cxx.{mode} {cc} | {profile_dep}\n')
-        for hh in serializers:
-            src = serializers[hh]
-            f.write('build {}: serializer {} | idl-compiler.py\n'.format(hh, src))
-        for hh in ragels:
-            src = ragels[hh]
-            f.write('build {}: ragel {}\n'.format(hh, src))
-        f.write('build {}: cxxbridge_header\n'.format('$builddir/{}/gen/rust/cxx.h'.format(mode)))
-        if 'parent_mode' not in modes[mode]:
-            librust = '$builddir/{}/rust-{}/librust_combined'.format(mode, mode)
-            f.write('build {}.a: rust_lib.{} rust/Cargo.lock\n  depfile={}.d\n'.format(librust, mode, librust))
-        for grammar in antlr3_grammars:
-            outs = ' '.join(grammar.generated('$builddir/{}/gen'.format(mode)))
-            f.write('build {}: antlr3.{} {}\n  stem = {}\n'.format(outs, mode, grammar.source,
-                                                                   grammar.source.rsplit('.', 1)[0]))
-            for cc in grammar.sources('$builddir/{}/gen'.format(mode)):
-                obj = cc.replace('.cpp', '.o')
-                f.write(f'build {obj}: cxx.{mode} {cc} | {profile_dep} || {" ".join(serializers)}\n')
-                flags = '-Wno-parentheses-equality'
-                if cc.endswith('Parser.cpp'):
-                    # Unoptimized parsers end up using huge amounts of stack space and overflowing their stack
-                    flags += ' -O1' if modes[mode]['optimization-level'] in ['0', 'g', 's'] else ''
-
-                    if '-DSANITIZE' in modeval['cxxflags'] and has_sanitize_address_use_after_scope:
-                        flags += ' -fno-sanitize-address-use-after-scope'
-                f.write('  obj_cxxflags = %s\n' % flags)
-        f.write(f'build $builddir/{mode}/gen/empty.cc: gen\n')
-        for hh in headers:
-            f.write('build $builddir/{mode}/{hh}.o: checkhh.{mode} {hh} | $builddir/{mode}/gen/empty.cc {profile_dep} || {gen_headers_dep}\n'.format(
-                    mode=mode, hh=hh, gen_headers_dep=gen_headers_dep, profile_dep=profile_dep))
-
-        seastar_dep = f'$builddir/{mode}/seastar/libseastar.{seastar_lib_ext}'
-        seastar_testing_dep = f'$builddir/{mode}/seastar/libseastar_testing.{seastar_lib_ext}'
-        f.write('build {seastar_dep}: ninja $builddir/{mode}/seastar/build.ninja | always {profile_dep}\n'
-                .format(**locals()))
-        f.write('  pool = submodule_pool\n')
-        f.write('  subdir = $builddir/{mode}/seastar\n'.format(**locals()))
-        f.write('  target = seastar\n'.format(**locals()))
-        f.write('build {seastar_testing_dep}: ninja $builddir/{mode}/seastar/build.ninja | always {profile_dep}\n'
-                .format(**locals()))
-        f.write('  pool = submodule_pool\n')
-        f.write('  subdir = $builddir/{mode}/seastar\n'.format(**locals()))
-        f.write('  target = seastar_testing\n'.format(**locals()))
-        f.write('  profile_dep = {profile_dep}\n'.format(**locals()))
-
-        for lib in abseil_libs:
-            f.write('build $builddir/{mode}/abseil/{lib}: ninja $builddir/{mode}/abseil/build.ninja | always {profile_dep}\n'.format(**locals()))
-            f.write('  pool = submodule_pool\n')
-            f.write('  subdir = $builddir/{mode}/abseil\n'.format(**locals()))
-            f.write('  target = {lib}\n'.format(**locals()))
-            f.write('  profile_dep = {profile_dep}\n'.format(**locals()))
+        mode_buildfile = f'{outdir}/{mode}/{mode}.ninja'
+        f.write(f'include {mode_buildfile}\n')
+        fingerprint = mode_fingerprint(mode, arch, scylla_product, scylla_version, scylla_release, headers, args)
+        if read_mode_fingerprint(mode_buildfile) == fingerprint:
+            # It's an output of the configure rule, so ninja must see it as updated
+            os.utime(mode_buildfile)
+            continue
+        changed_modes.append(mode)
+        os.makedirs(os.path.dirname(mode_buildfile), exist_ok=True)
+        with open(mode_buildfile + '.tmp', 'w') as mode_f:
+            mode_f.write(f'# {MODE_FINGERPRINT_PREFIX}{fingerprint}\n')
+            write_mode_build_file(mode_f, mode, arch, scylla_product, scylla_version, scylla_release, headers, args)
+        os.replace(mode_buildfile + '.tmp', mode_buildfile)
 
-        f.write('build $builddir/{mode}/seastar/apps/iotune/iotune: ninja $builddir/{mode}/seastar/build.ninja | $builddir/{mode}/seastar/libseastar.{seastar_lib_ext}\n'
-                .format(**locals()))
-        f.write('  pool = submodule_pool\n')
-        f.write('  subdir = $builddir/{mode}/seastar\n'.format(**locals()))
-        f.write('  target = iotune\n'.format(**locals()))
-        f.write('  profile_dep = {profile_dep}\n'.format(**locals()))
-        f.write(textwrap.dedent('''\
-            build $builddir/{mode}/iotune: copy $builddir/{mode}/seastar/apps/iotune/iotune
-            build $builddir/{mode}/iotune.stripped: strip $builddir/{mode}/iotune
-            build $builddir/{mode}/iotune.debug: phony $builddir/{mode}/iotune.stripped
-            ''').format(**locals()))
-        if args.dist_only:
-            include_scylla_and_iotune = ''
-            include_scylla_and_iotune_stripped = ''
-            include_scylla_and_iotune_debug = ''
-        else:
-            include_scylla_and_iotune = f'$builddir/{mode}/scylla $builddir/{mode}/iotune $builddir/{mode}/patchelf'
-            include_scylla_and_iotune_stripped = f'$builddir/{mode}/scylla.stripped $builddir/{mode}/iotune.stripped $builddir/{mode}/patchelf.stripped'
-            include_scylla_and_iotune_debug = f'$builddir/{mode}/scylla.debug $builddir/{mode}/iotune.debug'
-        f.write('build $builddir/{mode}/dist/tar/{scylla_product}-unstripped-{scylla_version}-{scylla_release}.{arch}.tar.gz: package {include_scylla_and_iotune} $builddir/SCYLLA-RELEASE-FILE $builddir/SCYLLA-VERSION-FILE $builddir/debian/debian $builddir/node_exporter/node_exporter | always\n'.format(**locals()))
-        f.write('  mode = {mode}\n'.format(**locals()))
-        f.write('build $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz: stripped_package {include_scylla_and_iotune_stripped} $builddir/SCYLLA-RELEASE-FILE $builddir/SCYLLA-VERSION-FILE $builddir/debian/debian $builddir/node_exporter/node_exporter.stripped | always\n'.format(**locals()))
-        f.write('  mode = {mode}\n'.format(**locals()))
-        f.write('build $builddir/{mode}/dist/tar/{scylla_product}-debuginfo-{scylla_version}-{scylla_release}.{arch}.tar.gz: debuginfo_package {include_scylla_and_iotune_debug} $builddir/SCYLLA-RELEASE-FILE $builddir/SCYLLA-VERSION-FILE $builddir/debian/debian $builddir/node_exporter/node_exporter.debug | always\n'.format(**locals()))
-        f.write('  mode = {mode}\n'.format(**locals()))
-        f.write('build $builddir/{mode}/dist/tar/{scylla_product}-package.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz\n'.format(**locals()))
-        f.write('  mode = {mode}\n'.format(**locals()))
-        f.write('build $builddir/{mode}/dist/tar/{scylla_product}-{arch}-package.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz\n'.format(**locals()))
-        f.write('  mode = {mode}\n'.format(**locals()))
-
-        f.write(f'build $builddir/dist/{mode}/redhat: rpmbuild $builddir/{mode}/dist/tar/{scylla_product}-unstripped-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
-        f.write(f'  mode = {mode}\n')
-        f.write(f'build $builddir/dist/{mode}/debian: debbuild $builddir/{mode}/dist/tar/{scylla_product}-unstripped-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
-        f.write(f'  mode = {mode}\n')
-        f.write(f'build dist-server-{mode}: phony $builddir/dist/{mode}/redhat $builddir/dist/{mode}/debian\n')
-        f.write(f'build dist-server-debuginfo-{mode}: phony $builddir/{mode}/dist/tar/{scylla_product}-debuginfo-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
-        f.write(f'build dist-cqlsh-{mode}: phony $builddir/{mode}/dist/tar/{scylla_product}-cqlsh-{scylla_version}-{scylla_release}.{arch}.tar.gz dist-cqlsh-rpm dist-cqlsh-deb\n')
-        f.write(f'build dist-python3-{mode}: phony dist-python3-tar dist-python3-rpm dist-python3-deb\n')
-        f.write(f'build dist-unified-{mode}: phony $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
-        f.write(f'build $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz: unified $builddir/{mode}/dist/tar/{scylla_product}-{scylla_version}-{scylla_release}.{arch}.tar.gz $builddir/{mode}/dist/tar/{scylla_product}-python3-{scylla_version}-{scylla_release}.{arch}.tar.gz $builddir/{mode}/dist/tar/{scylla_product}-cqlsh-{scylla_version}-{scylla_release}.{arch}.tar.gz | always\n')
-        f.write(f'  mode = {mode}\n')
-        f.write(f'build $builddir/{mode}/dist/tar/{scylla_product}-unified-package-{scylla_version}-{scylla_release}.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
-        f.write(f'build $builddir/{mode}/dist/tar/{scylla_product}-unified-{arch}-package-{scylla_version}-{scylla_release}.tar.gz: copy $builddir/{mode}/dist/tar/{scylla_product}-unified-{scylla_version}-{scylla_release}.{arch}.tar.gz\n')
 
     checkheaders_mode = 'dev' if 'dev' in modes else modes.keys()[0]
     f.write('build checkheaders: phony || {}\n'.format(' '.join(['$builddir/{}/{}.o'.format(checkheaders_mode, hh) for hh in headers])))
@@ -2774,6 +2932,7 @@ def write_build_file(f,
     for mode in build_modes:
         build_ninja_files += [f'{outdir}/{mode}/seastar/build.ninja']
         build_ninja_files += [f'{outdir}/{mode}/abseil/build.ninja']
+        build_ninja_files += [f'{outdir}/{mode}/{mode}.ninja']
 
     f.write(textwrap.dedent('''\
         rule configure
@@ -2820,6 +2979,7 @@ def write_build_file(f,
              command = ./scripts/build-help.sh
         build help: print_help | always
         ''').format(**globals()))
+    return changed_modes
 
 
 def create_build_system(args):
@@ -2863,14 +3023,14 @@ def create_build_system(args):
     ninja = find_ninja()
     with open(args.buildfile, 'w') as f:
         arch = platform.machine()
-        write_build_file(f,
+        changed_modes = write_build_file(f,
                          arch,
                          ninja,
                          scylla_product,
                          scylla_version,
                          scylla_release,
                          args)
-    generate_compdb('compile_commands.json', ninja, args.buildfile, selected_modes)
+    generate_compdb('compile_commands.json', ninja, args.buildfile, selected_modes, changed_modes)
 
 
 class BuildType(NamedTuple):
@@ -9,7 +9,12 @@
 
 import argparse
 import pyparsing as pp
-from functools import reduce
+from functools import cache, reduce
+import hashlib
+import io
+import keyword
+import pickle
+import re
 import textwrap
 from numbers import Number
 from pprint import pformat
@@ -41,6 +46,21 @@ def fprintln(f, *args):
     f.write('\n')
 
 
+def write_if_changed(name, content):
+    '''Write the file, unless it already has this content, so its mtime and
+    everything depending on it is left alone'''
+    try:
+        with open(name) as f:
+            if f.read() == content:
+                return
+    except FileNotFoundError:
+        pass
+    tmp = name + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(content)
+    os.replace(tmp, name)
+
+
 def print_cw(f):
     fprintln(f, """
 /*
@@ -712,8 +732,9 @@ def namespace_parse_action(tokens):
     return NamespaceDef(name=tokens['name'], members=tokens['ns_members'].asList())
 
 
-def parse_file(file_name):
-    '''Parse the input from the file using IDL grammar syntax and generate AST'''
+@cache
+def idl_grammar():
+    '''Build the IDL grammar, once per process'''
 
     number = pp.pyparsing_common.signed_integer
     identifier = pp.pyparsing_common.identifier
@@ -810,7 +831,36 @@ def parse_file(file_name):
 
     rt = pp.OneOrMore(content)
     rt.ignore(pp.cppStyleComment)
-    return rt.parseFile(file_name, parseAll=True)
+    return rt
+
+
+def parse_file(file_name):
+    '''Parse the input from the file using IDL grammar syntax and generate AST'''
+    return idl_grammar().parseFile(file_name, parseAll=True)
+
+
+def load_ast(file_name):
+    '''Parse the file, or load its AST from the cache directory if the same
+    content was already parsed by the same compiler'''
+    if not config.cache_dir:
+        return parse_file(file_name)
+    with open(__file__, 'rb') as f:
+        key = hashlib.sha256(f.read())
+    with open(file_name, 'rb') as f:
+        key.update(f.read())
+    cache_name = os.path.join(config.cache_dir, key.hexdigest() + '.pickle')
+    try:
+        with open(cache_name, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        pass
+    data = list(parse_file(file_name))
+    os.makedirs(config.cache_dir, exist_ok=True)
+    tmp = f'{cache_name}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f)
+    os.replace(tmp, cache_name)
+    return data
 
 
 def declare_methods(hout, name, template_param=""):
@@ -1452,15 +1502,99 @@ template<typename Input>
     fprintln(hout, f'    return {t}(deserialize(v, std::type_identity<unknown_variant_type>()));\n  }});\n}}')
 
 
+# Serialized sizes of the types which are serialized to the same number of bytes for all values.
+FIXED_SIZE_TYPES = {
+    'bool': 1,
+    'int8_t': 1,
+    'uint8_t': 1,
+    'int16_t': 2,
+    'uint16_t': 2,
+    'int': 4,
+    'int32_t': 4,
+    'uint32_t': 4,
+    'int64_t': 8,
+    'uint64_t': 8,
+}
+
+
+def serialized_fixed_size(t):
+    '''Return the serialized size of a type if it is the same for all values,
+    None otherwise. Final local classes made of such types have a fixed size
+    too, other classes are prefixed by their (variable) frame size.'''
+    if not isinstance(t, BasicType):
+        return None
+    if t.name in FIXED_SIZE_TYPES:
+        return FIXED_SIZE_TYPES[t.name]
+    cls = local_types.get(t.name)
+    if not isinstance(cls, ClassDef) or not cls.final or cls.template_params:
+        return None
+    size = 0
+    for m in get_members(cls):
+        member_size = None if m.attribute else serialized_fixed_size(m.type)
+        if member_size is None:
+            return None
+        size += member_size
+    return size
+
+
 def add_view(cout, cls):
+    '''Generate the view of a class, with an accessor per member.
+
+    The offsets of the members in the serialized class are constant as long
+    as all the members before them have a fixed size. The rest are measured
+    by skipping the preceding members on first access and cached in the view,
+    so accessing all the members is linear, not quadratic. visit_members()
+    deserializes all the members in a single pass.'''
     members = get_members(cls)
     for m in members:
         add_variant_read_size(cout, m.type)
 
+    # The constant offsets of the leading members; the offset of the first member is
+    # past the frame size for non-final classes.
+    offsets = [0 if cls.final else 4]
+    for m in members[:-1]:
+        member_size = None if m.attribute else serialized_fixed_size(m.type)
+        if member_size is None:
+            break
+        offsets.append(offsets[-1] + member_size)
+    known_offsets = len(offsets)
+
     fprintln(cout, f"""struct {cls.name}_view {{
     utils::input_stream v;
     """)
 
+    if known_offsets < len(members):
+        fprintln(cout, reindent(4, f"""
+            // Offsets of the members in v; the offsets of the leading fixed-size members are
+            // constant, the others are measured on first access
+            mutable uint32_t _offsets[{len(members)}] = {{{", ".join(str(o) for o in offsets)}}};
+            mutable size_t _known_offsets = {known_offsets};
+        """))
+        skip_cases = []
+        for i in range(known_offsets - 1, len(members) - 1):
+            m = members[i]
+            skip_member = f"ser::skip(in, std::type_identity<{param_view_type(m.type)}>());"
+            if m.attribute:
+                skip_member = f"if (in.size() > 0) {{ {skip_member} }}"
+            skip_cases.append(f"case {i}: {skip_member} break;")
+        fprintln(cout, reindent(4, """
+            template <typename Input>
+            uint32_t _member_offset(const Input& stream, size_t i) const {{
+              if (i >= _known_offsets) {{
+                auto in = stream;
+                in.skip(_offsets[_known_offsets - 1]);
+                for (size_t k = _known_offsets - 1; k < i; ++k) {{
+                  switch (k) {{
+                  {cases}
+                  }}
+                  _offsets[k + 1] = stream.size() - in.size();
+                }}
+                _known_offsets = i + 1;
+              }}
+              return _offsets[i];
+            }}
+        """.format(cases="\n                  ".join(skip_cases))))
+
     if not is_stub(cls.name) and is_local_writable_type(cls.name):
         fprintln(cout, reindent(4, f"""
             operator {cls.name}() const {{
@@ -1471,7 +1605,8 @@ def add_view(cout, cls):
 
     skip = "" if cls.final else "ser::skip(in, std::type_identity<size_type>());"
     local_names = {}
-    for m in members:
+    visits = []
+    for i, m in enumerate(members):
         name = get_member_name(m.name)
         local_names[name] = "this->" + name + "()"
         full_type = param_view_type(m.type)
@@ -1483,31 +1618,57 @@ def add_view(cout, cls):
         else:
             deser = f"{DESERIALIZER}(in, std::type_identity<{full_type}>())"
 
+        if i >= known_offsets:
+            seek = f"in.skip(_member_offset(v, {i}));"
+        elif offsets[i]:
+            seek = f"in.skip({offsets[i]});"
+        else:
+            seek = ""
+
         if is_vector(m.type):
             elem_type = element_type(m.type)
             fprintln(cout, reindent(4, """
                 auto {name}() const {{
-                  return seastar::with_serialized_stream(v, [] (auto& v) {{
+                  return seastar::with_serialized_stream(v, [this] (auto& v) {{
+                   std::ignore = this;
                    auto in = v;
-                   {skip}
+                   {seek}
                    return vector_deserializer<{elem_type}>(in);
                   }});
                 }}
             """).format(f=DESERIALIZER, **locals()))
+            visits.append(f"visitor(vector_deserializer<{elem_type}>(in));")
+            visits.append(f"ser::skip(in, std::type_identity<{full_type}>());")
         else:
             fprintln(cout, reindent(4, """
                 auto {name}() const {{
                   return seastar::with_serialized_stream(v, [this] (auto& v) -> decltype({f}(std::declval<utils::input_stream&>(), std::type_identity<{full_type}>())) {{
                    std::ignore = this;
                    auto in = v;
-                   {skip}
+                   {seek}
                    return {deser};
                   }});
                 }}
             """).format(f=DESERIALIZER, **locals()))
+            visits.append(f"visitor({deser});")
 
         skip = skip + f"\n       ser::skip(in, std::type_identity<{full_type}>());"
 
+    if members:
+        if not cls.final:
+            visits.insert(0, "in.skip(sizeof(size_type));")
+        fprintln(cout, reindent(4, """
+            // Calls visitor with each member, in order, reading the serialized class once
+            template <typename Visitor>
+            void visit_members(Visitor&& visitor) const {{
+              seastar::with_serialized_stream(v, [this, &visitor] (auto& v) {{
+                std::ignore = this;
+                auto in = v;
+                {visits}
+              }});
+            }}
+        """.format(visits="\n                ".join(visits))))
+
     fprintln(cout, "};")
     skip_impl = "auto& in = v;\n       " + skip if cls.final else "v.skip(read_frame_size(v));"
     if skip == "":
@@ -1729,8 +1890,8 @@ def setup_additional_metadata(tree, ns_context = [], parent_template_params=[]):
 def load_file(name):
     cname = config.o.replace('.hh', '.impl.hh') if config.o else name.replace(EXTENSION, '.dist.impl.hh')
     hname = config.o or name.replace(EXTENSION, '.dist.hh')
-    cout = open(cname, "w+")
-    hout = open(hname, "w+")
+    cout = io.StringIO()
+    hout = io.StringIO()
     print_cw(hout)
     fprintln(hout, """
  /*
@@ -1752,7 +1913,7 @@ def load_file(name):
             printed = True
         return printed
 
-    data = parse_file(name)
+    data = load_ast(name)
     if data:
         handle_includes(data, hout, cout)
         printed = maybe_open_namespace()
@@ -1768,24 +1929,740 @@ def load_file(name):
     if config.ns != '':
         fprintln(hout, f"}} // {config.ns}")
         fprintln(cout, f"}} // {config.ns}")
-    cout.close()
-    hout.close()
+    write_if_changed(cname, cout.getvalue())
+    write_if_changed(hname, hout.getvalue())
+
+
+def reset_state():
+    '''Forget the types and writers of the previously compiled file'''
+    for state in (local_types, local_writable_types, rpc_verbs, created_writers, stubs, optional_nodes, writers, read_sizes):
+        state.clear()
+
+
+def load_files(pairs):
+    '''Compile many IDL files in one process, each pair is input:output'''
+    for pair in pairs:
+        name, sep, output = pair.partition(':')
+        config.o = output if sep else ''
+        reset_state()
+        load_file(name)
 
 
 def general_include(files):
     '''Write serialization-related header includes in the generated files'''
     name = config.o if config.o else "serializer.dist.hh"
     # Header file containing implementation of serializers and other supporting classes 
-    cout = open(name.replace('.hh', '.impl.hh'), "w+")
+    cout = io.StringIO()
     # Header file with serializer declarations
-    hout = open(name, "w+")
+    hout = io.StringIO()
     print_cw(cout)
     print_cw(hout)
     for n in files:
         fprintln(hout, '#include "' + n + '"')
         fprintln(cout, '#include "' + n.replace(".dist.hh", '.dist.impl.hh') + '"')
-    cout.close()
-    hout.close()
+    write_if_changed(name.replace('.hh', '.impl.hh'), cout.getvalue())
+    write_if_changed(name, hout.getvalue())
+
+
+###
+### Python decoders
+###
+
+# The runtime of the generated Python modules. The types read values out of a
+# memoryview without copying it, classes are read into views which decode
+# their members on access, like the generated C++ views.
+PYTHON_RUNTIME = '''
+import collections.abc
+import enum
+import functools
+import ipaddress
+import struct
+from typing import Any, Callable, NamedTuple, Optional as _Optional
+
+# gc_clock::duration is serialized as 64 bits only in the 3.1.0 compatibility
+# mode, see gc_clock_using_3_1_0_serialization in serializer.hh
+gc_clock_using_3_1_0_serialization = False
+
+_size_type = struct.Struct('<I')
+_variant_header = struct.Struct('<II')
+
+
+def _check_end(buf, end):
+    if end > len(buf):
+        raise ValueError(f"serialized data is truncated, {end} bytes needed, {len(buf)} available")
+    return end
+
+
+class Type:
+    """A serialized type, reads values out of a memoryview."""
+    # The serialized size, if it's the same for all the values
+    fixed_size = None
+
+    def read(self, buf, pos):
+        """Returns the value serialized at pos and the position past it."""
+        raise NotImplementedError
+
+    def skip(self, buf, pos):
+        return self.read(buf, pos)[1]
+
+    def default(self):
+        """The value of a [[version]] member missing from the serialized data."""
+        return None
+
+
+class Integral(Type):
+    def __init__(self, fmt):
+        self._struct = struct.Struct(fmt)
+        self.fixed_size = self._struct.size
+
+    def read(self, buf, pos):
+        return self._struct.unpack_from(buf, pos)[0], pos + self.fixed_size
+
+    def skip(self, buf, pos):
+        return _check_end(buf, pos + self.fixed_size)
+
+    def default(self):
+        return self._struct.unpack(bytes(self.fixed_size))[0]
+
+
+bool_t = Integral('<?')
+int8_t = Integral('<b')
+uint8_t = Integral('<B')
+int16_t = Integral('<h')
+uint16_t = Integral('<H')
+int32_t = Integral('<i')
+uint32_t = Integral('<I')
+int64_t = Integral('<q')
+uint64_t = Integral('<Q')
+
+
+class GcClockDuration(Type):
+    def read(self, buf, pos):
+        return (int64_t if gc_clock_using_3_1_0_serialization else int32_t).read(buf, pos)
+
+    def default(self):
+        return 0
+
+
+class Bytes(Type):
+    def read(self, buf, pos):
+        start = pos + _size_type.size
+        end = self.skip(buf, pos)
+        return buf[start:end], end
+
+    def skip(self, buf, pos):
+        return _check_end(buf, pos + _size_type.size + _size_type.unpack_from(buf, pos)[0])
+
+    def default(self):
+        return memoryview(b'')
+
+
+class String(Bytes):
+    def read(self, buf, pos):
+        value, end = super().read(buf, pos)
+        return str(value, 'utf-8'), end
+
+    def default(self):
+        return ''
+
+
+class Monostate(Type):
+    fixed_size = 0
+
+    def read(self, buf, pos):
+        return None, pos
+
+
+class InetAddress(Type):
+    """gms::inet_address, an IPv4 address or the IPv6 marker followed by the address."""
+    _ipv6_marker = 0xffffffff
+
+    def read(self, buf, pos):
+        value, pos = uint32_t.read(buf, pos)
+        if value != self._ipv6_marker:
+            return ipaddress.IPv4Address(value), pos
+        end = _check_end(buf, pos + 16)
+        return ipaddress.IPv6Address(bytes(buf[pos:end])), end
+
+
+class Unsupported(Type):
+    """A type serialized by a hand-written serializer, not defined in the IDL."""
+    def __init__(self, name):
+        self.name = name
+
+    # Equal by the name, for the instances of the template classes to be cached
+    def __eq__(self, other):
+        return isinstance(other, Unsupported) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def read(self, buf, pos):
+        raise NotImplementedError(f"{self.name} is not defined in the IDL, it has no Python decoder")
+
+
+class Optional(Type):
+    def __init__(self, type):
+        self.type = type
+
+    def read(self, buf, pos):
+        if not buf[pos]:
+            return None, pos + 1
+        return self.type.read(buf, pos + 1)
+
+    def skip(self, buf, pos):
+        if not buf[pos]:
+            return pos + 1
+        return self.type.skip(buf, pos + 1)
+
+
+class VectorView(collections.abc.Sequence):
+    """A serialized vector, the elements are read on access, like vector_deserializer."""
+    __slots__ = ('_buf', '_pos', '_count', '_type', '_offsets')
+
+    def __init__(self, buf, pos, count, type):
+        self._buf = buf
+        self._pos = pos
+        self._count = count
+        self._type = type
+        self._offsets = [pos]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("vector index out of range")
+        if self._type.fixed_size is not None:
+            return self._type.read(self._buf, self._pos + i * self._type.fixed_size)[0]
+        # The offsets of the elements are measured on first access
+        offsets = self._offsets
+        while len(offsets) <= i:
+            offsets.append(self._type.skip(self._buf, offsets[-1]))
+        return self._type.read(self._buf, offsets[i])[0]
+
+    def __iter__(self):
+        pos = self._pos
+        for _ in range(self._count):
+            value, pos = self._type.read(self._buf, pos)
+            yield value
+
+    def __repr__(self):
+        return f"[{', '.join(repr(v) for v in self)}]"
+
+
+class Array(Type):
+    def __init__(self, type, count):
+        self.type = type
+        self.count = count
+
+    # The sizes are computed on first use, the members of the classes are set after the types are created
+    @functools.cached_property
+    def fixed_size(self):
+        if self.type.fixed_size is None:
+            return None
+        return self.type.fixed_size * self.count
+
+    def _elements_end(self, buf, pos, count):
+        if self.type.fixed_size is not None:
+            return _check_end(buf, pos + count * self.type.fixed_size)
+        for _ in range(count):
+            pos = self.type.skip(buf, pos)
+        return pos
+
+    def read(self, buf, pos):
+        return VectorView(buf, pos, self.count, self.type), self.skip(buf, pos)
+
+    def skip(self, buf, pos):
+        return self._elements_end(buf, pos, self.count)
+
+    def default(self):
+        return ()
+
+
+class Vector(Array):
+    """A vector, or any other container serialized as its size and its elements."""
+    fixed_size = None
+
+    def __init__(self, type):
+        super().__init__(type, None)
+
+    def read(self, buf, pos):
+        count = _size_type.unpack_from(buf, pos)[0]
+        start = pos + _size_type.size
+        return VectorView(buf, start, count, self.type), self._elements_end(buf, start, count)
+
+    def skip(self, buf, pos):
+        return self._elements_end(buf, pos + _size_type.size, _size_type.unpack_from(buf, pos)[0])
+
+
+class Pair(Type):
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    @functools.cached_property
+    def fixed_size(self):
+        if self.first.fixed_size is None or self.second.fixed_size is None:
+            return None
+        return self.first.fixed_size + self.second.fixed_size
+
+    def read(self, buf, pos):
+        first, pos = self.first.read(buf, pos)
+        second, pos = self.second.read(buf, pos)
+        return (first, second), pos
+
+    def skip(self, buf, pos):
+        return self.second.skip(buf, self.first.skip(buf, pos))
+
+
+def Map(key, value):
+    """A map is read as a vector of (key, value) pairs."""
+    return Vector(Pair(key, value))
+
+
+class UnknownVariant(NamedTuple):
+    """An alternative of a variant unknown to this version, like unknown_variant_type."""
+    index: int
+    data: memoryview
+
+
+class Variant(Type):
+    """A boost::variant, serialized with its size and the index of the alternative."""
+    def __init__(self, *types):
+        self.types = types
+
+    def read(self, buf, pos):
+        size, index = _variant_header.unpack_from(buf, pos)
+        end = _check_end(buf, pos + size)
+        if index < len(self.types):
+            return self.types[index].read(buf, pos + _variant_header.size)[0], end
+        return UnknownVariant(index, buf[pos + _variant_header.size:end]), end
+
+    def skip(self, buf, pos):
+        return _check_end(buf, pos + _size_type.unpack_from(buf, pos)[0])
+
+
+class StdVariant(Type):
+    """A std::variant, serialized with the index of the alternative only."""
+    def __init__(self, *types):
+        self.types = types
+
+    def read(self, buf, pos):
+        index = buf[pos]
+        if index >= len(self.types):
+            raise ValueError(f"unknown std::variant alternative {index}")
+        return self.types[index].read(buf, pos + 1)
+
+
+class Enum(Type):
+    def __init__(self, enum_class, underlying_type):
+        self.enum_class = enum_class
+        self.underlying_type = underlying_type
+        self.fixed_size = underlying_type.fixed_size
+
+    def _value(self, value):
+        try:
+            return self.enum_class(value)
+        except ValueError:
+            # A value added by a newer version
+            return value
+
+    def read(self, buf, pos):
+        value, end = self.underlying_type.read(buf, pos)
+        return self._value(value), end
+
+    def skip(self, buf, pos):
+        return self.underlying_type.skip(buf, pos)
+
+    def default(self):
+        return self._value(0)
+
+
+class Member(NamedTuple):
+    name: str
+    type: Type
+    # Members with the [[version]] attribute are missing from the data serialized by older versions
+    versioned: bool = False
+    # Returns the value of a missing versioned member, given the view; type.default() if None
+    default: _Optional[Callable[[Any], Any]] = None
+
+
+class View:
+    """A serialized class, the members are read on access, like the generated C++ views.
+
+    The offsets of the members are measured on the first access and cached in
+    the view, so accessing all the members is linear, not quadratic."""
+    __slots__ = ('_buf', '_start', '_end', '_offsets')
+    _final = False
+    _members = ()
+
+    def __init__(self, buf, start, end):
+        self._buf = buf
+        self._start = start
+        self._end = end
+        self._offsets = [start if self._final else start + _size_type.size]
+
+    def _missing(self, member, pos):
+        return member.versioned and pos >= self._end
+
+    def _default(self, member):
+        return member.default(self) if member.default else member.type.default()
+
+    def _member(self, i):
+        offsets = self._offsets
+        while len(offsets) <= i:
+            member = self._members[len(offsets) - 1]
+            pos = offsets[-1]
+            offsets.append(pos if self._missing(member, pos) else member.type.skip(self._buf, pos))
+        member = self._members[i]
+        if self._missing(member, offsets[i]):
+            return self._default(member)
+        return member.type.read(self._buf, offsets[i])[0]
+
+    def visit_members(self, visitor):
+        """Calls visitor with each member, in order, reading the serialized class once."""
+        pos = self._offsets[0]
+        for member in self._members:
+            if self._missing(member, pos):
+                visitor(self._default(member))
+            else:
+                value, pos = member.type.read(self._buf, pos)
+                visitor(value)
+
+    def serialized(self):
+        """The serialized class."""
+        return self._buf[self._start:self._end]
+
+    def __repr__(self):
+        values = []
+        self.visit_members(values.append)
+        members = ', '.join(f"{m.name}={v!r}" for m, v in zip(self._members, values))
+        return f"{type(self).__name__}({members})"
+
+
+class Class(Type):
+    def __init__(self, view):
+        self.view = view
+
+    @functools.cached_property
+    def fixed_size(self):
+        if not self.view._final:
+            return None
+        size = 0
+        for member in self.view._members:
+            if member.versioned or member.type.fixed_size is None:
+                return None
+            size += member.type.fixed_size
+        return size
+
+    def read(self, buf, pos):
+        end = self.skip(buf, pos)
+        return self.view(buf, pos, end), end
+
+    def skip(self, buf, pos):
+        if not self.view._final:
+            return _check_end(buf, pos + _size_type.unpack_from(buf, pos)[0])
+        if self.fixed_size is not None:
+            return _check_end(buf, pos + self.fixed_size)
+        for member in self.view._members:
+            pos = member.type.skip(buf, pos)
+        return pos
+
+
+def decode(type_name, data):
+    """Reads data serialized as type_name, a type of TYPES, e.g. decode('commitlog_entry', data)."""
+    buf = memoryview(data).cast('B')
+    return TYPES[type_name].read(buf, 0)[0]
+'''
+
+# The Python types of the types serialized by hand-written serializers
+PYTHON_BUILTIN_TYPES = {
+    'bool': 'bool_t',
+    'int8_t': 'int8_t',
+    'uint8_t': 'uint8_t',
+    'int16_t': 'int16_t',
+    'uint16_t': 'uint16_t',
+    'int': 'int32_t',
+    'int32_t': 'int32_t',
+    'unsigned': 'uint32_t',
+    'uint32_t': 'uint32_t',
+    'shard_id': 'uint32_t',
+    'seastar::shard_id': 'uint32_t',
+    'int64_t': 'int64_t',
+    'uint64_t': 'uint64_t',
+    'size_t': 'uint64_t',
+    'api::timestamp_type': 'int64_t',
+    'gc_clock::duration': 'GcClockDuration()',
+    'gc_clock::time_point': 'int64_t',
+    'std::chrono::seconds': 'int64_t',
+    'std::chrono::milliseconds': 'int64_t',
+    'std::chrono::microseconds': 'int64_t',
+    'std::chrono::nanoseconds': 'int64_t',
+    'long': 'int64_t',
+    'lowres_system_clock::time_point': 'int64_t',
+    'bytes': 'Bytes()',
+    'bytes_ostream': 'Bytes()',
+    'bytes_opt': 'Optional(Bytes())',
+    'sstring': 'String()',
+    'seastar::sstring': 'String()',
+    'std::monostate': 'Monostate()',
+    'gms::inet_address': 'InetAddress()',
+    'query::short_read': 'bool_t',
+    'query::is_first_page': 'bool_t',
+}
+
+# Aliases of the IDL types, declared outside of the IDL
+PYTHON_TYPE_ALIASES = {
+    'raft::server_id': TemplateType('raft::internal::tagged_id', [BasicType('server_id_tag')]),
+    'raft::group_id': TemplateType('raft::internal::tagged_id', [BasicType('group_id_tag')]),
+    'raft::snapshot_id': TemplateType('raft::internal::tagged_id', [BasicType('snapshot_id_tag')]),
+    'raft::term_t': TemplateType('raft::internal::tagged_uint64', [BasicType('term_tag')]),
+    'raft::index_t': TemplateType('raft::internal::tagged_uint64', [BasicType('index_tag')]),
+    'raft::read_id': TemplateType('raft::internal::tagged_uint64', [BasicType('read_id_tag')]),
+}
+
+PYTHON_CONTAINER_TYPES = {
+    'std::vector': 'Vector',
+    'utils::chunked_vector': 'Vector',
+    'utils::small_vector': 'Vector',
+    'std::list': 'Vector',
+    'std::set': 'Vector',
+    'std::unordered_set': 'Vector',
+    'absl::btree_set': 'Vector',
+    'std::map': 'Map',
+    'std::unordered_map': 'Map',
+    'std::optional': 'Optional',
+    'boost::variant': 'Variant',
+    'std::variant': 'StdVariant',
+    'std::array': 'Array',
+}
+
+# Serialized as the pointed to object
+PYTHON_POINTER_TYPES = {'lw_shared_ptr', 'seastar::lw_shared_ptr', 'std::unique_ptr', 'foreign_ptr', 'seastar::foreign_ptr'}
+
+PYTHON_INTEGER_LIMITS = {
+    'int8_t': (-2**7, 2**7 - 1),
+    'uint8_t': (0, 2**8 - 1),
+    'int16_t': (-2**15, 2**15 - 1),
+    'uint16_t': (0, 2**16 - 1),
+    'int32_t': (-2**31, 2**31 - 1),
+    'uint32_t': (0, 2**32 - 1),
+    'int64_t': (-2**63, 2**63 - 1),
+    'uint64_t': (0, 2**64 - 1),
+}
+
+
+def python_name(name):
+    name = re.sub(r'\W', '_', name)
+    return name + '_' if keyword.iskeyword(name) else name
+
+
+class PythonModule:
+    '''The declarations of the IDL files, and how they are referred to in the Python module'''
+    def __init__(self):
+        self.classes = []
+        self.enums = []
+        # Qualified C++ name -> Python name
+        self.names = {}
+
+    def add_declarations(self, tree):
+        for obj in tree:
+            if isinstance(obj, NamespaceDef):
+                self.add_declarations(obj.members)
+            elif isinstance(obj, (ClassDef, EnumDef)):
+                name = obj.ns_qualified_name()
+                if name in self.names:
+                    # Some types are declared by more than one IDL file
+                    continue
+                self.names[name] = python_name(name.replace('::', '_'))
+                if isinstance(obj, EnumDef):
+                    self.enums.append(obj)
+                else:
+                    self.classes.append(obj)
+                    self.add_declarations([m for m in obj.members if isinstance(m, (ClassDef, EnumDef))])
+
+    def resolve(self, name, ns_context):
+        '''Look up the name like C++ does, from the innermost scope outwards'''
+        if name.startswith('::'):
+            return self.names.get(name[2:])
+        for i in range(len(ns_context), -1, -1):
+            found = self.names.get('::'.join(ns_context[:i] + [name]))
+            if found:
+                return found
+        return None
+
+    def type(self, t, ns_context, template_params=[]):
+        '''The expression of the Python type of t'''
+        if isinstance(t, BasicType):
+            if t.name in template_params:
+                return t.name
+            found = self.resolve(t.name, ns_context)
+            if found:
+                return found + '_type'
+            if t.name in PYTHON_BUILTIN_TYPES:
+                return PYTHON_BUILTIN_TYPES[t.name]
+            if t.name in PYTHON_TYPE_ALIASES:
+                return self.type(PYTHON_TYPE_ALIASES[t.name], [])
+            return f"Unsupported({t.name!r})"
+        params = t.template_parameters
+        if t.name in PYTHON_POINTER_TYPES:
+            return self.type(params[0], ns_context, template_params)
+        if t.name == 'temporary_buffer':
+            return 'Bytes()'
+        if t.name == 'std::chrono::time_point':
+            return 'int64_t'
+        kind = PYTHON_CONTAINER_TYPES.get(t.name)
+        if kind in ('Vector', 'Optional'):
+            params = params[:1]
+        elif kind == 'Map':
+            params = params[:2]
+        elif kind == 'Array':
+            return f"Array({self.type(params[0], ns_context, template_params)}, {params[1].name})"
+        elif kind is None:
+            found = self.resolve(t.name, ns_context)
+            if not found:
+                return f"Unsupported({t.to_string()!r})"
+            kind = found + '_type'
+        return f"{kind}({', '.join(self.type(p, ns_context, template_params) for p in params)})"
+
+    def default(self, member, previous, ns_context):
+        '''The expression of the default value of a versioned member, given the view v,
+        None for the default value of the type'''
+        value = member.default_value
+        if not value:
+            return None
+        if value in previous:
+            return f"lambda v: v.{python_name(value)}()"
+        if value == param_type(member.type) + '()':
+            return None
+        if value in ('true', 'false'):
+            return f"lambda v: {value == 'true'}"
+        if value.endswith(('::yes', '::no')) and self.type(member.type, ns_context) == 'bool_t':
+            # A bool_class
+            return f"lambda v: {value.endswith('::yes')}"
+        if value == 'std::nullopt':
+            return "lambda v: None"
+        try:
+            return f"lambda v: {int(value, 0)}"
+        except ValueError:
+            pass
+        limit = re.fullmatch(r'std::numeric_limits<(\w+)>::(min|max)\(\)', value)
+        if limit and limit.group(1) in PYTHON_INTEGER_LIMITS:
+            return f"lambda v: {PYTHON_INTEGER_LIMITS[limit.group(1)][limit.group(2) == 'max']}"
+        scope, _, enumerator = value.rpartition('::')
+        enum_name = self.resolve(scope, ns_context) if scope else None
+        if enum_name and any(e.ns_qualified_name().replace('::', '_') == enum_name for e in self.enums):
+            return f"lambda v: {enum_name}.{python_name(enumerator)}"
+        return f"lambda v: _unsupported_default({value!r})"
+
+    def write_enum(self, out, enum):
+        name = self.names[enum.ns_qualified_name()]
+        fprintln(out, f"\n\nclass {name}(enum.IntEnum):")
+        value = -1
+        for m in enum.members:
+            value = int(str(m.initializer), 0) if m.initializer is not None else value + 1
+            fprintln(out, f"    {python_name(m.name)} = {value}")
+        fprintln(out, f"\n\n{name}_type = Enum({name}, {PYTHON_BUILTIN_TYPES[enum.underlying_type]})")
+
+    def write_view(self, out, cls):
+        name = self.names[cls.ns_qualified_name()]
+        fprintln(out, f"\n\nclass {name}(View):")
+        fprintln(out, f'    """{cls.ns_qualified_name()}"""')
+        fprintln(out, "    __slots__ = ()")
+        fprintln(out, f"    _final = {bool(cls.final)}")
+        for i, m in enumerate(get_members(cls)):
+            fprintln(out, f"\n    def {python_name(get_member_name(m.name))}(self):")
+            fprintln(out, f"        return self._member({i})")
+
+    def members(self, cls, template_params=[]):
+        ns_context = cls.ns_context + [cls.name]
+        members = []
+        previous = set()
+        for m in get_members(cls):
+            name = get_member_name(m.name)
+            args = [repr(name), self.type(m.type, ns_context, template_params)]
+            if m.attribute:
+                args.append("versioned=True")
+                default = self.default(m, previous, ns_context)
+                if default:
+                    args.append(f"default={default}")
+            members.append(f"Member({', '.join(args)}),")
+            previous.add(name)
+        return members
+
+    def write_members(self, out, cls):
+        name = self.names[cls.ns_qualified_name()]
+        fprintln(out, f"{name}._members = (")
+        for m in self.members(cls):
+            fprintln(out, f"    {m}")
+        fprintln(out, ")")
+
+    def write_template(self, out, cls):
+        '''Template classes are instantiated by functions of the types of their parameters'''
+        name = self.names[cls.ns_qualified_name()]
+        params = [p.name for p in cls.template_params]
+        fprintln(out, f"""
+
+@functools.cache
+def {name}_type({", ".join(params)}):
+    view = type({name!r}, ({name},), {{'__slots__': ()}})
+    view._members = (""")
+        for m in self.members(cls, params):
+            fprintln(out, f"        {m}")
+        fprintln(out, "    )\n    return Class(view)\n")
+
+    def write(self, out, files):
+        fprintln(out, f'''#
+# Copyright 2016-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+# This is an auto-generated code, do not modify directly.
+
+"""Decoders of the types serialized as defined in {", ".join(os.path.basename(f) for f in files)}"""''')
+        fprint(out, PYTHON_RUNTIME)
+        fprintln(out, '''
+
+def _unsupported_default(value):
+    raise NotImplementedError(f"the default value {value} has no Python equivalent")''')
+        for enum in self.enums:
+            self.write_enum(out, enum)
+        for cls in self.classes:
+            self.write_view(out, cls)
+        fprintln(out, "\n")
+        for cls in self.classes:
+            if not cls.template_params:
+                name = self.names[cls.ns_qualified_name()]
+                fprintln(out, f"{name}_type = Class({name})")
+        for cls in self.classes:
+            if cls.template_params:
+                self.write_template(out, cls)
+        fprintln(out)
+        for cls in self.classes:
+            if not cls.template_params:
+                self.write_members(out, cls)
+        fprintln(out, "\n# The types which can be decoded with decode(), by their qualified C++ names\nTYPES = {")
+        for obj in self.enums + self.classes:
+            if not getattr(obj, 'template_params', None):
+                fprintln(out, f"    {obj.ns_qualified_name()!r}: {self.names[obj.ns_qualified_name()]}_type,")
+        fprintln(out, "}")
+
+
+def generate_python(files, name):
+    '''Write a Python module decoding the types of all the files'''
+    module = PythonModule()
+    for f in files:
+        data = load_ast(f)
+        setup_additional_metadata(data)
+        module.add_declarations(data)
+    out = io.StringIO()
+    module.write(out, files)
+    write_if_changed(name, out.getvalue())
 
 
 if __name__ == "__main__":
@@ -1795,10 +2672,20 @@ if __name__ == "__main__":
     parser.add_argument('-f', help='input file', default='')
     parser.add_argument('--ns', help="""namespace, when set function will be created
     under the given namespace""", default='')
+    parser.add_argument('--batch', nargs='+', metavar='INPUT:OUTPUT', default=[],
+                        help="compile many input files in one process, each to its output file")
+    parser.add_argument('--cache-dir', default='',
+                        help="directory for caching the parsed input files, by their content")
+    parser.add_argument('--python', metavar='OUTPUT', default='',
+                        help="write a Python module decoding the types of the input files, instead of the C++ code")
     parser.add_argument('file', nargs='*', help="combine one or more file names for the general include files")
 
     config = parser.parse_args()
-    if config.file:
+    if config.python:
+        generate_python(config.file or [config.f], config.python)
+    elif config.file:
         general_include(config.file)
+    elif config.batch:
+        load_files(config.batch)
     elif config.f != '':
         load_file(config.f)
@@ -43,6 +43,8 @@ debian_base_packages=(
     python3-pytest-asyncio
     python3-pytest-timeout
     python3-pytest-sugar
+    python3-numpy
+    python3-pyelftools
     libsnappy-dev
     libjsoncpp-dev
     rapidjson-dev
@@ -101,6 +103,8 @@ fedora_packages=(
     python3-jinja2
     python3-deepdiff
     python3-cryptography
+    python3-numpy
+    python3-pyelftools
     dnf-utils
     pigz
     net-tools
@@ -215,6 +219,8 @@ arch_packages=(
     jsoncpp
     lua
     python-pyparsing
+    python-numpy
+    python-pyelftools
     python3
     rapidjson
     snappy
@@ -36,15 +36,48 @@ import os.path
 inputs = sys.argv[1:]
 indexable_exts = {'.c', '.C', '.cc', '.cxx'}
 
-def read_json(fname: str):
+# The compdbs can be hundreds of megabytes, they are read in chunks and
+# the entries are merged one by one
+CHUNK_SIZE = 1 << 20
+
+def read_entries(fname: str):
+    decoder = json.JSONDecoder()
     with open(fname) as f:
-        return json.load(f)
+        buf = ''
+        pos = 0
+        while True:
+            # Skip the array brackets and the separators between the entries
+            while pos < len(buf) and buf[pos] in ' \t\r\n,[]':
+                pos += 1
+            try:
+                if pos == len(buf):
+                    raise ValueError('need more data')
+                entry, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    if pos < len(buf):
+                        raise
+                    return
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield entry
+
+
+def write_entries(entries, out):
+    # The same output as json.dump(list(entries), out, indent=True)
+    sep = '[\n'
+    for e in entries:
+        out.write(sep)
+        out.write(' ' + json.dumps(e, indent=True).replace('\n', '\n '))
+        sep = ',\n'
+    out.write('[]' if sep == '[\n' else '\n]')
 
 
-output_entries = [e
-           for f, _, prefix in (i.partition(':') for i in inputs)
-           for e in read_json(f)
-           if os.path.splitext(e['file'])[1] in indexable_exts
-           and (not prefix or e['output'].startswith(prefix))
-           ]
-json.dump(output_entries, sys.stdout, indent=True)
+write_entries((e
+               for f, _, prefix in (i.partition(':') for i in inputs)
+               for e in read_entries(f)
+               if os.path.splitext(e['file'])[1] in indexable_exts
+               and (not prefix or e['output'].startswith(prefix))
+               ), sys.stdout)
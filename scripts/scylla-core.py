@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+# Analyze the seastar heap of a scylla core without gdb, see scylla_core/__init__.py.
+#
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scylla_core.cli import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+"""Offline analysis of scylla cores, without gdb.
+
+Reads the ELF core (memory-mapped) and the layouts of the seastar allocator's
+structures from the DWARF of the binary, and reimplements the allocator
+walkers of scylla-gdb.py over them, with numpy. Runs on any Linux box with
+python3, numpy and pyelftools:
+
+    scripts/scylla-core.py CORE BINARY memory
+    scripts/scylla-core.py CORE BINARY small-objects -o 64
+    scripts/scylla-core.py -j 8 CORE BINARY task_histogram -f
+    scripts/scylla-core.py CORE BINARY ptr 0x600000123450
+
+The heaps of the shards are numbered by their address. That is the order of
+the shard ids with the default memory layout, but the core doesn't tell the
+shard a heap belongs to, so the reports say "heap N", not "shard N".
+"""
+
+from .allocator import heap, heap_layout, find_heaps, pointer_metadata, scan
+from .binary import elf_binary
+from .cli import analyzer, main
+from .dwarf import type_cache
+from .elfcore import core_file
+
+__all__ = [
+    'analyzer',
+    'core_file',
+    'elf_binary',
+    'find_heaps',
+    'heap',
+    'heap_layout',
+    'main',
+    'pointer_metadata',
+    'scan',
+    'type_cache',
+]
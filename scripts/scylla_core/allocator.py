@@ -0,0 +1,368 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+"""A model of the seastar allocator, over the memory of a core.
+
+This is the offline counterpart of the allocator model of scylla-gdb.py
+(span, spans(), span_checker, pointer_metadata). The page array of each
+shard is decoded into numpy columns, and the spans and their objects are
+scanned in bulk, instead of through gdb values.
+"""
+
+import sys
+
+import numpy as np
+
+from . import dwarf
+
+
+MEMORY_CU = 'core/memory.cc'
+CPU_PAGES = 'seastar::memory::cpu_pages'
+PAGE = 'seastar::memory::page'
+SMALL_POOL = 'seastar::memory::small_pool'
+FREE_OBJECT = 'seastar::memory::free_object'
+PAGE_SIZE = 'seastar::memory::page_size'
+
+TYPES = (CPU_PAGES, PAGE, SMALL_POOL, FREE_OBJECT)
+CONSTANTS = (PAGE_SIZE,)
+
+# cpu_mem can have internal linkage
+CPU_MEM_SYMBOLS = ('_ZN7seastar6memory7cpu_memE', '_ZN7seastar6memoryL7cpu_memE')
+
+PAGE_FIELDS = ('free', 'offset_in_span', 'span_size', 'pool', 'freelist')
+
+
+def load_types(binary, cache_directory=None):
+    return dwarf.type_cache(binary, MEMORY_CU, TYPES, CONSTANTS, cache_directory)
+
+
+def read_field(buf, offset, m):
+    """Reads the (possibly bitfield) member `m` of the structure at `offset` of buf."""
+    first_byte = offset + m.bitpos // 8
+    last_byte = offset + (m.bitpos + m.bitsize + 7) // 8
+    val = int.from_bytes(buf[first_byte:last_byte], sys.byteorder)
+    return (val >> (m.bitpos % 8)) & ((1 << m.bitsize) - 1)
+
+
+class heap_layout:
+    """The layout of the seastar heap of a shard.
+
+    Only holds plain values, so it can be passed to worker processes
+    (see cli.py), which open the core themselves.
+    """
+    def __init__(self, core, binary, types, thread_pointer):
+        cpu_pages = types[CPU_PAGES]
+        value, _, _ = binary.symbol(*CPU_MEM_SYMBOLS)
+        self.cpu_mem = binary.tls_address(core, thread_pointer, value)
+        buf = core.read(self.cpu_mem, cpu_pages.size)
+
+        self.page_size = types.constant(PAGE_SIZE, 4096)
+        self.mem_start = read_field(buf, 0, cpu_pages['memory'])
+        self.nr_pages = read_field(buf, 0, cpu_pages['nr_pages'])
+        self.nr_free_pages = read_field(buf, 0, cpu_pages['nr_free_pages'])
+        self.pages = read_field(buf, 0, cpu_pages['pages'])
+
+        page = types[PAGE]
+        self.page_struct_size = page.size
+        self.page_fields = {name: (page[name].bitpos, page[name].bitsize) for name in PAGE_FIELDS}
+
+        self.free_object_size = types[FREE_OBJECT].size
+        small_pool = types[SMALL_POOL]
+        pools = cpu_pages['small_pools._u.a']
+        self.pools = {} # pool address -> object size
+        self.pool_free_heads = {} # pool address -> head of the pool's free-list
+        self.pool_free_counts = {} # pool address -> length of the pool's free-list
+        self.pool_span_sizes = {} # pool address -> preferred span size, in pages
+        for i in range(pools.count):
+            offset = pools.offset + i * small_pool.size
+            addr = self.cpu_mem + offset
+            self.pools[addr] = read_field(buf, offset, small_pool['_object_size'])
+            self.pool_free_heads[addr] = read_field(buf, offset, small_pool['_free'])
+            self.pool_free_counts[addr] = read_field(buf, offset, small_pool['_free_count'])
+            if '_span_sizes.preferred' in small_pool:
+                self.pool_span_sizes[addr] = read_field(buf, offset, small_pool['_span_sizes.preferred'])
+
+    @property
+    def mem_end(self):
+        return self.mem_start + self.nr_pages * self.page_size
+
+
+def find_heaps(core, binary, types):
+    """Returns the heap_layout of each shard, in the order of their addresses.
+
+    Every thread has its own cpu_mem, but only reactor threads have memory.
+    The index of a heap in the returned list is not necessarily the id of
+    its shard, see __init__.py.
+    """
+    layouts = {}
+    for tp in core.thread_pointers():
+        try:
+            layout = heap_layout(core, binary, types, tp)
+        except ValueError:
+            continue
+        if layout.nr_pages and layout.mem_start not in layouts:
+            layouts[layout.mem_start] = layout
+    return [layouts[start] for start in sorted(layouts)]
+
+
+class span:
+    """A span of the heap of a shard, see heap.spans()."""
+    def __init__(self, heap, index, size, pool, free, used_pages):
+        self._heap = heap
+        self.index = index
+        self.size = size
+        self.pool = pool
+        self.free = free
+        self.used_pages = used_pages
+
+    @property
+    def start(self):
+        return self._heap.layout.mem_start + self.index * self._heap.layout.page_size
+
+    @property
+    def end(self):
+        return self.start + self.size * self._heap.layout.page_size
+
+    def is_free(self):
+        return self.free
+
+    def is_small(self):
+        return not self.free and self.pool != 0
+
+    def is_large(self):
+        return not self.free and self.pool == 0
+
+    @property
+    def object_size(self):
+        return self._heap.layout.pools.get(self.pool, 0) if self.is_small() else self.size * self._heap.layout.page_size
+
+    @property
+    def nr_objects(self):
+        if not self.is_small():
+            return 1
+        return self.used_pages * self._heap.layout.page_size // self.object_size
+
+    def __repr__(self):
+        return 'span(0x{:x}, size={}, {})'.format(self.start, self.size,
+                                                  'free' if self.free else 'pool=0x{:x}'.format(self.pool) if self.pool else 'large')
+
+
+class pointer_metadata:
+    """Describes what a pointer points to, like scylla-gdb.py's pointer_metadata."""
+    def __init__(self, ptr, s, offset_in_object, size, is_live):
+        self.ptr = ptr
+        self.span = s
+        self.offset_in_object = offset_in_object
+        self.size = size
+        self.is_live = is_live
+
+    @property
+    def is_small(self):
+        return self.span.is_small()
+
+    def __str__(self):
+        msg = "0x{:x}: {}, offset: {}, size: {}".format(self.ptr, 'small' if self.is_small else 'large',
+                                                        self.offset_in_object, self.size)
+        if not self.is_live:
+            msg += ", free"
+        return msg
+
+
+class heap:
+    """The heap of a shard, scanned in bulk from the core.
+
+    The page array is decoded into a numpy column per page field, and the
+    span boundaries are computed once; spans are then looked up by
+    bisecting their start pages (the role of span_checker in scylla-gdb.py).
+    """
+    def __init__(self, core, layout):
+        self.core = core
+        self.layout = layout
+        raw = core.array(layout.pages, np.uint8, layout.nr_pages * layout.page_struct_size)
+        self.pages = decode_pages(raw.reshape(layout.nr_pages, layout.page_struct_size), layout.page_fields)
+        self._scan_spans()
+        self._free_objects = {}
+
+    def _scan_spans(self):
+        span_size = self.pages['span_size']
+        nr_pages = self.layout.nr_pages
+        sizes = span_size.tolist()
+        starts = []
+        idx = 1
+        while idx < nr_pages:
+            size = sizes[idx]
+            if size == 0:
+                idx += 1
+                continue
+            starts.append(idx)
+            idx += size
+        starts = np.array(starts, dtype=np.int64)
+        sizes = np.minimum(span_size[starts].astype(np.int64), nr_pages - starts)
+        pool = self.pages['pool']
+        offset = self.pages['offset_in_span']
+
+        # The pages of a small span all point back to its pool, with their
+        # offset in the span. Count the leading consistent pages of each span,
+        # for all spans at once.
+        heads = np.repeat(starts, sizes)
+        positions = heads + (np.arange(len(heads)) - np.repeat(np.cumsum(sizes) - sizes, sizes))
+        relative = positions - heads
+        consistent = (pool[positions] == pool[heads]) & (offset[positions] == relative)
+        bounds = np.cumsum(sizes) - sizes
+        first_inconsistent = np.where(consistent, np.repeat(sizes, sizes), relative)
+        used = np.minimum.reduceat(first_inconsistent, bounds) if len(bounds) else np.zeros(0, dtype=np.int64)
+
+        self.span_starts = starts
+        self.span_sizes = sizes
+        self.span_pools = pool[starts]
+        self.span_free = self.pages['free'][starts].astype(bool)
+        self.span_used_pages = used
+
+    def spans(self):
+        for i in range(len(self.span_starts)):
+            yield self._span(i)
+
+    def _span(self, i):
+        return span(self, int(self.span_starts[i]), int(self.span_sizes[i]), int(self.span_pools[i]),
+                    bool(self.span_free[i]), int(self.span_used_pages[i]))
+
+    def span_of(self, addr):
+        """The span containing addr, None if addr is not in the heap of the shard."""
+        if not self.layout.mem_start <= addr < self.layout.mem_end:
+            return None
+        page = (addr - self.layout.mem_start) // self.layout.page_size
+        i = int(np.searchsorted(self.span_starts, page, side='right')) - 1
+        if i < 0 or page >= self.span_starts[i] + self.span_sizes[i]:
+            return None
+        return self._span(i)
+
+    def small_spans(self, object_size=0):
+        """The indexes of the small spans, optionally only of the pools of object_size."""
+        mask = ~self.span_free & (self.span_pools != 0)
+        mask &= np.isin(self.span_pools, np.array(list(self.layout.pools.keys()), dtype=self.span_pools.dtype))
+        if object_size:
+            pools = [p for p, size in self.layout.pools.items() if size == object_size]
+            mask &= np.isin(self.span_pools, np.array(pools, dtype=self.span_pools.dtype))
+        return np.nonzero(mask)[0]
+
+    def first_words(self, i):
+        """The first word of each object slot of small span i, as a numpy array."""
+        s = self._span(i)
+        objsize = s.object_size
+        n = s.nr_objects
+        if objsize < 8 or n == 0:
+            return np.zeros(0, dtype=np.uint64)
+        buf = self.core.array(s.start, np.uint8, n * objsize)
+        return np.ndarray(shape=(n,), dtype='<u8', buffer=buf, strides=(objsize,))
+
+    def free_list_length(self, head, limit):
+        n = 0
+        while head and n < limit:
+            n += 1
+            head = self.core.word(head)
+        return n
+
+    def _free_list(self, head, limit):
+        objects = set()
+        while head and len(objects) < limit:
+            objects.add(head)
+            head = self.core.word(head)
+        return objects
+
+    def _free_objects_of_pool(self, pool):
+        free = self._free_objects.get(pool)
+        if free is None:
+            limit = int(self.span_used_pages.sum()) * self.layout.page_size
+            free = self._free_objects[pool] = self._free_list(self.layout.pool_free_heads.get(pool, 0), limit)
+        return free
+
+    def pointer_metadata(self, ptr):
+        """Returns the pointer_metadata of ptr, None if ptr is not in the heap of the shard."""
+        s = self.span_of(ptr)
+        if s is None:
+            return None
+        if s.is_free():
+            return pointer_metadata(ptr, s, ptr - s.start, s.size * self.layout.page_size, False)
+        if s.is_large():
+            return pointer_metadata(ptr, s, ptr - s.start, s.object_size, True)
+        objsize = s.object_size
+        obj = s.start + (ptr - s.start) // objsize * objsize
+        freelist = int(self.pages['freelist'][s.index])
+        free = obj in self._free_list(freelist, s.nr_objects) or obj in self._free_objects_of_pool(s.pool)
+        return pointer_metadata(ptr, s, ptr - obj, objsize, not free)
+
+
+def decode_pages(pages, page_fields):
+    """Decodes the (nr_pages, sizeof(page)) uint8 array into a numpy column per field."""
+    padded = np.zeros((pages.shape[0], pages.shape[1] + 8), dtype=np.uint8)
+    padded[:, :pages.shape[1]] = pages
+    columns = {}
+    for name, (bitpos, bitsize) in page_fields.items():
+        first_byte = bitpos // 8
+        word = np.ascontiguousarray(padded[:, first_byte:first_byte + 8]).view('<u8')[:, 0]
+        if bitsize < 64:
+            word = (word >> np.uint64(bitpos % 8)) & np.uint64((1 << bitsize) - 1)
+        columns[name] = word
+    return columns
+
+
+class text_ranges:
+    """Vectorized check of whether values point into the text ranges of the binary."""
+    def __init__(self, ranges):
+        self._starts = np.array([r[0] for r in ranges], dtype=np.uint64)
+        self._ends = np.array([r[1] for r in ranges], dtype=np.uint64)
+
+    def mask(self, words):
+        idx = np.searchsorted(self._starts, words, side='right') - 1
+        return (idx >= 0) & (words < self._ends[np.maximum(idx, 0)])
+
+
+def scan(core, layout, ranges, object_size=0, free_lists=True):
+    """Scans the heap of a shard, see scan_heap() in scylla-gdb.py for the returned dict.
+
+    Params:
+    * core, layout: the elfcore.core_file and the heap_layout of the shard;
+    * ranges: the text ranges vptrs point into;
+    * object_size: restrict the histogram to objects of this size, 0 means no restrictions;
+    * free_lists: whether to walk the free-lists, to count the free small objects.
+    """
+    h = heap(core, layout)
+    is_vptr = text_ranges(ranges)
+    pools = {}
+    for i in h.small_spans():
+        s = h._span(i)
+        stats = pools.setdefault(s.pool, {'object_size': s.object_size, 'spans': 0, 'pages': 0, 'used_pages': 0, 'slots': 0, 'span_free': 0})
+        stats['spans'] += 1
+        stats['pages'] += s.size
+        stats['used_pages'] += s.used_pages
+        stats['slots'] += s.nr_objects
+        if free_lists:
+            stats['span_free'] += h.free_list_length(int(h.pages['freelist'][s.index]), s.nr_objects)
+
+    vptrs = []
+    for i in h.small_spans(object_size):
+        if h._span(i).object_size < layout.free_object_size:
+            continue
+        words = h.first_words(i)
+        vptrs.append(words[is_vptr.mask(words)])
+    histogram = {}
+    if vptrs:
+        values, counts = np.unique(np.concatenate(vptrs), return_counts=True)
+        histogram = dict(zip(values.tolist(), counts.tolist()))
+
+    large = {}
+    large_sizes = h.span_sizes[~h.span_free & (h.span_pools == 0)]
+    for size, count in zip(*np.unique(large_sizes, return_counts=True)):
+        large[int(size)] = int(count)
+    free_spans = {}
+    for size, count in zip(*np.unique(h.span_sizes[h.span_free], return_counts=True)):
+        free_spans[int(size)] = int(count)
+
+    pool_free = {}
+    if free_lists:
+        total_slots = sum(s['slots'] for s in pools.values())
+        pool_free = {p: h.free_list_length(head, total_slots) for p, head in layout.pool_free_heads.items()}
+    return {'pools': pools, 'pool_free': pool_free, 'large': large, 'free_spans': free_spans, 'histogram': histogram}
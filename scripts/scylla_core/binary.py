@@ -0,0 +1,127 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import subprocess
+
+import numpy as np
+from elftools.elf.elffile import ELFFile
+
+from . import elfcore
+
+
+class elf_binary:
+    """The executable of the dumped process (the scylla binary, with its debug info)."""
+
+    # Sections vtables (and coroutine frames) point into, see get_text_ranges() in scylla-gdb.py
+    _text_sections = ('.text', '.rodata', '.data.rel.ro')
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.elf = ELFFile(self._file)
+        self.entry = self.elf.header['e_entry']
+        self._symbols = None
+        self._sorted_symbols = None
+
+    @property
+    def build_id(self):
+        section = self.elf.get_section_by_name('.note.gnu.build-id')
+        if section is None:
+            return None
+        for note in section.iter_notes():
+            if note['n_type'] == 'NT_GNU_BUILD_ID':
+                return note['n_desc']
+        return None
+
+    def load_bias(self, core):
+        """The difference between the run-time and link-time addresses, non-zero for PIEs."""
+        entry = core.auxv.get(elfcore.AT_ENTRY)
+        if entry is None:
+            return 0
+        return entry - self.entry
+
+    def tls_segment(self):
+        """The (memsz, align) of the PT_TLS segment."""
+        for segment in self.elf.iter_segments():
+            if segment['p_type'] == 'PT_TLS':
+                return segment['p_memsz'], segment['p_align']
+        raise ValueError("{} has no PT_TLS segment".format(self.path))
+
+    def tls_address(self, core, thread_pointer, offset):
+        """The address of the thread-local variable at `offset` in the TLS block of the executable."""
+        memsz, align = self.tls_segment()
+        if core.machine == elfcore.EM_AARCH64:
+            # TLS variant I: the TLS block follows the 16 byte thread control block
+            return thread_pointer + ((16 + align - 1) & ~(align - 1)) + offset
+        # TLS variant II: the TLS block precedes the thread pointer
+        return thread_pointer - ((memsz + align - 1) & ~(align - 1)) + offset
+
+    def text_ranges(self, bias):
+        """The [(start, end)] ranges of the sections vtables are found in."""
+        ranges = []
+        for name in elf_binary._text_sections:
+            section = self.elf.get_section_by_name(name)
+            if section is not None:
+                ranges.append((section['sh_addr'] + bias, section['sh_addr'] + section['sh_size'] + bias))
+        return sorted(ranges)
+
+    def symbols(self):
+        """The (mangled) name -> (value, size, type) of all symbols of the symbol table."""
+        if self._symbols is None:
+            symtab = self.elf.get_section_by_name('.symtab')
+            if symtab is None:
+                raise ValueError("{} has no symbol table".format(self.path))
+            self._symbols = {}
+            for sym in symtab.iter_symbols():
+                if sym.name and sym['st_shndx'] != 'SHN_UNDEF':
+                    self._symbols[sym.name] = (sym['st_value'], sym['st_size'], sym['st_info']['type'])
+        return self._symbols
+
+    def symbol(self, *names):
+        """The (value, size, type) of the first of `names` found in the symbol table."""
+        symbols = self.symbols()
+        for name in names:
+            if name in symbols:
+                return symbols[name]
+        raise KeyError("none of {} found in the symbol table of {}".format(names, self.path))
+
+    def _sorted(self):
+        if self._sorted_symbols is None:
+            entries = sorted((value, size, name) for name, (value, size, kind) in self.symbols().items()
+                             if size and kind in ('STT_FUNC', 'STT_OBJECT'))
+            self._sorted_symbols = (np.array([e[0] for e in entries], dtype=np.uint64),
+                                    np.array([e[1] for e in entries], dtype=np.uint64),
+                                    [e[2] for e in entries])
+        return self._sorted_symbols
+
+    def resolve_many(self, addrs, bias=0):
+        """Returns a dict of addr -> 'name + offset' (or 'name'), like gdb's `info symbol`.
+
+        Addresses are looked up all at once, in the symbol table sorted by
+        address, and the names are demangled with a single c++filt run.
+        Unresolved addresses are missing from the result.
+        """
+        values, sizes, names = self._sorted()
+        addrs = np.unique(np.asarray(list(addrs), dtype=np.uint64))
+        link_addrs = addrs - np.uint64(bias)
+        idx = np.searchsorted(values, link_addrs, side='right') - 1
+        found = (idx >= 0) & (link_addrs < values[np.maximum(idx, 0)] + sizes[np.maximum(idx, 0)])
+        resolved = [(int(a), names[i], int(la - values[i])) for a, la, i, f in zip(addrs, link_addrs, idx, found) if f]
+        demangled = demangle(sorted(set(name for _, name, _ in resolved)))
+        return {addr: '{} + {}'.format(demangled[name], offset) if offset else demangled[name]
+                for addr, name, offset in resolved}
+
+
+def demangle(names):
+    """Returns a dict of name -> demangled name."""
+    if not names:
+        return {}
+    try:
+        res = subprocess.run(['c++filt'], input='\n'.join(names), capture_output=True, text=True, check=True)
+        demangled = res.stdout.splitlines()
+    except (OSError, subprocess.CalledProcessError):
+        demangled = names
+    return dict(zip(names, demangled))
@@ -0,0 +1,109 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import argparse
+import concurrent.futures
+import logging
+import sys
+
+from . import allocator
+from . import binary
+from . import elfcore
+from . import reports
+
+
+def _scan_worker(core_path, layout, ranges, kwargs):
+    return allocator.scan(elfcore.core_file(core_path), layout, ranges, **kwargs)
+
+
+class analyzer:
+    """A core and the binary of the process it was dumped from."""
+    def __init__(self, core_path, binary_path, cache_directory=None):
+        self.core = elfcore.core_file(core_path)
+        self.binary = binary.elf_binary(binary_path)
+        self.bias = self.binary.load_bias(self.core)
+        self.types = allocator.load_types(self.binary, cache_directory)
+        self.layouts = allocator.find_heaps(self.core, self.binary, self.types)
+        if not self.layouts:
+            raise ValueError("no seastar heaps found in {}".format(core_path))
+
+    def heaps(self, index=None):
+        """Returns [(index, heap_layout)] of all heaps, or only of the heap at index."""
+        if index is None:
+            return list(enumerate(self.layouts))
+        if not 0 <= index < len(self.layouts):
+            raise ValueError("no heap {}, the core has {} heaps".format(index, len(self.layouts)))
+        return [(index, self.layouts[index])]
+
+    def scan(self, heaps, jobs=1, **kwargs):
+        """Scans the heaps, with `jobs` worker processes. Returns [(index, result)]."""
+        ranges = self.binary.text_ranges(self.bias)
+        if jobs <= 1:
+            return [(index, allocator.scan(self.core, layout, ranges, **kwargs)) for index, layout in heaps]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [(index, executor.submit(_scan_worker, self.core.path, layout, ranges, kwargs)) for index, layout in heaps]
+            return [(index, f.result()) for index, f in futures]
+
+    def resolve_many(self, addrs):
+        return self.binary.resolve_many(addrs, self.bias)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze the seastar heap of a scylla core, without gdb.",
+        epilog="The binary must have debug info. The layouts of the allocator's structures are"
+               " cached per build id, in $SCYLLA_CORE_CACHE_DIR or $XDG_CACHE_HOME/scylla-core."
+               " The heaps of the shards are numbered in the order of their addresses, which is not"
+               " necessarily the order of the shard ids.")
+    parser.add_argument("core", help="The core file")
+    parser.add_argument("binary", help="The scylla binary the core was dumped from, with debug info")
+    parser.add_argument("-H", "--heap", type=int, default=None, help="Only analyze the heap with this index, default: all heaps")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Scan the heaps in this many worker processes")
+    parser.add_argument("--cache-dir", default=None, help="Directory of the type cache")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("memory", help="Summarize the state of the heaps, like `scylla memory`")
+
+    small_objects = subparsers.add_parser("small-objects", help="Count the live objects of a small pool, like `scylla small-objects --summarize`")
+    small_objects.add_argument("-o", "--object-size", type=int, required=True, help="Object size, valid sizes are shown by `memory`")
+
+    task_histogram = subparsers.add_parser("task_histogram", help="Histogram of the vptrs of the objects, like `scylla task_histogram -a`")
+    task_histogram.add_argument("-c", "--count", type=int, default=30, help="How many items to print, 0 prints all of them")
+    task_histogram.add_argument("-s", "--size", type=int, default=0, help="Only consider objects of this size")
+    task_histogram.add_argument("-f", "--filter-tasks", action="store_true", help="Only include task objects")
+
+    ptr = subparsers.add_parser("ptr", help="Describe what a pointer points to, like `scylla ptr`")
+    ptr.add_argument("address", help="The pointer, e.g. 0x600000123450")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='%(levelname)s: %(message)s')
+
+    a = analyzer(args.core, args.binary, args.cache_dir)
+    out = sys.stdout
+
+    if args.command == 'memory':
+        for index, result in a.scan(a.heaps(args.heap), args.jobs):
+            out.write('heap {}:\n'.format(index))
+            reports.memory(out, a.layouts[index], result)
+            out.write('\n')
+    elif args.command == 'small-objects':
+        sizes = set(size for layout in a.layouts for size in layout.pools.values())
+        if args.object_size not in sizes:
+            raise ValueError("{} is not a valid object size for any small pools, valid object sizes are: {}".format(args.object_size, sorted(sizes)))
+        reports.small_objects(out, a.scan(a.heaps(args.heap), args.jobs, object_size=args.object_size), args.object_size)
+    elif args.command == 'task_histogram':
+        results = a.scan(a.heaps(args.heap), args.jobs, object_size=args.size, free_lists=False)
+        reports.task_histogram(out, results, a.resolve_many, count=args.count, filter_tasks=args.filter_tasks)
+    elif args.command == 'ptr':
+        addr = int(args.address, 0)
+        for index, layout in a.heaps(args.heap):
+            if layout.mem_start <= addr < layout.mem_end:
+                metadata = allocator.heap(a.core, layout).pointer_metadata(addr)
+                out.write('heap {}, {}\n'.format(index, metadata if metadata is not None else '0x{:x}: not in a span'.format(addr)))
+                break
+        else:
+            out.write('0x{:x}: not in the seastar heap\n'.format(addr))
@@ -0,0 +1,234 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import json
+import logging
+import os
+
+
+class member:
+    """A data member of a structure: its bit position and bit size.
+
+    For non-bitfield members, bitpos is a multiple of 8 and bitsize is
+    8 * the size of the member's type. count is the number of elements for
+    array members, None otherwise.
+    """
+    def __init__(self, bitpos, bitsize, count=None):
+        self.bitpos = bitpos
+        self.bitsize = bitsize
+        self.count = count
+
+    @property
+    def offset(self):
+        return self.bitpos // 8
+
+    def to_json(self):
+        return [self.bitpos, self.bitsize, self.count]
+
+
+class struct_layout:
+    """The size and the data members of a structure.
+
+    Members of nested structure and union members are also available, by
+    their dotted path, e.g. '_u.a' for cpu_pages::small_pools::_u::a.
+    """
+    def __init__(self, name, size, members):
+        self.name = name
+        self.size = size
+        self.members = members
+
+    def __getitem__(self, path):
+        try:
+            return self.members[path]
+        except KeyError:
+            raise KeyError("{} has no member {}".format(self.name, path)) from None
+
+    def __contains__(self, path):
+        return path in self.members
+
+    def to_json(self):
+        return {'size': self.size, 'members': {path: m.to_json() for path, m in self.members.items()}}
+
+    @staticmethod
+    def from_json(name, data):
+        return struct_layout(name, data['size'], {path: member(*m) for path, m in data['members'].items()})
+
+
+def default_cache_directory():
+    cache_dir = os.environ.get('SCYLLA_CORE_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'scylla-core')
+
+
+class type_cache:
+    """The layouts of the structures the analyzer needs, read from the DWARF of the binary.
+
+    Walking the DWARF of scylla is slow, so the walk is restricted to the
+    compilation unit defining the structures and its results are saved to
+    <cache directory>/<build id>/types.json, so it only happens once per build.
+    """
+    _version = 1
+    _max_depth = 3
+
+    def __init__(self, binary, cu_name, type_names, constant_names=(), cache_directory=None):
+        """
+        Params:
+        * binary: the binary.elf_binary;
+        * cu_name: suffix of the name of the compilation unit defining the types, e.g. 'core/memory.cc';
+        * type_names: fully qualified names of the structures to look up;
+        * constant_names: fully qualified names of constexpr variables to look up.
+        """
+        self._binary = binary
+        self.types = {}
+        self.constants = {}
+        path = None
+        build_id = binary.build_id
+        if build_id is not None:
+            path = os.path.join(cache_directory or default_cache_directory(), build_id, 'types.json')
+            if self._load(path, type_names, constant_names):
+                return
+        self._build(cu_name, set(type_names), set(constant_names))
+        if path is not None:
+            self._save(path)
+
+    def __getitem__(self, name):
+        try:
+            return self.types[name]
+        except KeyError:
+            raise KeyError("type {} not found in the debug info of {}".format(name, self._binary.path)) from None
+
+    def constant(self, name, default=None):
+        return self.constants.get(name, default)
+
+    def _load(self, path, type_names, constant_names):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != type_cache._version or not set(type_names) <= set(data['types']):
+            return False
+        self.types = {name: struct_layout.from_json(name, t) for name, t in data['types'].items()}
+        self.constants = data['constants']
+        logging.debug('loaded type cache {}'.format(path))
+        return True
+
+    def _save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': type_cache._version,
+                       'types': {name: t.to_json() for name, t in self.types.items()},
+                       'constants': self.constants}, f)
+        os.rename(tmp, path)
+
+    def _build(self, cu_name, type_names, constant_names):
+        elf = self._binary.elf
+        if not elf.has_dwarf_info():
+            raise ValueError("{} has no debug info".format(self._binary.path))
+        dwarf = elf.get_dwarf_info()
+        for cu in dwarf.iter_CUs():
+            top = cu.get_top_DIE()
+            name = top.attributes.get('DW_AT_name')
+            if name is None or not name.value.decode(errors='replace').endswith(cu_name):
+                continue
+            logging.info('reading types from compilation unit {}'.format(name.value.decode(errors='replace')))
+            self._walk(top, [], type_names, constant_names)
+            break
+        missing = type_names - set(self.types)
+        if missing:
+            raise KeyError("types {} not found in compilation unit {} of {}".format(sorted(missing), cu_name, self._binary.path))
+
+    def _walk(self, die, scope, type_names, constant_names):
+        for child in die.iter_children():
+            tag = child.tag
+            name = child.attributes.get('DW_AT_name')
+            name = name.value.decode(errors='replace') if name is not None else None
+            if tag == 'DW_TAG_namespace':
+                self._walk(child, scope + [name or '(anonymous namespace)'], type_names, constant_names)
+            elif tag in ('DW_TAG_structure_type', 'DW_TAG_class_type', 'DW_TAG_union_type') and name:
+                qualified = '::'.join(scope + [name])
+                if qualified in type_names and qualified not in self.types and 'DW_AT_declaration' not in child.attributes:
+                    self.types[qualified] = struct_layout(qualified, child.attributes['DW_AT_byte_size'].value,
+                                                          self._members(child, 0))
+                self._walk(child, scope + [name], type_names, constant_names)
+            elif tag in ('DW_TAG_variable', 'DW_TAG_member') and name:
+                qualified = '::'.join(scope + [name])
+                if qualified in constant_names and 'DW_AT_const_value' in child.attributes:
+                    self.constants[qualified] = child.attributes['DW_AT_const_value'].value
+
+    @staticmethod
+    def _type_of(die):
+        """Follows typedefs and cv-qualifiers to the underlying type DIE."""
+        t = die.get_DIE_from_attribute('DW_AT_type') if 'DW_AT_type' in die.attributes else None
+        while t is not None and t.tag in ('DW_TAG_typedef', 'DW_TAG_const_type', 'DW_TAG_volatile_type'):
+            t = t.get_DIE_from_attribute('DW_AT_type') if 'DW_AT_type' in t.attributes else None
+        return t
+
+    @staticmethod
+    def _byte_size(t, address_size):
+        if t is None:
+            return 0
+        if t.tag in ('DW_TAG_pointer_type', 'DW_TAG_reference_type', 'DW_TAG_rvalue_reference_type'):
+            return t.attributes['DW_AT_byte_size'].value if 'DW_AT_byte_size' in t.attributes else address_size
+        if 'DW_AT_byte_size' in t.attributes:
+            return t.attributes['DW_AT_byte_size'].value
+        if t.tag == 'DW_TAG_array_type':
+            return type_cache._byte_size(type_cache._type_of(t), address_size) * (type_cache._array_count(t) or 0)
+        return 0
+
+    @staticmethod
+    def _array_count(t):
+        for sub in t.iter_children():
+            if sub.tag != 'DW_TAG_subrange_type':
+                continue
+            if 'DW_AT_count' in sub.attributes:
+                return sub.attributes['DW_AT_count'].value
+            if 'DW_AT_upper_bound' in sub.attributes:
+                return sub.attributes['DW_AT_upper_bound'].value + 1
+        return None
+
+    def _members(self, die, depth, prefix='', base_bitpos=0):
+        members = {}
+        address_size = die.cu['address_size']
+        for child in die.iter_children():
+            if child.tag != 'DW_TAG_member' or 'DW_AT_external' in child.attributes or 'DW_AT_declaration' in child.attributes:
+                continue
+            name = child.attributes.get('DW_AT_name')
+            name = name.value.decode(errors='replace') if name is not None else None
+            t = type_cache._type_of(child)
+            size = type_cache._byte_size(t, address_size)
+            attrs = child.attributes
+            location = attrs['DW_AT_data_member_location'].value if 'DW_AT_data_member_location' in attrs else 0
+            if not isinstance(location, int):
+                # Location expressions are only used for virtual bases
+                continue
+            if 'DW_AT_data_bit_offset' in attrs:
+                bitpos = attrs['DW_AT_data_bit_offset'].value
+                bitsize = attrs['DW_AT_bit_size'].value
+            elif 'DW_AT_bit_size' in attrs:
+                # DWARF < 4 bitfield, DW_AT_bit_offset counts from the most significant bit
+                bitsize = attrs['DW_AT_bit_size'].value
+                storage = attrs['DW_AT_byte_size'].value if 'DW_AT_byte_size' in attrs else size
+                bitpos = location * 8 + storage * 8 - attrs['DW_AT_bit_offset'].value - bitsize
+            else:
+                bitpos = location * 8
+                bitsize = size * 8
+            bitpos += base_bitpos
+            count = type_cache._array_count(t) if t is not None and t.tag == 'DW_TAG_array_type' else None
+            if name is None:
+                # Members of anonymous structures and unions are accessed as members of the enclosing one
+                if t is not None and depth < type_cache._max_depth:
+                    members.update(self._members(t, depth + 1, prefix, bitpos))
+                continue
+            path = prefix + name
+            members[path] = member(bitpos, bitsize, count)
+            element = type_cache._type_of(t) if count is not None else t
+            if element is not None and depth < type_cache._max_depth and \
+                    element.tag in ('DW_TAG_structure_type', 'DW_TAG_class_type', 'DW_TAG_union_type'):
+                members.update(self._members(element, depth + 1, path + '.', bitpos))
+        return members
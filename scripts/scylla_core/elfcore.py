@@ -0,0 +1,130 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import bisect
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+
+PT_LOAD = 1
+PT_NOTE = 4
+
+NT_PRSTATUS = 1
+NT_AUXV = 6
+NT_ARM_TLS = 0x401
+
+AT_ENTRY = 9
+
+EM_X86_64 = 62
+EM_AARCH64 = 183
+
+# Offset of pr_reg in struct elf_prstatus, the same on x86_64 and aarch64
+_PRSTATUS_REGS_OFFSET = 112
+_PRSTATUS_PID_OFFSET = 32
+# Index of fs_base in struct user_regs_struct
+_X86_64_FS_BASE = 21
+
+
+class core_file:
+    """An ELF core file, memory-mapped.
+
+    Maps the virtual addresses of the dumped process to the PT_LOAD segments
+    of the core, and parses the notes for the threads (with their thread
+    pointers, needed to locate thread-local variables) and the auxiliary vector.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != b'\x7fELF' or self._mm[4] != 2:
+            raise ValueError("{} is not a 64-bit ELF file".format(path))
+        if self._mm[5] != 1:
+            raise ValueError("{} is not a little-endian core".format(path))
+        e_type, self.machine = struct.unpack_from('<HH', self._mm, 0x10)
+        if e_type != 4:
+            raise ValueError("{} is not a core file".format(path))
+
+        phoff, = struct.unpack_from('<Q', self._mm, 0x20)
+        phentsize, phnum = struct.unpack_from('<HH', self._mm, 0x36)
+        segments = []
+        notes = []
+        for i in range(phnum):
+            p_type, _, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = struct.unpack_from('<IIQQQQQQ', self._mm, phoff + i * phentsize)
+            if p_type == PT_LOAD and p_memsz:
+                segments.append((p_vaddr, p_memsz, p_offset, p_filesz))
+            elif p_type == PT_NOTE:
+                notes.append((p_offset, p_filesz))
+        segments.sort()
+        self._segments = segments
+        self._starts = [s[0] for s in segments]
+
+        self.threads = [] # [(tid, thread pointer)]
+        self.auxv = {}
+        self._parse_notes(notes)
+
+    def _parse_notes(self, notes):
+        for offset, size in notes:
+            end = offset + size
+            while offset + 12 <= end:
+                namesz, descsz, note_type = struct.unpack_from('<III', self._mm, offset)
+                desc = offset + 12 + ((namesz + 3) & ~3)
+                if note_type == NT_PRSTATUS:
+                    tid, = struct.unpack_from('<i', self._mm, desc + _PRSTATUS_PID_OFFSET)
+                    tp = 0
+                    if self.machine == EM_X86_64:
+                        tp, = struct.unpack_from('<Q', self._mm, desc + _PRSTATUS_REGS_OFFSET + _X86_64_FS_BASE * 8)
+                    self.threads.append((tid, tp))
+                elif note_type == NT_ARM_TLS and self.threads:
+                    # Follows the NT_PRSTATUS of the thread it belongs to
+                    tid, _ = self.threads[-1]
+                    self.threads[-1] = (tid, struct.unpack_from('<Q', self._mm, desc)[0])
+                elif note_type == NT_AUXV:
+                    for i in range(0, descsz - 15, 16):
+                        key, value = struct.unpack_from('<QQ', self._mm, desc + i)
+                        self.auxv[key] = value
+                offset = desc + ((descsz + 3) & ~3)
+
+    def _segment(self, addr):
+        idx = bisect.bisect_right(self._starts, addr) - 1
+        if idx < 0 or addr >= self._segments[idx][0] + self._segments[idx][1]:
+            raise ValueError("address 0x{:x} is not in the core".format(addr))
+        return self._segments[idx]
+
+    def read(self, addr, size):
+        """Returns `size` bytes from `addr`. Raises ValueError if the range is not in the core."""
+        chunks = []
+        while size > 0:
+            vaddr, memsz, offset, filesz = self._segment(addr)
+            n = min(size, vaddr + memsz - addr)
+            start = addr - vaddr
+            # Parts of the segment not dumped to the file read as zeros.
+            data = self._mm[offset + start:offset + min(start + n, filesz)] if start < filesz else b''
+            chunks.append(data + bytes(n - len(data)))
+            addr += n
+            size -= n
+        return b''.join(chunks)
+
+    def array(self, addr, dtype, count):
+        """Returns `count` items of `dtype` from `addr` as a numpy array.
+
+        The array is a read-only view of the mapped core when the range is
+        dumped in a single segment, a copy otherwise.
+        """
+        dtype = np.dtype(dtype)
+        size = dtype.itemsize * count
+        vaddr, memsz, offset, filesz = self._segment(addr)
+        if addr + size <= vaddr + filesz:
+            return np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset + addr - vaddr)
+        return np.frombuffer(self.read(addr, size), dtype=dtype, count=count)
+
+    def word(self, addr):
+        return int.from_bytes(self.read(addr, 8), sys.byteorder)
+
+    def thread_pointers(self):
+        return [tp for _, tp in self.threads if tp]
@@ -0,0 +1,141 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+"""The reports of the analyzer, formatted like their scylla-gdb.py counterparts."""
+
+import re
+from collections import defaultdict
+
+
+# See task_symbol_matcher in scylla-gdb.py
+_task_symbols = [
+    ("seastar", "continuation"),
+    ("seastar", "future", "thread_wake_task"),
+    ("seastar", "(anonymous namespace)", "thread_wake_task"),
+    ("seastar", "thread_context"),
+    ("seastar", "internal", "do_until_state"),
+    ("seastar", "internal", "do_with_state"),
+    ("seastar", "internal", "do_for_each_state"),
+    ("seastar", "parallel_for_each_state"),
+    ("seastar", "internal", "repeat_until_value_state"),
+    ("seastar", "internal", "repeater"),
+    ("seastar", "internal", "when_all_state"),
+    ("seastar", "internal", "when_all_state_component"),
+    ("seastar", "internal", "coroutine_traits_base", "promise_type"),
+    ("seastar", "lambda_task"),
+    ("seastar", "smp_message_queue", "async_work_item"),
+]
+
+
+_coro_pattern = re.compile(r'\)( \[clone \.\w+\])?$')
+
+
+def is_task_symbol(name):
+    name = name.strip()
+    if _coro_pattern.search(name) is not None:
+        return True
+    for spec in _task_symbols:
+        if name.startswith('vtable for {}'.format('::'.join(spec))):
+            return True
+        try:
+            positions = [name.index(part) for part in spec]
+        except ValueError:
+            continue
+        if sorted(positions) == positions:
+            return True
+    return False
+
+
+def memory(out, layout, result):
+    """Writes the allocator part of `scylla memory` for a shard."""
+    page_size = layout.page_size
+    free_mem = layout.nr_free_pages * page_size
+    total_mem = layout.nr_pages * page_size
+    out.write('Used memory: {used_mem:>13}\nFree memory: {free_mem:>13}\nTotal memory: {total_mem:>12}\n\n'
+              .format(used_mem=total_mem - free_mem, free_mem=free_mem, total_mem=total_mem))
+
+    out.write('Small pools:\n')
+    out.write('{objsize:>5} {span_size:>6} {use_count:>10} {memory:>12} {unused:>12} {wasted_percent:>5}\n'
+              .format(objsize='objsz', span_size='spansz', use_count='usedobj', memory='memory',
+                      unused='unused', wasted_percent='wst%'))
+    total_small_bytes = 0
+    for pool, object_size in layout.pools.items():
+        # Skip pools that are smaller than sizeof(free_object), they won't have any content
+        if object_size < layout.free_object_size:
+            continue
+        stats = result['pools'].get(pool, {'used_pages': 0, 'slots': 0})
+        span_size = layout.pool_span_sizes.get(pool, 0) * page_size
+        free_count = layout.pool_free_counts[pool]
+        memory = stats['used_pages'] * page_size
+        total_small_bytes += memory
+        use_count = stats['slots'] - free_count
+        wasted = free_count * object_size
+        unused = memory - use_count * object_size
+        wasted_percent = wasted * 100.0 / memory if memory else 0
+        out.write('{objsize:5} {span_size:6} {use_count:10} {memory:12} {unused:12} {wasted_percent:5.1f}\n'
+                  .format(objsize=object_size, span_size=span_size, use_count=use_count, memory=memory, unused=unused,
+                          wasted_percent=wasted_percent))
+    out.write('Small allocations: %d [B]\n' % total_small_bytes)
+
+    # Free spans are kept on lists by the log2 of their size
+    free_by_index = defaultdict(int)
+    for size, count in result['free_spans'].items():
+        free_by_index[size.bit_length() - 1] += size * count
+    large_by_index = defaultdict(int)
+    large_pages_by_index = defaultdict(int)
+    for size, count in result['large'].items():
+        large_by_index[size.bit_length() - 1] += count
+        large_pages_by_index[size.bit_length() - 1] += size * count
+    out.write('Page spans:\n')
+    out.write('{index:5} {size:>13} {total:>13} {allocated_size:>13} {allocated_count:>7}\n'.format(
+        index="index", size="size [B]", total="free [B]", allocated_size="large [B]", allocated_count="[spans]"))
+    total_large_bytes = 0
+    for index in range(max(list(free_by_index) + list(large_by_index), default=-1) + 1):
+        span_size = (1 << index) * page_size
+        allocated_size = large_pages_by_index[index] * page_size
+        total_large_bytes += allocated_size
+        out.write('{index:5} {size:13} {total:13} {allocated_size:13} {allocated_count:7}\n'.format(
+            index=index, size=span_size, total=free_by_index[index] * page_size,
+            allocated_count=large_by_index[index], allocated_size=allocated_size))
+    out.write('Large allocations: %d [B]\n' % total_large_bytes)
+
+
+def small_objects(out, results, object_size):
+    """Writes the number of live objects of size `object_size`, per heap and in total, like `scylla small-objects --summarize`."""
+    total = 0
+    for index, result in results:
+        count = 0
+        for pool, stats in result['pools'].items():
+            if stats['object_size'] == object_size:
+                count += stats['slots'] - stats['span_free'] - result['pool_free'].get(pool, 0)
+        out.write("heap {:2}: {} objects\n".format(index, count))
+        total += count
+    out.write("number of objects: {}\n".format(total))
+
+
+def task_histogram(out, results, resolve, count=30, filter_tasks=False):
+    """Writes the histogram of the vptrs of all heaps, like `scylla task_histogram -a`.
+
+    resolve is called with all the vptrs at once and returns a dict of vptr -> symbol.
+    """
+    merged = defaultdict(int)
+    for _, result in results:
+        for vptr, n in result['histogram'].items():
+            merged[vptr] += n
+    names = resolve(merged.keys())
+    items = []
+    for vptr, n in merged.items():
+        name = names.get(vptr)
+        if name is None or (filter_tasks and not is_task_symbol(name)):
+            continue
+        items.append((n, vptr, name))
+    items.sort(reverse=True)
+    if count:
+        items = items[:count]
+    total = sum(n for n, _, _ in items)
+    for n, vptr, name in items:
+        out.write('{:9d}: 0x{:x} {}\n'.format(n, vptr, name))
+    out.write('{:9d}: total\n'.format(total))
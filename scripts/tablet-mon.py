@@ -27,6 +27,7 @@
 #        - scaled-to-capacity (tablet size is proportional to its utilization of shard's storage capacity)
 #
 
+import hashlib
 import math
 import threading
 import time
@@ -71,6 +72,7 @@ trace_lines_pool = list()
 
 cql_update_timeout_ms = 800
 cql_update_period = 0.2
+tablets_page_size = 5000
 
 
 class Node(object):
@@ -84,20 +86,42 @@ class Node(object):
 class Shard(object):
     def __init__(self):
         self.tablets = {}
+        # Cached by ordered_tablets() and ordered_tablets_by_groups(), which run
+        # every frame. Reset by the updater whenever tablets are added, removed
+        # or renumbered.
+        self._ordered = None
+        self._groups = None
+
+    def add_tablet(self, tablet):
+        self.tablets[tablet.id] = tablet
+        self.reorder()
+
+    def remove_tablet(self, id):
+        del self.tablets[id]
+        self.reorder()
+
+    def reorder(self):
+        self._ordered = None
+        self._groups = None
 
     def ordered_tablets(self):
-        return sorted(self.tablets.values(), key=lambda t: (t.base_id, t.seq))
+        ordered = self._ordered
+        if ordered is None:
+            ordered = sorted(list(self.tablets.values()), key=lambda t: (t.base_id, t.seq))
+            self._ordered = ordered
+        return ordered
 
     def ordered_tablets_by_groups(self):
-        ts = self.ordered_tablets()
-        gs = []
-        while len(ts) > 0:
-            cur_group = (ts[0].base_id, ts[0].seq)
-            i = 1
-            while i < len(ts) and (ts[i].base_id, ts[i].seq) == cur_group:
-                i += 1
-            gs.append(ts[:i])
-            ts = ts[i:]
+        gs = self._groups
+        if gs is None:
+            ts = self.ordered_tablets()
+            gs = []
+            start = 0
+            for i in range(1, len(ts) + 1):
+                if i == len(ts) or (ts[i].base_id, ts[i].seq) != (ts[start].base_id, ts[start].seq):
+                    gs.append(ts[start:i])
+                    start = i
+            self._groups = gs
         return gs
 
 
@@ -438,6 +462,7 @@ changed = False
 
 cluster = Cluster(['127.0.0.1'])
 session = cluster.connect()
+session.default_fetch_size = tablets_page_size
 topo_query = session.prepare("SELECT host_id, shard_count FROM system.topology")
 tablets_query = session.prepare("SELECT * FROM system.tablets")
 load_per_node_query = session.prepare("SELECT * FROM system.load_per_node")
@@ -455,8 +480,13 @@ def update_from_cql(initial=False):
     global changed
     global data_source_alive
 
+    # Run the small queries concurrently, system.tablets is paged by update_tablets()
+    topo_future = session.execute_async(topo_query)
+    load_per_node_future = session.execute_async(load_per_node_query)
+
+    topology_changed = False
     all_host_ids = set()
-    for host in session.execute(topo_query):
+    for host in topo_future.result():
         id = host.host_id
         all_host_ids.add(id)
         if id not in nodes_by_id:
@@ -464,19 +494,22 @@ def update_from_cql(initial=False):
             nodes.append(n)
             nodes_by_id[id] = n
             changed = True
+            topology_changed = True
         n = nodes_by_id[id]
+        if len(n.shards) != host.shard_count:
+            topology_changed = True
         if len(n.shards) > host.shard_count:
             n.shards = n.shards[:host.shard_count]
         while len(n.shards) < host.shard_count:
             n.shards.append(Shard())
 
-    for id in nodes_by_id:
+    for id in list(nodes_by_id.keys()):
         if id not in all_host_ids:
             nodes.remove(nodes_by_id[id])
             del nodes_by_id[id]
             changed = True
 
-    for row in session.execute(load_per_node_query):
+    for row in load_per_node_future.result():
         host_id = row.node
         if host_id in nodes_by_id:
             n = nodes_by_id[host_id]
@@ -498,94 +531,164 @@ def update_from_cql(initial=False):
     if capacity_changed:
         on_capacity_weight_changed()
 
-    tablets_by_shard = set()
-    tablet_id_by_table = {}
-
-    def tablet_id_for_table(table_id):
-        if table_id not in tablet_id_by_table:
-            tablet_id_by_table[table_id] = 0
-        ret = tablet_id_by_table[table_id]
-        tablet_id_by_table[table_id] += 1
-        return ret
-
-    def process_tablet(table_id, tablet, base_id):
-        tablet_seq = tablet_id_for_table(table_id)
-        id = (table_id, tablet.last_token)
-        replicas = set(tablet.replicas)
-        new_replicas = set(tablet.new_replicas) if tablet.new_replicas else replicas
-
-        leaving = replicas - new_replicas
-        joining = new_replicas - replicas
-
-        stage_change = False
-        inserted = False
-        for replica in replicas.union(new_replicas):
-            host = replica[0]
-            shard = replica[1]
-
-            if host not in nodes_by_id:
-                continue
-
-            tablets_by_shard.add((host, shard, id))
-
-            if replica in joining:
-                state = (Tablet.STATE_JOINING, tablet.stage)
-            elif replica in leaving:
-                state = (Tablet.STATE_LEAVING, tablet.stage)
-            else:
-                state = (Tablet.STATE_NORMAL, None)
-
-            node = nodes_by_id[host]
-            s = node.shards[shard]
-            if id not in s.tablets:
-                s.tablets[id] = Tablet(id, node, state, initial=initial, base_id=base_id)
-                stage_change = True
-                inserted = True
-                changed = True
-            t = s.tablets[id]
-            t.seq = tablet_seq
-            if t.state != state:
-                t.state = state
-                stage_change = True
-                changed = True
-                if not initial and t.streaming:
-                    if tablet.stage != "streaming" and tablet.stage != "rebuild_repair" and tablet.stage != "write_both_read_old":
-                        dst = t.streaming
-                        t.streaming = None
-                        fire_tracer(id, replica, dst, light_purple, light_yellow, tablet_h * 0.7,
-                                    streaming_done_trace_decay_ms, streaming_done_trace_duration_ms)
-
-        if not initial and stage_change and len(leaving) == 1 and len(joining) == 1:
-            src = leaving.pop()
-            dst = joining.pop()
-            src_tablet = nodes_by_id[src[0]].shards[src[1]].tablets[id]
-            if inserted:
-                src_tablet.streaming = dst
-                fire_tracer(id, src, dst, light_red, light_green, tablet_h,
-                            streaming_trace_decay_ms, streaming_trace_duration_ms)
-
-    all_tablets = {}
-    for tablet in session.execute(tablets_query):
-        if not tablet.table_id in all_tablets:
-            all_tablets[tablet.table_id] = []
-        all_tablets[tablet.table_id].append(tablet)
-
-    for (table_id, tablet) in all_tablets.items():
+    if topology_changed:
+        # Tablets on new nodes or shards were not displayed, redo all tables
+        table_digests.clear()
+
+    update_tablets(initial)
+
+
+# Incremental update state, see update_tablets()
+table_digests = {} # table id -> digest of the system.tablets rows of its base table, as of its last update
+table_replicas = {} # table id -> set of (host, shard, tablet id) the table's tablets are displayed at
+
+
+def fetch_tablets():
+    """
+    Yields (table_id, rows) of system.tablets, a table at a time.
+
+    The query is paged, and the next page is requested before the rows of the current one
+    are processed, so fetching overlaps with processing.
+    """
+
+    future = session.execute_async(tablets_query)
+    table_id = None
+    rows = []
+    while future:
+        page = future.result()
+        future = None
+        if page.has_more_pages:
+            future = session.execute_async(tablets_query, paging_state=page.paging_state)
+        for row in page.current_rows:
+            if row.table_id != table_id:
+                if rows:
+                    yield table_id, rows
+                table_id = row.table_id
+                rows = []
+            rows.append(row)
+    if rows:
+        yield table_id, rows
+
+
+def tablets_digest(rows):
+    h = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        h.update(repr((row.last_token, row.replicas, row.new_replicas, row.stage)).encode())
+    return h.digest()
+
+
+def update_tablets(initial):
+    """
+    Applies the changes in system.tablets since the previous update.
+
+    Only tables whose tablets (the tablets of their base table, for co-located tables) changed are processed,
+    and the tablets which are gone are removed through table_replicas, instead of sweeping all shards.
+    """
+
+    rows_by_table = {}
+    digests = {}
+    for table_id, rows in fetch_tablets():
+        rows_by_table[table_id] = rows
+        digests[table_id] = tablets_digest(rows)
+
+    for table_id, rows in rows_by_table.items():
         base_id = table_id
         try:
-            base_id = tablet[0].base_table or table_id
+            base_id = rows[0].base_table or table_id
         except AttributeError:
             pass
 
-        for t in all_tablets[base_id]:
-            process_tablet(table_id, t, base_id)
+        if base_id not in rows_by_table or table_digests.get(table_id) == digests[base_id]:
+            continue
 
-    for n in nodes:
-        for s_idx, s in enumerate(n.shards):
-            for t in list(s.tablets.keys()):
-                if (n.id, s_idx, t) not in tablets_by_shard:
-                    del s.tablets[t]
-                    changed = True
+        displayed = set()
+        for tablet_seq, tablet in enumerate(rows_by_table[base_id]):
+            process_tablet(table_id, tablet, base_id, tablet_seq, displayed, initial)
+        remove_tablets(table_replicas.get(table_id, set()) - displayed)
+        table_replicas[table_id] = displayed
+        table_digests[table_id] = digests[base_id]
+
+    for table_id in list(table_replicas.keys()):
+        if table_id not in rows_by_table:
+            remove_tablets(table_replicas.pop(table_id))
+            table_digests.pop(table_id, None)
+
+
+def remove_tablets(replicas):
+    global changed
+
+    for (host, shard, id) in replicas:
+        n = nodes_by_id.get(host)
+        if n is None or shard >= len(n.shards) or id not in n.shards[shard].tablets:
+            continue
+        n.shards[shard].remove_tablet(id)
+        changed = True
+
+
+def process_tablet(table_id, tablet, base_id, tablet_seq, displayed, initial):
+    """
+    Updates the displayed replicas of a single tablet.
+
+    :param displayed: Set to which the (host, shard, tablet id) of the tablet's replicas are added
+    """
+
+    global changed
+
+    id = (table_id, tablet.last_token)
+    replicas = set(tablet.replicas)
+    new_replicas = set(tablet.new_replicas) if tablet.new_replicas else replicas
+
+    leaving = replicas - new_replicas
+    joining = new_replicas - replicas
+
+    stage_change = False
+    inserted = False
+    for replica in replicas.union(new_replicas):
+        host = replica[0]
+        shard = replica[1]
+
+        if host not in nodes_by_id:
+            continue
+
+        displayed.add((host, shard, id))
+
+        if replica in joining:
+            state = (Tablet.STATE_JOINING, tablet.stage)
+        elif replica in leaving:
+            state = (Tablet.STATE_LEAVING, tablet.stage)
+        else:
+            state = (Tablet.STATE_NORMAL, None)
+
+        node = nodes_by_id[host]
+        s = node.shards[shard]
+        if id not in s.tablets:
+            s.add_tablet(Tablet(id, node, state, initial=initial, base_id=base_id))
+            stage_change = True
+            inserted = True
+            changed = True
+        t = s.tablets[id]
+        if t.seq != tablet_seq:
+            t.seq = tablet_seq
+            s.reorder()
+        if t.state != state:
+            t.state = state
+            stage_change = True
+            changed = True
+            if not initial and t.streaming:
+                if tablet.stage != "streaming" and tablet.stage != "rebuild_repair" and tablet.stage != "write_both_read_old":
+                    dst = t.streaming
+                    t.streaming = None
+                    fire_tracer(id, replica, dst, light_purple, light_yellow, tablet_h * 0.7,
+                                streaming_done_trace_decay_ms, streaming_done_trace_duration_ms)
+
+    if not initial and stage_change and len(leaving) == 1 and len(joining) == 1:
+        src = leaving.pop()
+        dst = joining.pop()
+        src_tablet = nodes_by_id[src[0]].shards[src[1]].tablets[id]
+        if inserted:
+            src_tablet.streaming = dst
+            fire_tracer(id, src, dst, light_red, light_green, tablet_h,
+                        streaming_trace_decay_ms, streaming_trace_duration_ms)
 
 
 def cql_updater():
@@ -5,8 +5,11 @@ import gdb
 import gdb.printing
 import uuid
 import argparse
+import csv
+import io
 import datetime
 import functools
+import gzip
 import re
 from operator import attrgetter
 from collections import defaultdict
@@ -20,6 +23,12 @@ import time
 import socket
 import string
 import math
+import concurrent.futures
+import multiprocessing
+import array
+import itertools
+import json
+import mmap
 
 
 def align_up(ptr, alignment):
@@ -748,10 +757,16 @@ class static_vector:
     def __len__(self):
         return int(self.ref['m_holder']['m_size'])
 
+    def _data(self):
+        value_type = self.ref.type.strip_typedefs().template_argument(0)
+        return self.ref['m_holder']['storage']['data'].cast(value_type.pointer())
+
+    def data_address(self):
+        """The address of the elements, for reading all of them with a single memory read."""
+        return int(self._data())
+
     def __iter__(self):
-        t = self.ref.type.strip_typedefs()
-        value_type = t.template_argument(0)
-        data = self.ref['m_holder']['storage']['data'].cast(value_type.pointer())
+        data = self._data()
         for i in range(self.__len__()):
             yield data[i]
 
@@ -1464,6 +1479,36 @@ def addr_in_ranges(ranges, addr):
     return False
 
 
+class text_ranges_checker:
+    """Checks addresses against the ranges returned by get_text_ranges().
+
+    The ranges are flattened into a sorted list of bounds, an address is in one
+    of the ranges if it is preceded by an odd number of bounds. This allows
+    for checking all the words of a span with one bisect each, instead of
+    iterating over the ranges for each of them, like addr_in_ranges() does.
+    """
+    def __init__(self, ranges):
+        self._bounds = []
+        for start, end in sorted(ranges):
+            # Range ends are inclusive, bounds are exclusive.
+            if self._bounds and start <= self._bounds[-1]:
+                self._bounds[-1] = max(self._bounds[-1], end + 1)
+            else:
+                self._bounds += [start, end + 1]
+
+    def __call__(self, addr):
+        return bool(bisect.bisect_right(self._bounds, addr) & 1)
+
+    def filter(self, words):
+        """Returns the indexes of the words which are in one of the ranges."""
+        bounds = self._bounds
+        if not bounds:
+            return []
+        lo = bounds[0]
+        hi = bounds[-1]
+        return [i for i, w in enumerate(words) if lo <= w < hi and bisect.bisect_right(bounds, w) & 1]
+
+
 class histogram:
     """Simple histogram.
 
@@ -1796,6 +1841,9 @@ class scylla_task_histogram(gdb.Command):
                 help="Include only task objects in the histogram, reduces noise but might exclude items due to inexact filtering.")
         parser.add_argument("-g", "--scheduling-groups", action="store_true",
                 help="Histogram is made from the scheduling groups of the sampled task objects. Implies -f.")
+        parser.add_argument("-j", "--jobs", action="store", type=int, default=0,
+                help="Scan the memory of all shards, with JOBS worker processes reading the core file directly."
+                " All objects are sampled, like with `--all`, but the histogram is merged across all shards.")
 
         try:
             args = parser.parse_args(arg.split())
@@ -1817,7 +1865,7 @@ class scylla_task_histogram(gdb.Command):
         nr_pages = int(cpu_mem['nr_pages'])
         page_samples = range(0, nr_pages) if args.all else random.sample(range(0, nr_pages), nr_pages)
 
-        text_ranges = get_text_ranges()
+        is_vptr = text_ranges_checker(get_text_ranges())
 
         scheduling_group_names = {int(tq['_id']): str(tq['_name']) for tq in get_local_task_queues()}
 
@@ -1831,23 +1879,61 @@ class scylla_task_histogram(gdb.Command):
         h = histogram(print_indicators=False, formatter=formatter, limit=limit)
         symbol_matcher = task_symbol_matcher()
 
-        sc = span_checker()
+        index = heap_index.get()
+
+        def sampled_spans():
+            """Yields (object size, [(object address, first word), ...]) for each sampled small span."""
+            if index is not None:
+                span_samples = range(0, index.nr_spans) if args.all else random.sample(range(0, index.nr_spans), index.nr_spans)
+                for span_idx in span_samples:
+                    objsize = index.span_object_size[span_idx]
+                    if objsize and (objsize == size or size == 0):
+                        yield objsize, index.live_objects_of_span(span_idx)
+                return
+
+            sc = span_checker()
+            for idx in page_samples:
+                span = sc.get_span(mem_start + idx * page_size)
+                if not span or span.index != idx or not span.is_small():
+                    continue
+                pool = span.pool()
+                if int(pool.dereference()['_object_size']) != size and size != 0:
+                    continue
+                objsize = size if size != 0 else int(pool.dereference()['_object_size'])
+                yield objsize, span_objects(span, objsize)
+
+        def span_objects(span, objsize):
+            if objsize < vptr_type.sizeof:
+                return
+            span_size = span.used_span_size() * page_size
+            words = read_first_words(span.start, objsize, int(span_size / objsize))
+            for idx2, addr in enumerate(words):
+                yield span.start + idx2 * objsize, addr
+
+        if args.jobs:
+            results = scan_heaps(args.jobs, object_size=size, sg_offset=sg_offset if args.scheduling_groups else None)
+            for shard_result in results.values():
+                for key, count in shard_result['histogram'].items():
+                    addr, sg = key if args.scheduling_groups else (key, None)
+                    if args.filter_tasks:
+                        sym = resolve(addr)
+                        if not sym or not symbol_matcher(sym):
+                            continue
+                    if args.scheduling_groups:
+                        if sg not in scheduling_group_names:
+                            continue
+                        h[sg] += count
+                    else:
+                        h[addr] += count
+            h.print_to_console()
+            return
+
         vptr_count = defaultdict(int)
         scanned_pages = 0
-        for idx in page_samples:
-            span = sc.get_span(mem_start + idx * page_size)
-            if not span or span.index != idx or not span.is_small():
-                continue
-            pool = span.pool()
-            if int(pool.dereference()['_object_size']) != size and size != 0:
-                continue
+        for objsize, objects in sampled_spans():
             scanned_pages += 1
-            objsize = size if size != 0 else int(pool.dereference()['_object_size'])
-            span_size = span.used_span_size() * page_size
-            for idx2 in range(0, int(span_size / objsize)):
-                obj_addr = span.start + idx2 * objsize
-                addr = int(gdb.Value(obj_addr).reinterpret_cast(vptr_type).dereference())
-                if not addr_in_ranges(text_ranges, addr):
+            for obj_addr, addr in objects:
+                if not is_vptr(addr):
                     continue
                 if args.filter_tasks:
                     sym = resolve(addr)
@@ -1889,10 +1975,14 @@ def find_vptrs():
     pages = cpu_mem['pages']
     nr_pages = int(cpu_mem['nr_pages'])
 
-    text_ranges = get_text_ranges()
+    is_vptr = text_ranges_checker(get_text_ranges())
 
-    def is_vptr(addr):
-        return addr_in_ranges(text_ranges, addr)
+    index = heap_index.get()
+    if index is not None:
+        for obj_addr, vptr in index.live_objects():
+            if is_vptr(vptr):
+                yield mem_start + (obj_addr - index.mem_start), vptr
+        return
 
     idx = 0
     while idx < nr_pages:
@@ -1904,13 +1994,14 @@ def find_vptrs():
             idx += 1
             continue
         objsize = int(pool.dereference()['_object_size'])
-        span_size = pages[idx]['span_size'] * page_size
-        for idx2 in range(0, int(span_size / objsize) + 1):
-            obj_addr = mem_start + idx * page_size + idx2 * objsize
-            vptr = obj_addr.reinterpret_cast(vptr_type).dereference()
-            if is_vptr(vptr):
-                yield obj_addr, vptr
-        idx += pages[idx]['span_size']
+        span_size = int(pages[idx]['span_size'])
+        if objsize >= vptr_type.sizeof:
+            # Read the whole span at once and check all its objects in one go.
+            span_start = mem_start + idx * page_size
+            words = read_first_words(int(span_start), objsize, span_size * page_size // objsize)
+            for idx2 in is_vptr.filter(words):
+                yield span_start + idx2 * objsize, words[idx2]
+        idx += span_size
 
 
 def find_vptrs_of_type(vptr=None, typename=None):
@@ -2239,6 +2330,916 @@ class span_checker(object):
         return s
 
 
+def read_first_words(start, object_size, count):
+    """Read the first word of `count` consecutive objects of `object_size`.
+
+    The whole region is read with a single memory read, instead of going
+    through gdb.Value once per object.
+    Returns an array('Q') with one element per object.
+    """
+    if count <= 0:
+        return array.array('Q')
+    return unpack_first_words(gdb.selected_inferior().read_memory(start, count * object_size), object_size)
+
+
+def get_core_file():
+    """Returns the path of the core file being debugged, None when debugging a live process."""
+    corefile = getattr(gdb.selected_inferior(), 'corefile', None) # gdb >= 14
+    if corefile is not None:
+        return corefile.filename
+    m = re.search(r"Local core dump file:\s*`([^']+)'", gdb.execute('info target', False, True))
+    if m:
+        return m.group(1)
+    return None
+
+
+class heap_index:
+    """On-disk index of the seastar heap of a single shard.
+
+    Walking the seastar heap through gdb is very slow on big coredumps, as it
+    requires a gdb round-trip for each object. The heap index is built once,
+    with a single pass over the spans of each shard (see `scylla heap-index`),
+    then it is memory-mapped by the commands that need to scan the heap.
+
+    The index of each shard is stored in its own directory, with one file for
+    each of the following array-backed columns:
+    * span_start: address of the first page of the span;
+    * span_pages: size of the span, in pages;
+    * span_object_size: object size of the small pool owning the span, 0 for
+      large and free spans;
+    * span_first_slot: index of the first object slot of the span in the slot
+      columns, with an extra last element holding the total number of slots;
+    * slot_word0: the first word (candidate vptr) of each object slot;
+    * slot_free: bitmap, the bit of a slot is set if it is on a free-list.
+
+    The index is only valid for the core it was built from. When debugging a
+    core, the index is stored next to it by default and it is loaded
+    automatically on first use.
+    """
+    _magic = 'scylla-heap-index'
+    _version = 1
+    _columns = {
+        'span_start': 'Q',
+        'span_pages': 'Q',
+        'span_object_size': 'Q',
+        'span_first_slot': 'Q',
+        'slot_word0': 'Q',
+        'slot_free': 'B',
+    }
+
+    _directory = None
+    _instances = {} # shard -> heap_index or None
+
+    def __init__(self, shard_dir, meta):
+        self._dir = shard_dir
+        self._mmaps = []
+        self.meta = meta
+        self.shard = meta['shard']
+        self.mem_start = meta['mem_start']
+        self.page_size = meta['page_size']
+        for name in heap_index._columns:
+            setattr(self, name, self._map_column(name))
+        self.nr_spans = len(self.span_start)
+        self.nr_slots = len(self.slot_word0)
+        self._live_counts = {} # object size -> prefix sums of live objects of the pool's spans
+
+    def _map_column(self, name):
+        with open(os.path.join(self._dir, name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b'').cast(heap_index._columns[name])
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps.append(mm)
+        return memoryview(mm).cast(heap_index._columns[name])
+
+    def close(self):
+        for name in heap_index._columns:
+            getattr(self, name).release()
+        for mm in self._mmaps:
+            mm.close()
+        self._mmaps = []
+
+    @staticmethod
+    def default_directory():
+        if heap_index._directory is not None:
+            return heap_index._directory
+        core = get_core_file()
+        if core is None:
+            return None
+        return core + '.heap-index'
+
+    @staticmethod
+    def _core_identity():
+        core = get_core_file()
+        if core is None:
+            return None
+        st = os.stat(core)
+        return {'path': os.path.abspath(core), 'size': st.st_size, 'mtime': int(st.st_mtime)}
+
+    @staticmethod
+    def _shard_dir(directory, shard):
+        return os.path.join(directory, 'shard-{}'.format(shard))
+
+    @staticmethod
+    def build(directory):
+        """Build the index for the current shard, in `directory`."""
+        cpu_mem = gdb.parse_and_eval('\'seastar::memory::cpu_mem\'')
+        page_size = int(gdb.parse_and_eval('\'seastar::memory::page_size\''))
+        free_object_size = int(gdb.parse_and_eval('sizeof(\'seastar::memory::free_object\')'))
+        shard = current_shard()
+        shard_dir = heap_index._shard_dir(directory, shard)
+        os.makedirs(shard_dir, exist_ok=True)
+
+        span_start = array.array('Q')
+        span_pages = array.array('Q')
+        span_object_size = array.array('Q')
+        span_first_slot = array.array('Q')
+        span_freelist = {} # span index -> head of the span's free-list
+        nr_slots = 0
+
+        with open(os.path.join(shard_dir, 'slot_word0'), 'wb') as word0_file:
+            for s in spans():
+                span_start.append(s.start)
+                span_pages.append(s.size())
+                span_first_slot.append(nr_slots)
+                object_size = int(s.pool()['_object_size']) if s.is_small() else 0
+                if object_size < free_object_size:
+                    span_object_size.append(0)
+                    continue
+                span_object_size.append(object_size)
+                nr_objects = int(s.used_span_size()) * page_size // object_size
+                read_first_words(s.start, object_size, nr_objects).tofile(word0_file)
+                span_freelist[len(span_start) - 1] = int(s.page['freelist'])
+                nr_slots += nr_objects
+        span_first_slot.append(nr_slots)
+
+        for name, column in (('span_start', span_start), ('span_pages', span_pages),
+                             ('span_object_size', span_object_size), ('span_first_slot', span_first_slot)):
+            with open(os.path.join(shard_dir, name), 'wb') as f:
+                column.tofile(f)
+
+        # Free objects are linked through their first word, so free-lists can
+        # be walked on the columns built above, without going through gdb.
+        slot_free = bytearray((nr_slots + 7) // 8)
+        with open(os.path.join(shard_dir, 'slot_word0'), 'rb') as f:
+            slot_word0 = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast('Q') if nr_slots else []
+
+        def mark_free_list(ptr):
+            # Bound the walk, in case the free-list is corrupt.
+            for _ in range(nr_slots):
+                if not ptr:
+                    return
+                idx = bisect.bisect_right(span_start, ptr) - 1
+                if idx < 0 or not span_object_size[idx]:
+                    return
+                slot = span_first_slot[idx] + (ptr - span_start[idx]) // span_object_size[idx]
+                if slot >= span_first_slot[idx + 1]:
+                    return
+                slot_free[slot >> 3] |= 1 << (slot & 7)
+                ptr = slot_word0[slot]
+
+        for head in span_freelist.values():
+            mark_free_list(head)
+        small_pools = cpu_mem['small_pools']
+        for i in range(int(small_pools['nr_small_pools'])):
+            mark_free_list(int(small_pools['_u']['a'][i]['_free']))
+
+        if nr_slots:
+            slot_word0.release()
+        with open(os.path.join(shard_dir, 'slot_free'), 'wb') as f:
+            f.write(slot_free)
+
+        meta = {
+            'magic': heap_index._magic,
+            'version': heap_index._version,
+            'shard': shard,
+            'mem_start': int(cpu_mem['memory']),
+            'page_size': page_size,
+            'nr_pages': int(cpu_mem['nr_pages']),
+            'core': heap_index._core_identity(),
+        }
+        with open(os.path.join(shard_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        heap_index.drop(shard)
+
+        return len(span_start), nr_slots
+
+    @staticmethod
+    def load(directory, shard):
+        """Load the index of the given shard, returns None if there is no valid index for it."""
+        shard_dir = heap_index._shard_dir(directory, shard)
+        try:
+            with open(os.path.join(shard_dir, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('magic') != heap_index._magic or meta.get('version') != heap_index._version:
+            return None
+        if meta.get('core') != heap_index._core_identity():
+            gdb.write("heap-index: ignoring index in {}, it was built for a different core\n".format(shard_dir))
+            return None
+        return heap_index(shard_dir, meta)
+
+    @staticmethod
+    def get():
+        """Returns the index of the current shard, None if no index is available."""
+        shard = current_shard()
+        if shard not in heap_index._instances:
+            directory = heap_index.default_directory()
+            heap_index._instances[shard] = heap_index.load(directory, shard) if directory else None
+        return heap_index._instances[shard]
+
+    @staticmethod
+    def drop(shard=None):
+        """Unload the index of the given shard, or of all shards."""
+        if shard is None:
+            shards = list(heap_index._instances.keys())
+        else:
+            shards = [shard]
+        for s in shards:
+            index = heap_index._instances.pop(s, None)
+            if index is not None:
+                index.close()
+
+    def span_slots(self, span_idx):
+        return range(self.span_first_slot[span_idx], self.span_first_slot[span_idx + 1])
+
+    def is_live(self, slot):
+        return not self.slot_free[slot >> 3] & (1 << (slot & 7))
+
+    def slot_address(self, span_idx, slot):
+        return self.span_start[span_idx] + (slot - self.span_first_slot[span_idx]) * self.span_object_size[span_idx]
+
+    def find_span(self, ptr):
+        """Returns the index of the span containing ptr, None if ptr is not in any span."""
+        idx = bisect.bisect_right(self.span_start, ptr) - 1
+        if idx < 0 or ptr >= self.span_start[idx] + self.span_pages[idx] * self.page_size:
+            return None
+        return idx
+
+    def live_objects_of_span(self, span_idx):
+        """Yields (address, first word) for each live object of the span."""
+        object_size = self.span_object_size[span_idx]
+        addr = self.span_start[span_idx]
+        for slot in self.span_slots(span_idx):
+            if self.is_live(slot):
+                yield addr, self.slot_word0[slot]
+            addr += object_size
+
+    def live_objects(self):
+        """Yields (address, first word) for each live small object of the shard."""
+        for span_idx in range(self.nr_spans):
+            if self.span_object_size[span_idx]:
+                yield from self.live_objects_of_span(span_idx)
+
+    def _live_count(self, span_idx):
+        slots = self.span_slots(span_idx)
+        free = 0
+        for slot in slots:
+            if not self.is_live(slot):
+                free += 1
+        return len(slots) - free
+
+    def _pool_live_counts(self, object_size):
+        if object_size not in self._live_counts:
+            span_idxs = array.array('Q')
+            prefix = array.array('Q', [0])
+            for span_idx in range(self.nr_spans):
+                if self.span_object_size[span_idx] == object_size:
+                    span_idxs.append(span_idx)
+                    prefix.append(prefix[-1] + self._live_count(span_idx))
+            self._live_counts[object_size] = (span_idxs, prefix)
+        return self._live_counts[object_size]
+
+    def count_pool_objects(self, object_size):
+        return self._pool_live_counts(object_size)[1][-1]
+
+    def pool_objects(self, object_size, offset=0, count=0):
+        """Yields (address, first word) of the live objects of the pool with the given object size.
+
+        Starts at the `offset`-th live object of the pool, which is located
+        with a binary search on the per-span live counts.
+        Yields at most `count` objects, or all of them if `count` is 0.
+        """
+        span_idxs, prefix = self._pool_live_counts(object_size)
+        i = bisect.bisect_right(prefix, offset) - 1
+        skip = offset - prefix[i]
+        for span_idx in span_idxs[i:]:
+            for obj in self.live_objects_of_span(span_idx):
+                if skip:
+                    skip -= 1
+                    continue
+                yield obj
+                count -= 1
+                if not count:
+                    return
+
+    def analyze(self, ptr, thread):
+        """Returns pointer_metadata for ptr, None if ptr is not in a small span covered by the index."""
+        span_idx = self.find_span(ptr)
+        if span_idx is None or not self.span_object_size[span_idx]:
+            return None
+        ptr_meta = pointer_metadata(ptr, thread)
+        object_size = self.span_object_size[span_idx]
+        offset_in_span = ptr - self.span_start[span_idx]
+        slot = self.span_first_slot[span_idx] + offset_in_span // object_size
+        if slot >= self.span_first_slot[span_idx + 1]:
+            ptr_meta.mark_free()
+            return ptr_meta
+        ptr_meta.size = object_size
+        ptr_meta.is_small = True
+        ptr_meta.offset_in_object = offset_in_span % object_size
+        ptr_meta.is_live = self.is_live(slot)
+        ptr_meta.is_lsa = scylla_ptr.is_lsa(ptr)
+        return ptr_meta
+
+    def first_word(self, ptr):
+        """Returns the first word of the small object starting at ptr, None if not known."""
+        span_idx = self.find_span(ptr)
+        if span_idx is None or not self.span_object_size[span_idx]:
+            return None
+        offset_in_span = ptr - self.span_start[span_idx]
+        if offset_in_span % self.span_object_size[span_idx]:
+            return None
+        slot = self.span_first_slot[span_idx] + offset_in_span // self.span_object_size[span_idx]
+        if slot >= self.span_first_slot[span_idx + 1]:
+            return None
+        return self.slot_word0[slot]
+
+
+class scylla_heap_index(gdb.Command):
+    """Build and manage the on-disk heap index.
+
+    Scanning the seastar heap through gdb takes a very long time on large
+    coredumps and the scan is repeated by every command that needs it.
+    `scylla heap-index build` makes a single pass over the spans of all shards
+    and writes an index (see the `heap_index` class) that the following
+    commands use instead of scanning the heap through gdb:
+    * scylla find
+    * scylla task_histogram
+    * scylla small-objects
+    * everything built on find_vptrs(): scylla active-sstables, etc.
+
+    With --pointers, the reverse index of the pointers of the heap (see the
+    `pointer_index` class) is also built, it is used by `scylla find` and
+    `scylla generate-object-graph`.
+
+    By default, the index is stored next to the core (<core>.heap-index) and is
+    loaded automatically. When debugging a live process, or if the directory
+    of the core is not writable, specify a directory with `--directory`.
+    Note that an index built from a live process is not validated, it
+    becomes stale as soon as the process is resumed.
+
+    Subcommands:
+    * build: build the index for all shards (or only the current one, with --current-shard);
+    * load: (re)load the index, possibly from another directory;
+    * drop: unload the index, commands fall back to scanning the heap through gdb;
+    * status: print the state of the index of each loaded shard.
+
+    Example:
+    (gdb) scylla heap-index build
+    shard  0: 183761 spans, 7340561 object slots
+    shard  1: 179874 spans, 7203996 object slots
+    Heap index written to /var/lib/systemd/coredump/core.scylla.heap-index
+    """
+    def __init__(self):
+        gdb.Command.__init__(self, 'scylla heap-index', gdb.COMMAND_USER, gdb.COMPLETE_COMMAND)
+
+    def invoke(self, arg, from_tty):
+        parser = argparse.ArgumentParser(description="scylla heap-index")
+        parser.add_argument("command", choices=['build', 'load', 'drop', 'status'])
+        parser.add_argument("-d", "--directory", action="store", type=str, default=None,
+                help="Directory to store the index in, or to load it from. Defaults to <core>.heap-index.")
+        parser.add_argument("--current-shard", action="store_true", default=False,
+                help="Build the index only for the current shard.")
+        parser.add_argument("-p", "--pointers", action="store_true", default=False,
+                help="Also build the pointer index (see the `pointer_index` class), used by `scylla find` and `scylla generate-object-graph`.")
+        parser.add_argument("-j", "--jobs", action="store", type=int, default=1,
+                help="Number of worker processes building the pointer index of the shards in parallel.")
+
+        try:
+            args = parser.parse_args(arg.split())
+        except SystemExit:
+            return
+
+        if args.command == 'drop':
+            heap_index.drop()
+            pointer_index.drop()
+            heap_index._directory = None
+            return
+
+        if args.command == 'status':
+            for shard, index in sorted(heap_index._instances.items()):
+                if index is None:
+                    gdb.write('shard {:2}: no index\n'.format(shard))
+                else:
+                    gdb.write('shard {:2}: {} spans, {} object slots ({})\n'.format(shard, index.nr_spans, index.nr_slots, index._dir))
+            for shard, index in sorted(pointer_index._instances.items()):
+                if index is not None:
+                    gdb.write('shard {:2}: {} pointers\n'.format(shard, len(index)))
+            return
+
+        if args.directory is not None:
+            heap_index._directory = args.directory
+        directory = heap_index.default_directory()
+        if directory is None:
+            raise ValueError("Not debugging a core, the directory of the index has to be specified with --directory")
+
+        heap_index.drop()
+        pointer_index.drop()
+        if args.command == 'load':
+            return
+
+        if args.current_shard:
+            shards = [current_shard()]
+        else:
+            shards = None
+        orig = gdb.selected_thread()
+        try:
+            for r in reactors():
+                shard = int(r['_id'])
+                if shards is not None and shard not in shards:
+                    continue
+                nr_spans, nr_slots = heap_index.build(directory)
+                gdb.write('shard {:2}: {} spans, {} object slots\n'.format(shard, nr_spans, nr_slots))
+        finally:
+            orig.switch()
+        if args.pointers:
+            for shard, index in sorted(pointer_index.build(args.jobs, all_shards=not args.current_shard).items()):
+                index.store(directory)
+                gdb.write('shard {:2}: {} pointers\n'.format(shard, len(index)))
+        gdb.write('Heap index written to {}\n'.format(directory))
+
+
+class core_file_memory:
+    """Reads the memory of the debugged process directly from an ELF core file.
+
+    The virtual addresses are mapped to file offsets with the PT_LOAD segments
+    of the core. Doesn't use gdb, so it can be used from worker processes.
+    """
+    _PT_LOAD = 1
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != b'\x7fELF' or self._mm[4] != 2:
+            raise ValueError("{} is not a 64-bit ELF file".format(path))
+        endian = '<' if self._mm[5] == 1 else '>'
+        phoff, = struct.unpack_from(endian + 'Q', self._mm, 0x20)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', self._mm, 0x36)
+        segments = []
+        for i in range(phnum):
+            p_type, _, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = struct.unpack_from(endian + 'IIQQQQQQ', self._mm, phoff + i * phentsize)
+            if p_type == core_file_memory._PT_LOAD and p_memsz:
+                segments.append((p_vaddr, p_memsz, p_offset, p_filesz))
+        segments.sort()
+        self._segments = segments
+        self._starts = [s[0] for s in segments]
+
+    def read(self, addr, size):
+        """Returns `size` bytes from `addr`. Raises ValueError if the range is not in the core."""
+        chunks = []
+        while size > 0:
+            idx = bisect.bisect_right(self._starts, addr) - 1
+            if idx < 0 or addr >= self._segments[idx][0] + self._segments[idx][1]:
+                raise ValueError("address 0x{:x} is not in the core".format(addr))
+            vaddr, memsz, offset, filesz = self._segments[idx]
+            n = min(size, vaddr + memsz - addr)
+            start = addr - vaddr
+            # Parts of the segment not dumped to the file read as zeros.
+            data = self._mm[offset + start:offset + min(start + n, filesz)] if start < filesz else b''
+            chunks.append(data + bytes(n - len(data)))
+            addr += n
+            size -= n
+        return b''.join(chunks)
+
+
+class process_memory:
+    """Reads the memory of a live process from /proc/<pid>/mem, without gdb."""
+    def __init__(self, pid):
+        self._fd = os.open('/proc/{}/mem'.format(pid), os.O_RDONLY)
+
+    def read(self, addr, size):
+        return os.pread(self._fd, size, addr)
+
+
+def unpack_first_words(buf, object_size):
+    """Returns the first word of each of the consecutive objects of `object_size` in buf, as an array('Q')."""
+    if object_size % 8 == 0:
+        return array.array('Q', memoryview(buf).cast('Q')[::object_size // 8])
+    unpacker = struct.Struct('=Q{}x'.format(object_size - 8))
+    return array.array('Q', itertools.chain.from_iterable(unpacker.iter_unpack(buf)))
+
+
+class heap_layout:
+    """The layout of the seastar heap of a shard, as needed by scan_heap().
+
+    Collected with gdb, then passed to worker processes, which use it to
+    walk the heap directly from the core (see scan_heaps()).
+    """
+    _page_fields = ('free', 'offset_in_span', 'span_size', 'pool', 'freelist')
+
+    def __init__(self):
+        cpu_mem = gdb.parse_and_eval('\'seastar::memory::cpu_mem\'')
+        self.shard = current_shard()
+        self.page_size = int(gdb.parse_and_eval('\'seastar::memory::page_size\''))
+        self.mem_start = int(cpu_mem['memory'])
+        self.nr_pages = int(cpu_mem['nr_pages'])
+        self.pages = int(cpu_mem['pages'])
+        page_type = cpu_mem['pages'].type.target().strip_typedefs()
+        self.page_struct_size = page_type.sizeof
+        fields = {f.name: f for f in page_type.fields()}
+        # field name -> (bit position, bit size)
+        self.page_fields = {}
+        for name in heap_layout._page_fields:
+            f = fields[name]
+            self.page_fields[name] = (f.bitpos, f.bitsize or f.type.sizeof * 8)
+
+        self.free_object_size = int(gdb.parse_and_eval('sizeof(\'seastar::memory::free_object\')'))
+        small_pools = cpu_mem['small_pools']
+        self.pools = {} # pool address -> object size
+        self.pool_free_heads = {} # pool address -> head of the pool's free-list
+        for i in range(int(small_pools['nr_small_pools'])):
+            sp = small_pools['_u']['a'][i]
+            self.pools[int(sp.address)] = int(sp['_object_size'])
+            self.pool_free_heads[int(sp.address)] = int(sp['_free'])
+
+    def decode_pages(self, buf):
+        """Decode the page array into a list of (free, offset_in_span, span_size, pool, freelist) tuples."""
+        fields = [self.page_fields[name] for name in heap_layout._page_fields]
+        pages = []
+        for i in range(0, len(buf), self.page_struct_size):
+            page = []
+            for bitpos, bitsize in fields:
+                first_byte = i + bitpos // 8
+                last_byte = i + (bitpos + bitsize + 7) // 8
+                val = int.from_bytes(buf[first_byte:last_byte], sys.byteorder)
+                page.append((val >> (bitpos % 8)) & ((1 << bitsize) - 1))
+            pages.append(tuple(page))
+        return pages
+
+    def used_pages(self, pages, idx):
+        """The number of used pages of the small span starting at page idx, see span.used_span_size().
+
+        pages is the decoded page array, see decode_pages().
+        """
+        _, _, span_size, pool, _ = pages[idx]
+        used_pages = 0
+        for i in range(idx, min(idx + span_size, self.nr_pages)):
+            if pages[i][3] != pool or pages[i][1] != i - idx:
+                break
+            used_pages += 1
+        return used_pages
+
+
+def scan_heap(memory_source, layout, text_ranges, object_size=0, sg_offset=None):
+    """Scan the seastar heap of a shard, reading the memory directly.
+
+    Meant to run in a worker process, it doesn't use gdb.
+    Params:
+    * memory_source: ('core', path) or ('proc', pid), see scan_heaps();
+    * layout: heap_layout of the shard;
+    * text_ranges: as returned by get_text_ranges(), used to find vptrs;
+    * object_size: restrict the histogram to objects of this size, 0 means no restrictions;
+    * sg_offset: when set, the histogram is keyed by (vptr, scheduling group
+      id), the latter read as an unsigned from this offset of the object.
+
+    Returns a dict with the following items:
+    * pools: pool address -> {'object_size', 'spans', 'pages', 'used_pages', 'slots', 'span_free'};
+    * pool_free: pool address -> length of the pool's free-list;
+    * large: span size in pages -> number of large spans;
+    * histogram: vptr (or (vptr, sg id)) -> number of objects.
+    """
+    kind, arg = memory_source
+    mem = core_file_memory(arg) if kind == 'core' else process_memory(arg)
+    is_vptr = text_ranges_checker(text_ranges)
+
+    def read_word(addr):
+        return int.from_bytes(mem.read(addr, 8), sys.byteorder)
+
+    def free_list_length(head, limit):
+        n = 0
+        while head and n < limit:
+            n += 1
+            head = read_word(head)
+        return n
+
+    pages = layout.decode_pages(mem.read(layout.pages, layout.nr_pages * layout.page_struct_size))
+    pools = defaultdict(lambda: {'object_size': 0, 'spans': 0, 'pages': 0, 'used_pages': 0, 'slots': 0, 'span_free': 0})
+    large = defaultdict(int)
+    hist = defaultdict(int)
+    idx = 1
+    while idx < layout.nr_pages:
+        free, _, span_size, pool, freelist = pages[idx]
+        if span_size == 0:
+            idx += 1
+            continue
+        if not free and not pool:
+            large[span_size] += 1
+        elif not free and pool in layout.pools:
+            used_pages = layout.used_pages(pages, idx)
+            objsize = layout.pools[pool]
+            nr_objects = used_pages * layout.page_size // objsize
+            stats = pools[pool]
+            stats['object_size'] = objsize
+            stats['spans'] += 1
+            stats['pages'] += span_size
+            stats['used_pages'] += used_pages
+            stats['slots'] += nr_objects
+            stats['span_free'] += free_list_length(freelist, nr_objects)
+            if objsize >= layout.free_object_size and (object_size == 0 or objsize == object_size):
+                start = layout.mem_start + idx * layout.page_size
+                words = unpack_first_words(mem.read(start, nr_objects * objsize), objsize)
+                for i in is_vptr.filter(words):
+                    if sg_offset is None:
+                        hist[words[i]] += 1
+                    else:
+                        sg = int.from_bytes(mem.read(start + i * objsize + sg_offset, 4), sys.byteorder)
+                        hist[(words[i], sg)] += 1
+        idx += span_size
+
+    total_slots = sum(s['slots'] for s in pools.values())
+    pool_free = {p: free_list_length(head, total_slots) for p, head in layout.pool_free_heads.items()}
+    return {'pools': dict(pools), 'pool_free': pool_free, 'large': dict(large), 'histogram': dict(hist)}
+
+
+def get_memory_source():
+    """Returns the memory source of the workers of scan_heaps() and scan_pointers()."""
+    core = get_core_file()
+    if core is not None:
+        return ('core', core)
+    return ('proc', gdb.selected_inferior().pid)
+
+
+def scan_heaps(jobs, all_shards=True, **kwargs):
+    """Scan the seastar heaps of shards in parallel, with `jobs` worker processes.
+
+    The workers read the memory directly from the core file (or from
+    /proc/<pid>/mem for a live process), gdb is only used to collect the
+    layout of the heaps. See scan_heap() for the possible kwargs and the
+    returned results.
+    Returns a dict of shard -> result.
+    """
+    memory_source = get_memory_source()
+
+    layouts = []
+    if all_shards:
+        orig = gdb.selected_thread()
+        try:
+            for r in reactors():
+                layouts.append(heap_layout())
+        finally:
+            orig.switch()
+    else:
+        layouts.append(heap_layout())
+    text_ranges = get_text_ranges()
+
+    # Fork the workers, gdb's embedded interpreter cannot be spawned.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as executor:
+        futures = {l.shard: executor.submit(scan_heap, memory_source, l, text_ranges, **kwargs) for l in layouts}
+        return {shard: f.result() for shard, f in futures.items()}
+
+
+def scan_pointers(memory_source, layout, value_ranges, max_entries=0):
+    """Find the pointers into value_ranges, in the live objects of the seastar heap of a shard.
+
+    Meant to run in a worker process, it doesn't use gdb, see scan_heap().
+    Params:
+    * memory_source: ('core', path) or ('proc', pid), see scan_heaps();
+    * layout: heap_layout of the shard;
+    * value_ranges: [(start, end)] ranges (end inclusive) of the values to collect;
+    * max_entries: give up if more pointers are found, 0 means no limit.
+
+    Returns the (target, source, offset) columns of the pointers, sorted by
+    target, see pointer_index. Returns None if max_entries was exceeded.
+    """
+    kind, arg = memory_source
+    mem = core_file_memory(arg) if kind == 'core' else process_memory(arg)
+    is_value = text_ranges_checker(value_ranges)
+
+    def read_word(addr):
+        return int.from_bytes(mem.read(addr, 8), sys.byteorder)
+
+    def free_objects(head, limit):
+        objs = set()
+        while head and len(objs) < limit:
+            objs.add(head)
+            head = read_word(head)
+        return objs
+
+    pages = layout.decode_pages(mem.read(layout.pages, layout.nr_pages * layout.page_struct_size))
+    pool_free = set()
+    for head in layout.pool_free_heads.values():
+        pool_free |= free_objects(head, layout.nr_pages * layout.page_size // layout.free_object_size)
+
+    targets, sources, offsets = array.array('Q'), array.array('Q'), array.array('Q')
+    idx = 1
+    while idx < layout.nr_pages:
+        free, _, span_size, pool, freelist = pages[idx]
+        if span_size == 0:
+            idx += 1
+            continue
+        start = layout.mem_start + idx * layout.page_size
+        if not free and not pool:
+            words = memoryview(mem.read(start, span_size * layout.page_size)).cast('Q')
+            for i in is_value.filter(words):
+                targets.append(words[i])
+                sources.append(start)
+                offsets.append(i * 8)
+        elif not free and pool in layout.pools and layout.pools[pool] >= layout.free_object_size:
+            used_pages = layout.used_pages(pages, idx)
+            objsize = layout.pools[pool]
+            nr_objects = used_pages * layout.page_size // objsize
+            words = memoryview(mem.read(start, nr_objects * objsize)).cast('Q')
+            span_free = None
+            for i in is_value.filter(words):
+                if span_free is None:
+                    span_free = free_objects(freelist, nr_objects)
+                offset = i * 8
+                source = start + offset // objsize * objsize
+                if source in span_free or source in pool_free:
+                    continue
+                targets.append(words[i])
+                sources.append(source)
+                offsets.append(offset % objsize)
+        if max_entries and len(targets) > max_entries:
+            return None
+        idx += span_size
+
+    # Sort the columns through a permutation, (target, source, offset) tuples
+    # would take several times the memory of the columns.
+    order = sorted(range(len(targets)), key=targets.__getitem__)
+    return tuple(array.array('Q', map(column.__getitem__, order)) for column in (targets, sources, offsets))
+
+
+class pointer_index:
+    """Reverse index of the pointers in the seastar heap of a shard.
+
+    Finding the referrers of an object with `find` requires a search of the
+    whole heap, for each offset within the object. The pointer index is
+    built with a single pass over the live objects of the shard (see
+    scan_pointers()), it contains a (target, source, offset) triple for each
+    word of a live object pointing into the seastar heap (of any shard):
+    * target: the value of the pointer;
+    * source: the address of the object containing the pointer;
+    * offset: the offset of the pointer within the source object.
+
+    The triples are stored in three array-backed columns, sorted by target,
+    so the referrers of a range of addresses are found with a bisect. The
+    index is stored alongside the heap index (see `heap_index`), when one
+    is available, so it can be reused by later commands and sessions.
+    """
+    _version = 1
+    _columns = ('ptr_target', 'ptr_source', 'ptr_offset')
+    _entry_size = 8 * len(_columns)
+    # Peak memory used by scan_pointers() per entry, mostly by sorting the
+    # columns: the permutation and the sort keys are lists of Python ints.
+    _build_entry_cost = 128
+
+    _instances = {} # shard -> pointer_index or None
+
+    def __init__(self, shard, target, source, offset, mmaps=()):
+        self.shard = shard
+        self.target = target
+        self.source = source
+        self.offset = offset
+        self._mmaps = list(mmaps)
+        self._value_ranges = None
+
+    def __len__(self):
+        return len(self.target)
+
+    def close(self):
+        for column in (self.target, self.source, self.offset):
+            if isinstance(column, memoryview):
+                column.release()
+        for mm in self._mmaps:
+            mm.close()
+        self._mmaps = []
+
+    def referrers(self, start, end):
+        """Yields the (source, offset, target) of the pointers to the [start, end) address range."""
+        lo = bisect.bisect_left(self.target, start)
+        hi = bisect.bisect_left(self.target, end, lo)
+        for i in range(lo, hi):
+            yield self.source[i], self.offset[i], self.target[i]
+
+    def covers(self, value):
+        """Whether the pointers with the given value are in the index, see value_ranges()."""
+        if self._value_ranges is None:
+            self._value_ranges = pointer_index.value_ranges()
+        return any(start <= value <= end for start, end in self._value_ranges)
+
+    @staticmethod
+    def value_ranges():
+        """The ranges of the seastar heaps of all shards."""
+        return [(start, start + size - 1) for _, start, size in seastar_memory_layout()]
+
+    @staticmethod
+    def build(jobs=1, all_shards=False, memory_budget=0):
+        """Build the index of the current shard, or of all shards, in `jobs` worker processes.
+
+        Returns a dict of shard -> pointer_index, the index of shards whose
+        index would need more than memory_budget (in bytes, 0 means no limit)
+        to build is None.
+        """
+        memory_source = get_memory_source()
+        value_ranges = pointer_index.value_ranges()
+        max_entries = memory_budget // pointer_index._build_entry_cost
+        layouts = []
+        if all_shards:
+            orig = gdb.selected_thread()
+            try:
+                for r in reactors():
+                    layouts.append(heap_layout())
+            finally:
+                orig.switch()
+        else:
+            layouts.append(heap_layout())
+
+        if len(layouts) == 1 or jobs <= 1:
+            results = {l.shard: scan_pointers(memory_source, l, value_ranges, max_entries) for l in layouts}
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as executor:
+                futures = {l.shard: executor.submit(scan_pointers, memory_source, l, value_ranges, max_entries) for l in layouts}
+                results = {shard: f.result() for shard, f in futures.items()}
+
+        indexes = {}
+        for shard, columns in results.items():
+            indexes[shard] = pointer_index(shard, *columns) if columns is not None else None
+            pointer_index.drop(shard)
+            pointer_index._instances[shard] = indexes[shard]
+        return indexes
+
+    def store(self, directory):
+        shard_dir = heap_index._shard_dir(directory, self.shard)
+        os.makedirs(shard_dir, exist_ok=True)
+        for name, column in zip(pointer_index._columns, (self.target, self.source, self.offset)):
+            with open(os.path.join(shard_dir, name), 'wb') as f:
+                f.write(column)
+        with open(os.path.join(shard_dir, 'pointers.json'), 'w') as f:
+            json.dump({'version': pointer_index._version, 'shard': self.shard, 'core': heap_index._core_identity()}, f)
+
+    @staticmethod
+    def load(directory, shard):
+        """Load the index of the given shard, returns None if there is no valid index for it."""
+        shard_dir = heap_index._shard_dir(directory, shard)
+        try:
+            with open(os.path.join(shard_dir, 'pointers.json'), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != pointer_index._version or meta.get('core') != heap_index._core_identity():
+            return None
+        columns = []
+        mmaps = []
+        for name in pointer_index._columns:
+            with open(os.path.join(shard_dir, name), 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    columns.append(array.array('Q'))
+                    continue
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            mmaps.append(mm)
+            columns.append(memoryview(mm).cast('Q'))
+        return pointer_index(shard, *columns, mmaps=mmaps)
+
+    @staticmethod
+    def get(build=False, memory_budget=0):
+        """Returns the index of the current shard.
+
+        The index is loaded from the directory of the heap index, if it was
+        stored there. If it is not available, it is built when `build` is
+        set (and stored, if there is a heap index directory), otherwise
+        None is returned. None is also returned if the index of the shard
+        doesn't fit in memory_budget.
+        """
+        shard = current_shard()
+        if shard not in pointer_index._instances or (pointer_index._instances[shard] is None and build):
+            directory = heap_index.default_directory()
+            index = pointer_index.load(directory, shard) if directory else None
+            if index is None and build:
+                index = pointer_index.build(memory_budget=memory_budget)[shard]
+                if index is not None and directory:
+                    try:
+                        index.store(directory)
+                    except OSError as e:
+                        gdb.write("pointer_index: failed to store the index in {}: {}\n".format(directory, e))
+            pointer_index._instances[shard] = index
+        index = pointer_index._instances[shard]
+        if index is not None and memory_budget and len(index) * pointer_index._entry_size > memory_budget:
+            return None
+        return index
+
+    @staticmethod
+    def drop(shard=None):
+        """Unload the index of the given shard, or of all shards."""
+        shards = list(pointer_index._instances.keys()) if shard is None else [shard]
+        for s in shards:
+            index = pointer_index._instances.pop(s, None)
+            if index is not None:
+                index.close()
+
+
 class scylla_memory(gdb.Command):
     """Summarize the state of the shard's memory.
 
@@ -2252,6 +3253,15 @@ class scylla_memory(gdb.Command):
     In an OOM situation the latter usually shows the immediate symptoms, one
     or more heavily populated size classes eating up all memory. The overview
     can be used to identify the subsystem that owns these problematic objects.
+
+    With --all-shards, the summaries of all shards are shown side by side, a
+    row per metric and a column per shard. --format json|csv emits the
+    summaries in a machine readable form, the json output of a healthy node
+    can be passed later to --baseline, to list the metrics which grew since:
+
+        (gdb) scylla memory --all-shards --format json -o healthy.json
+        ...
+        (gdb) scylla memory --all-shards --baseline healthy.json
     """
 
     def __init__(self):
@@ -2421,60 +3431,71 @@ class scylla_memory(gdb.Command):
             gdb.write('      {:9} Total (all)\n'.format(total))
         gdb.write('\n')
 
-    def invoke(self, arg, from_tty):
+    @staticmethod
+    def collect_summary(heap=None):
+        """Collect the memory summary of the current shard, as a dict.
+
+        heap is the result of scan_heap() for the shard, when the spans were
+        scanned by worker processes, otherwise the spans are walked through gdb.
+        """
         cpu_mem = gdb.parse_and_eval('\'seastar::memory::cpu_mem\'')
         page_size = int(gdb.parse_and_eval('\'seastar::memory::page_size\''))
         free_mem = int(cpu_mem['nr_free_pages']) * page_size
         total_mem = int(cpu_mem['nr_pages']) * page_size
-        gdb.write('Used memory: {used_mem:>13}\nFree memory: {free_mem:>13}\nTotal memory: {total_mem:>12}\n\n'
-                  .format(used_mem=total_mem - free_mem, free_mem=free_mem, total_mem=total_mem))
+        summary = {'shard': current_shard()}
+        summary['memory'] = {'used': total_mem - free_mem, 'free': free_mem, 'total': total_mem}
 
         lsa = get_lsa_segment_pool()
         segment_size = int(gdb.parse_and_eval('\'logalloc::segment::size\''))
         lsa_free = int(lsa['_free_segments']) * segment_size
         lsa_used = int(lsa['_segments_in_use']) * segment_size
         lsa_allocated = lsa_used + lsa_free
-
-        gdb.write('LSA:\n'
-                  '  allocated: {lsa:>13}\n'
-                  '  used:      {lsa_used:>13}\n'
-                  '  free:      {lsa_free:>13}\n\n'
-                  .format(lsa=lsa_allocated, lsa_used=lsa_used, lsa_free=lsa_free))
+        summary['lsa'] = {'allocated': lsa_allocated, 'used': lsa_used, 'free': lsa_free}
 
         db = find_db()
         cache_region = lsa_region(db['_row_cache_tracker']['_region'])
+        summary['cache'] = {'total': cache_region.total(), 'used': cache_region.used(), 'free': cache_region.free()}
+
+        regular = dirty_mem_mgr(db['_dirty_memory_manager'])
+        system = dirty_mem_mgr(db['_system_dirty_memory_manager'])
+        summary['memtables'] = {
+            'total': lsa_allocated - cache_region.total(),
+            'regular_real_dirty': regular.real_dirty(),
+            'regular_unspooled': regular.unspooled(),
+            'system_real_dirty': system.real_dirty(),
+            'system_unspooled': system.unspooled(),
+        }
 
-        gdb.write('Cache:\n'
-                  '  total:     {cache_total:>13}\n'
-                  '  used:      {cache_used:>13}\n'
-                  '  free:      {cache_free:>13}\n\n'
-                  .format(cache_total=cache_region.total(), cache_used=cache_region.used(), cache_free=cache_region.free()))
-
-        gdb.write('Memtables:\n'
-                  ' total:       {total:>13}\n'
-                  ' Regular:\n'
-                  '  real dirty: {reg_real_dirty:>13}\n'
-                  '  unspooled:  {reg_unspooled:>13}\n'
-                  ' System:\n'
-                  '  real dirty: {sys_real_dirty:>13}\n'
-                  '  unspooled:  {sys_unspooled:>13}\n\n'
-                  .format(total=(lsa_allocated-cache_region.total()),
-                          reg_real_dirty=dirty_mem_mgr(db['_dirty_memory_manager']).real_dirty(),
-                          reg_unspooled=dirty_mem_mgr(db['_dirty_memory_manager']).unspooled(),
-                          sys_real_dirty=dirty_mem_mgr(db['_system_dirty_memory_manager']).real_dirty(),
-                          sys_unspooled=dirty_mem_mgr(db['_system_dirty_memory_manager']).unspooled()))
-
-        scylla_memory.print_coordinator_stats()
-        scylla_memory.print_replica_stats()
-
-        gdb.write('Small pools:\n')
         small_pools = cpu_mem['small_pools']
         nr = small_pools['nr_small_pools']
-        gdb.write('{objsize:>5} {span_size:>6} {use_count:>10} {memory:>12} {unused:>12} {wasted_percent:>5}\n'
-                  .format(objsize='objsz', span_size='spansz', use_count='usedobj', memory='memory',
-                          unused='unused', wasted_percent='wst%'))
+        if heap is not None:
+            def pool_usage(sp, object_size):
+                stats = heap['pools'].get(int(sp.address))
+                if stats is None:
+                    return 0, 0
+                return stats['pages'], stats['slots']
+
+            large_allocs = defaultdict(int, ((span_size * page_size, count) for span_size, count in heap['large'].items()))
+        else:
+            sc = span_checker()
+
+            def pool_usage(sp, object_size):
+                pages_in_use = 0
+                use_count = 0
+                for s in sc.spans():
+                    if not s.is_free() and s.pool() == sp.address:
+                        pages_in_use += s.size()
+                        use_count += int(s.used_span_size() * page_size / object_size)
+                return pages_in_use, use_count
+
+            large_allocs = defaultdict(int) # key: span size [B], value: span count
+            for s in sc.spans():
+                span_size = s.size()
+                if s.is_large():
+                    large_allocs[span_size * page_size] += 1
+
+        pools = []
         total_small_bytes = 0
-        sc = span_checker()
         free_object_size = gdb.parse_and_eval('sizeof(\'seastar::memory::free_object\')')
         for i in range(int(nr)):
             sp = small_pools['_u']['a'][i]
@@ -2484,32 +3505,19 @@ class scylla_memory(gdb.Command):
                 continue
             span_size = int(sp['_span_sizes']['preferred']) * page_size
             free_count = int(sp['_free_count'])
-            pages_in_use = 0
-            use_count = 0
-            for s in sc.spans():
-                if not s.is_free() and s.pool() == sp.address:
-                    pages_in_use += s.size()
-                    use_count += int(s.used_span_size() * page_size / object_size)
+            pages_in_use, use_count = pool_usage(sp, object_size)
             memory = pages_in_use * page_size
             total_small_bytes += memory
             use_count -= free_count
             wasted = free_count * object_size
             unused = memory - use_count * object_size
             wasted_percent = wasted * 100.0 / memory if memory else 0
-            gdb.write('{objsize:5} {span_size:6} {use_count:10} {memory:12} {unused:12} {wasted_percent:5.1f}\n'
-                      .format(objsize=object_size, span_size=span_size, use_count=use_count, memory=memory, unused=unused,
-                              wasted_percent=wasted_percent))
-        gdb.write('Small allocations: %d [B]\n' % total_small_bytes)
-
-        large_allocs = defaultdict(int) # key: span size [B], value: span count
-        for s in sc.spans():
-            span_size = s.size()
-            if s.is_large():
-                large_allocs[span_size * page_size] += 1
-
-        gdb.write('Page spans:\n')
-        gdb.write('{index:5} {size:>13} {total:>13} {allocated_size:>13} {allocated_count:>7}\n'.format(
-            index="index", size="size [B]", total="free [B]", allocated_size="large [B]", allocated_count="[spans]"))
+            pools.append({'object_size': object_size, 'span_size': span_size, 'use_count': use_count, 'memory': memory,
+                          'unused': unused, 'wasted_percent': wasted_percent})
+        summary['small_pools'] = pools
+        summary['small_total'] = total_small_bytes
+
+        spans = []
         total_large_bytes = 0
         for index in range(int(cpu_mem['nr_span_lists'])):
             span_list = cpu_mem['free_spans'][index]
@@ -2523,10 +3531,208 @@ class scylla_memory(gdb.Command):
             span_size = (1 << index) * page_size
             allocated_size = large_allocs[span_size] * span_size
             total_large_bytes += allocated_size
-            gdb.write('{index:5} {size:13} {total:13} {allocated_size:13} {allocated_count:7}\n'.format(index=index, size=span_size, total=total * page_size,
-                                                                allocated_count=large_allocs[span_size],
-                                                                allocated_size=allocated_size))
-        gdb.write('Large allocations: %d [B]\n' % total_large_bytes)
+            spans.append({'index': index, 'size': span_size, 'free': total * page_size,
+                          'large': allocated_size, 'large_count': large_allocs[span_size]})
+        summary['page_spans'] = spans
+        summary['large_total'] = total_large_bytes
+        return summary
+
+    @staticmethod
+    def flatten_summary(summary):
+        """Flatten a summary into a dict of metric name -> value, e.g. 'lsa.used' or 'small_pools.1024.memory'."""
+        flat = {}
+        for section in ('memory', 'lsa', 'cache', 'memtables'):
+            for key, value in summary[section].items():
+                flat['{}.{}'.format(section, key)] = value
+        for pool in summary['small_pools']:
+            for key in ('use_count', 'memory', 'unused'):
+                flat['small_pools.{}.{}'.format(pool['object_size'], key)] = pool[key]
+        flat['small_pools.total'] = summary['small_total']
+        for span in summary['page_spans']:
+            for key in ('free', 'large', 'large_count'):
+                flat['page_spans.{}.{}'.format(span['size'], key)] = span[key]
+        flat['page_spans.large_total'] = summary['large_total']
+        return flat
+
+    @staticmethod
+    def write_overview(write, summary):
+        write('Used memory: {used:>13}\nFree memory: {free:>13}\nTotal memory: {total:>12}\n\n'.format(**summary['memory']))
+
+        write('LSA:\n'
+              '  allocated: {allocated:>13}\n'
+              '  used:      {used:>13}\n'
+              '  free:      {free:>13}\n\n'
+              .format(**summary['lsa']))
+
+        write('Cache:\n'
+              '  total:     {total:>13}\n'
+              '  used:      {used:>13}\n'
+              '  free:      {free:>13}\n\n'
+              .format(**summary['cache']))
+
+        write('Memtables:\n'
+              ' total:       {total:>13}\n'
+              ' Regular:\n'
+              '  real dirty: {regular_real_dirty:>13}\n'
+              '  unspooled:  {regular_unspooled:>13}\n'
+              ' System:\n'
+              '  real dirty: {system_real_dirty:>13}\n'
+              '  unspooled:  {system_unspooled:>13}\n\n'
+              .format(**summary['memtables']))
+
+    @staticmethod
+    def write_allocator(write, summary):
+        write('Small pools:\n')
+        write('{objsize:>5} {span_size:>6} {use_count:>10} {memory:>12} {unused:>12} {wasted_percent:>5}\n'
+              .format(objsize='objsz', span_size='spansz', use_count='usedobj', memory='memory',
+                      unused='unused', wasted_percent='wst%'))
+        for pool in summary['small_pools']:
+            write('{object_size:5} {span_size:6} {use_count:10} {memory:12} {unused:12} {wasted_percent:5.1f}\n'.format(**pool))
+        write('Small allocations: %d [B]\n' % summary['small_total'])
+
+        write('Page spans:\n')
+        write('{index:5} {size:>13} {total:>13} {allocated_size:>13} {allocated_count:>7}\n'.format(
+            index="index", size="size [B]", total="free [B]", allocated_size="large [B]", allocated_count="[spans]"))
+        for span in summary['page_spans']:
+            write('{index:5} {size:13} {free:13} {large:13} {large_count:7}\n'.format(**span))
+        write('Large allocations: %d [B]\n' % summary['large_total'])
+
+    @staticmethod
+    def write_table(write, summaries, csv_format=False):
+        """Write the flattened summaries of all shards side by side, a row per metric, a column per shard."""
+        flats = [scylla_memory.flatten_summary(s) for s in summaries]
+        names = list(dict.fromkeys(name for flat in flats for name in flat))
+        header = ['metric'] + ['shard{}'.format(s['shard']) for s in summaries] + ['total']
+        rows = []
+        for name in names:
+            values = [flat.get(name, 0) for flat in flats]
+            rows.append([name] + values + [sum(values)])
+        if csv_format:
+            out = io.StringIO()
+            w = csv.writer(out, lineterminator='\n')
+            w.writerow(header)
+            w.writerows(rows)
+            write(out.getvalue())
+            return
+        widths = [max(len(str(r[i])) for r in [header] + rows) for i in range(len(header))]
+        for row in [header] + rows:
+            write(' '.join(str(c).ljust(widths[0]) if i == 0 else str(c).rjust(widths[i]) for i, c in enumerate(row)) + '\n')
+
+    @staticmethod
+    def diff(summaries, baseline, threshold):
+        """Compare the totals of the metrics of summaries with those of baseline.
+
+        Returns [(metric, baseline total, total, delta, growth %, grew)], the
+        metrics which grew the most first. Metrics grew if their growth exceeds
+        threshold percent.
+        """
+        def totals(summaries):
+            result = defaultdict(int)
+            for s in summaries:
+                for name, value in scylla_memory.flatten_summary(s).items():
+                    result[name] += value
+            return result
+
+        current = totals(summaries)
+        base = totals(baseline['shards'])
+        rows = []
+        for name in list(dict.fromkeys(list(base) + list(current))):
+            old = base.get(name, 0)
+            new = current.get(name, 0)
+            delta = new - old
+            growth = delta * 100.0 / old if old else (100.0 if delta > 0 else 0.0)
+            rows.append((name, old, new, delta, growth, delta > 0 and growth > threshold))
+        rows.sort(key=lambda r: (not r[5], -r[3]))
+        return rows
+
+    @staticmethod
+    def write_diff(write, rows, output_format):
+        if output_format == 'json':
+            write(json.dumps([{'metric': r[0], 'baseline': r[1], 'current': r[2], 'delta': r[3], 'growth_percent': r[4], 'grew': r[5]}
+                              for r in rows], indent=2) + '\n')
+            return
+        header = ('metric', 'baseline', 'current', 'delta', 'growth%', '')
+        if output_format == 'csv':
+            out = io.StringIO()
+            w = csv.writer(out, lineterminator='\n')
+            w.writerow(header[:-1] + ('grew',))
+            w.writerows(rows)
+            write(out.getvalue())
+            return
+        width = max([len(r[0]) for r in rows] + [len(header[0])])
+        write('{:{width}} {:>15} {:>15} {:>15} {:>8}\n'.format(*header[:-1], width=width))
+        for name, old, new, delta, growth, grew in rows:
+            # Highlight the metrics which grew
+            write('{:{width}} {:15} {:15} {:+15} {:+8.1f}{}\n'.format(name, old, new, delta, growth, ' <<<' if grew else '', width=width))
+
+    def invoke(self, arg, from_tty):
+        parser = argparse.ArgumentParser(description="scylla memory")
+        parser.add_argument("-j", "--jobs", action="store", type=int, default=0,
+                help="Scan the spans of the shard(s) in worker processes reading the core file directly,"
+                " instead of through gdb. Speeds up the small pool and page span statistics on large cores.")
+        parser.add_argument("-a", "--all-shards", action="store_true",
+                help="Summarize the memory of all shards, side by side.")
+        parser.add_argument("-f", "--format", choices=['text', 'json', 'csv'], default='text',
+                help="Output format. json is the input format of --baseline.")
+        parser.add_argument("-o", "--output", action="store", default=None,
+                help="Write the summary to this file instead of the console.")
+        parser.add_argument("-b", "--baseline", action="store", default=None,
+                help="Compare against the summary of a healthy node (written with --format json, from a core of the same build)"
+                " and highlight the size classes and subsystems which grew.")
+        parser.add_argument("-t", "--threshold", action="store", type=float, default=10.0,
+                help="Growth, in percent, above which a metric is highlighted by --baseline (default: 10).")
+        try:
+            args = parser.parse_args(arg.split())
+        except SystemExit:
+            return
+
+        if not args.all_shards and not args.baseline and args.format == 'text' and args.output is None:
+            heap = scan_heaps(args.jobs, all_shards=False)[current_shard()] if args.jobs else None
+            summary = scylla_memory.collect_summary(heap)
+            scylla_memory.write_overview(gdb.write, summary)
+            scylla_memory.print_coordinator_stats()
+            scylla_memory.print_replica_stats()
+            scylla_memory.write_allocator(gdb.write, summary)
+            return
+
+        heaps = scan_heaps(args.jobs, all_shards=args.all_shards) if args.jobs else {}
+        summaries = []
+        if args.all_shards:
+            orig = gdb.selected_thread()
+            try:
+                for r in reactors():
+                    summaries.append(scylla_memory.collect_summary(heaps.get(int(r['_id']))))
+            finally:
+                orig.switch()
+            summaries.sort(key=lambda s: s['shard'])
+        else:
+            summaries.append(scylla_memory.collect_summary(heaps.get(current_shard())))
+
+        objfile = symbol_table._executable()
+        build_id = objfile.build_id if objfile is not None else None
+
+        out = open(args.output, 'w') if args.output else None
+        write = out.write if out else gdb.write
+        try:
+            if args.baseline:
+                with open(args.baseline) as f:
+                    baseline = json.load(f)
+                if baseline.get('build_id') != build_id:
+                    gdb.write('Warning: the baseline is from build {}, this core is from build {}\n'.format(baseline.get('build_id'), build_id))
+                scylla_memory.write_diff(write, scylla_memory.diff(summaries, baseline, args.threshold), args.format)
+            elif args.format == 'json':
+                write(json.dumps({'build_id': build_id, 'shards': summaries}, indent=2) + '\n')
+            elif args.format == 'csv':
+                scylla_memory.write_table(write, summaries, csv_format=True)
+            elif len(summaries) == 1:
+                scylla_memory.write_overview(write, summaries[0])
+                scylla_memory.write_allocator(write, summaries[0])
+            else:
+                scylla_memory.write_table(write, summaries)
+        finally:
+            if out:
+                out.close()
+                gdb.write('Wrote {}\n'.format(args.output))
 
 
 class TreeNode(object):
@@ -2634,6 +3840,108 @@ def print_tree(root_node,
         print_node(root_node, [])
 
 
+def heapprof_sites():
+    """Yields the (size, count, addresses) of the sites of the heap profiler.
+
+    The addresses are those of the frames of the backtrace of the site,
+    innermost first, memory::get_backtrace() excluded. The frames of a
+    backtrace are read with a single memory read, instead of a gdb value per
+    frame.
+    """
+    cpu_mem = gdb.parse_and_eval('\'seastar::memory::cpu_mem\'')
+    site = cpu_mem['alloc_site_list_head']
+    if not site:
+        return
+    inf = gdb.selected_inferior()
+    frame_type = site['backtrace']['_main']['_frames'].type.strip_typedefs().template_argument(0)
+    frame_size = frame_type.sizeof
+    addr_offset = next(f.bitpos // 8 for f in frame_type.fields() if f.name == 'addr')
+
+    while site:
+        size = int(site['size'])
+        if size:
+            frames = static_vector(site['backtrace']['_main']['_frames'])
+            nr_frames = len(frames)
+            buf = inf.read_memory(frames.data_address(), nr_frames * frame_size)
+            addresses = [struct.unpack_from('=Q', buf, i * frame_size + addr_offset)[0] for i in range(1, nr_frames)]
+            yield size, int(site['count']), addresses
+        site = site['next']
+
+
+class pprof_writer:
+    """Writes a profile in the protobuf format of pprof.
+
+    See https://github.com/google/pprof/blob/main/proto/profile.proto. Only
+    the handful of messages needed are encoded, by hand, so there is no
+    dependency on the protobuf package.
+    """
+    def __init__(self, sample_types, default_sample_type=None):
+        self._strings = {'': 0}
+        self._functions = {} # name -> id
+        self._locations = {} # address -> (id, function id)
+        self._samples = []
+        self._sample_types = [(self._string(t), self._string(u)) for t, u in sample_types]
+        self._default_sample_type = self._string(default_sample_type) if default_sample_type else 0
+
+    @staticmethod
+    def _varint(value):
+        out = bytearray()
+        value &= (1 << 64) - 1
+        while value >= 0x80:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+        return out
+
+    @staticmethod
+    def _uint(field, value):
+        return pprof_writer._varint(field << 3) + pprof_writer._varint(value)
+
+    @staticmethod
+    def _bytes(field, data):
+        return pprof_writer._varint(field << 3 | 2) + pprof_writer._varint(len(data)) + data
+
+    @staticmethod
+    def _packed(field, values):
+        return pprof_writer._bytes(field, b''.join(pprof_writer._varint(v) for v in values))
+
+    def _string(self, s):
+        return self._strings.setdefault(s, len(self._strings))
+
+    def location(self, address, name):
+        """Returns the id of the location of address, inside function name."""
+        try:
+            return self._locations[address][0]
+        except KeyError:
+            pass
+        function_id = self._functions.setdefault(name, len(self._functions) + 1)
+        location_id = len(self._locations) + 1
+        self._locations[address] = (location_id, function_id)
+        return location_id
+
+    def add_sample(self, location_ids, values):
+        """Adds a sample, location_ids are those of the frames of the stack, leaf first."""
+        self._samples.append((location_ids, values))
+
+    def write(self, out):
+        """Writes the profile to the binary file out."""
+        for type_idx, unit_idx in self._sample_types:
+            out.write(self._bytes(1, self._uint(1, type_idx) + self._uint(2, unit_idx)))
+        for location_ids, values in self._samples:
+            out.write(self._bytes(2, self._packed(1, location_ids) + self._packed(2, values)))
+        for address, (location_id, function_id) in self._locations.items():
+            line = self._uint(1, function_id)
+            out.write(self._bytes(4, self._uint(1, location_id) + self._uint(3, address) + self._bytes(4, line)))
+        for name, function_id in self._functions.items():
+            name_idx = self._string(name)
+            out.write(self._bytes(5, self._uint(1, function_id) + self._uint(2, name_idx) + self._uint(3, name_idx)))
+        # The string table has to be written last, the functions above may have added strings to it
+        for string in self._strings:
+            out.write(self._bytes(6, string.encode('utf-8')))
+        if self._default_sample_type:
+            out.write(self._uint(14, self._default_sample_type))
+
+
 class scylla_heapprof(gdb.Command):
     def __init__(self):
         gdb.Command.__init__(self, 'scylla heapprof', gdb.COMMAND_USER, gdb.COMPLETE_COMMAND)
@@ -2647,7 +3955,12 @@ class scylla_heapprof(gdb.Command):
         parser.add_argument("--no-symbols", action="store_true",
                             help="Show only raw addresses")
         parser.add_argument("--flame", action="store_true",
-                            help="Write flamegraph data to heapprof.stacks instead of showing the profile")
+                            help="Write flamegraph data (folded stacks) to heapprof.stacks instead of showing the profile")
+        parser.add_argument("--pprof", action="store_true",
+                            help="Write the profile in the pprof format to heapprof.pb.gz instead of showing the profile."
+                            " Can be loaded by `pprof` and diffed with the profile of another node or build (pprof -diff_base)")
+        parser.add_argument("-o", "--output", action="store", default=None,
+                            help="Name of the file written by --flame or --pprof")
         parser.add_argument("--min", action="store", type=int, default=0,
                             help="Drop branches allocating less than given amount")
         try:
@@ -2655,71 +3968,83 @@ class scylla_heapprof(gdb.Command):
         except SystemExit:
             return
 
-        root = ProfNode(None)
-        cpu_mem = gdb.parse_and_eval('\'seastar::memory::cpu_mem\'')
-        site = cpu_mem['alloc_site_list_head']
+        # Each distinct address is resolved only once
+        symbols = {}
 
-        while site:
-            size = int(site['size'])
-            count = int(site['count'])
-            if size:
-                n = root
-                n.size += size
-                n.count += count
-                bt = site['backtrace']['_main']
-                addresses = list(int(f['addr']) for f in static_vector(bt['_frames']))
-                addresses.pop(0)  # drop memory::get_backtrace()
-                if args.inverted:
-                    seq = reversed(addresses)
-                else:
-                    seq = addresses
-                for addr in seq:
-                    n = n.get_or_add(addr)
-                    n.size += size
-                    n.count += count
-            site = site['next']
+        def symbol(addr):
+            try:
+                return symbols[addr]
+            except KeyError:
+                return symbols.setdefault(addr, resolve(addr))
 
         def resolver(addr):
             if args.no_symbols:
                 return '0x%x' % addr
             if args.addresses:
-                return '0x%x %s' % (addr, resolve(addr) or '')
-            return resolve(addr) or ('0x%x' % addr)
+                return '0x%x %s' % (addr, symbol(addr) or '')
+            return symbol(addr) or ('0x%x' % addr)
 
         if args.flame:
-            file_name = 'heapprof.stacks'
+            # Stream the folded stacks, one line per site, identical stacks
+            # are summed by the flamegraph tools.
+            file_name = args.output or 'heapprof.stacks'
             with open(file_name, 'w') as out:
-                trace = list()
-
-                def print_node(n):
-                    if n.key:
-                        trace.append(n.key)
-                        trace.extend(n.tail)
-                    for c in n.children:
-                        print_node(c)
-                    if not n.has_children():
-                        out.write("%s %d\n" % (';'.join(map(lambda x: '%s' % (x), map(resolver, trace))), n.size))
-                    if n.key:
-                        del trace[-1 - len(n.tail):]
-                print_node(root)
+                for size, count, addresses in heapprof_sites():
+                    seq = reversed(addresses) if args.inverted else addresses
+                    out.write("%s %d\n" % (';'.join(map(resolver, seq)), size))
             gdb.write('Wrote %s\n' % (file_name))
-        else:
-            def node_formatter(n):
-                if n.key is None:
-                    name = "All"
-                else:
-                    name = resolver(n.key)
-                return "%s (%d, #%d)\n%s" % (name, n.size, n.count, '\n'.join(map(resolver, n.tail)))
+            return
+
+        sites = list(heapprof_sites())
+        if not args.no_symbols:
+            symbols.update(resolve_many(addr for _, _, addresses in sites for addr in addresses))
+
+        if args.pprof:
+            file_name = args.output or 'heapprof.pb.gz'
+            profile = pprof_writer([('inuse_objects', 'count'), ('inuse_space', 'bytes')], 'inuse_space')
+            offset_pattern = re.compile(r' \+ \d+$')
+            for size, count, addresses in sites:
+                locations = []
+                for addr in addresses:
+                    name = None if args.no_symbols else symbol(addr)
+                    name = offset_pattern.sub('', name.strip()) if name else '0x%x' % addr
+                    locations.append(profile.location(addr, name))
+                profile.add_sample(locations, [count, size])
+            with gzip.open(file_name, 'wb') as out:
+                profile.write(out)
+            gdb.write('Wrote %s\n' % (file_name))
+            return
+
+        root = ProfNode(None)
+        for size, count, addresses in sites:
+            n = root
+            n.size += size
+            n.count += count
+            if args.inverted:
+                seq = reversed(addresses)
+            else:
+                seq = addresses
+            for addr in seq:
+                n = n.get_or_add(addr)
+                n.size += size
+                n.count += count
 
-            def node_filter(n):
-                return n.size >= args.min
+        def node_formatter(n):
+            if n.key is None:
+                name = "All"
+            else:
+                name = resolver(n.key)
+            return "%s (%d, #%d)\n%s" % (name, n.size, n.count, '\n'.join(map(resolver, n.tail)))
+
+        def node_filter(n):
+            return n.size >= args.min
 
-            collapse_similar(root)
-            print_tree(root,
-                       formatter=node_formatter,
-                       order_by=lambda n: -n.size,
-                       node_filter=node_filter,
-                       printer=gdb.write)
+        collapse_similar(root)
+        print_tree(root,
+                   formatter=node_formatter,
+                   order_by=lambda n: -n.size,
+                   node_filter=node_filter,
+                   printer=gdb.write)
 
 
 def get_seastar_memory_start_and_size():
@@ -2902,15 +4227,19 @@ class scylla_ptr(gdb.Command):
             ptr_meta.size = span.size() * page_size
             ptr_meta.offset_in_object = ptr - span.start
 
+        ptr_meta.is_lsa = scylla_ptr.is_lsa(ptr)
+
+        return ptr_meta
+
+    @staticmethod
+    def is_lsa(ptr):
         # FIXME: handle debug-mode build
         segment_pool = get_lsa_segment_pool()
         segments_base = get_segment_base(segment_pool)
         segment_size = int(gdb.parse_and_eval('\'logalloc::segment\'::size'))
         index = int((int(ptr) - segments_base) / segment_size)
         desc = std_vector(segment_pool["_segments"])[index]
-        ptr_meta.is_lsa = bool(desc['_region'])
-
-        return ptr_meta
+        return bool(desc['_region'])
 
     @staticmethod
     def analyze(ptr):
@@ -3070,25 +4399,433 @@ class scylla_lsa(gdb.Command):
                               r_unused=int(region['_closed_occupancy']['_free_space'])))
 
 
-names = {}  # addr (int) -> name (str)
+class columnar_file:
+    """Append-only file of tables of int64 columns, in a directory.
 
+    Each column of each table is stored in its own file (<table>.<column>),
+    as raw native int64 values, so the columns can be loaded with
+    array.array('q').fromfile() or numpy.fromfile(path, dtype='int64')
+    without a parser. The schema is stored in meta.json. Rows are appended
+    to all the columns of a table at once, a table interrupted in the middle
+    of an append is truncated to its last complete row when reopened.
+    """
+    _magic = 'scylla-columnar-file'
+    _version = 1
+
+    def __init__(self, directory, tables, kind):
+        """Open or create the file in directory, tables is a dict of table name -> column names."""
+        self.directory = directory
+        self.tables = tables
+        meta_path = os.path.join(directory, 'meta.json')
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            os.makedirs(directory, exist_ok=True)
+            with open(meta_path, 'w') as f:
+                json.dump({'magic': columnar_file._magic, 'version': columnar_file._version, 'kind': kind, 'tables': tables}, f)
+            meta = None
+        if meta is not None:
+            if meta.get('magic') != columnar_file._magic or meta.get('version') != columnar_file._version or meta.get('kind') != kind:
+                raise ValueError("{} is not a {} file".format(directory, kind))
+            if meta['tables'] != tables:
+                raise ValueError("{} has a different schema".format(directory))
+        for table in tables:
+            self._truncate_to_complete_rows(table)
+
+    def _path(self, table, column):
+        return os.path.join(self.directory, '{}.{}'.format(table, column))
+
+    def _truncate_to_complete_rows(self, table):
+        paths = [self._path(table, c) for c in self.tables[table]]
+        sizes = [os.path.getsize(p) if os.path.exists(p) else 0 for p in paths]
+        rows = min(sizes) // 8
+        for path, size in zip(paths, sizes):
+            if size != rows * 8:
+                os.truncate(path, rows * 8)
+
+    def append(self, table, rows):
+        """Append rows (sequences of ints, in the order of the columns of the table) to table."""
+        columns = self.tables[table]
+        for i, column in enumerate(columns):
+            with open(self._path(table, column), 'ab') as f:
+                array.array('q', (row[i] for row in rows)).tofile(f)
+
+    def load(self, table):
+        """Returns a dict of column name -> array('q') of table."""
+        result = {}
+        for column in self.tables[table]:
+            values = array.array('q')
+            path = self._path(table, column)
+            with open(path, 'rb') as f:
+                values.fromfile(f, os.path.getsize(path) // 8)
+            result[column] = values
+        return result
 
-def resolve(addr, cache=True, startswith=None):
-    if addr in names:
-        return names[addr]
 
-    infosym = gdb.execute('info symbol 0x%x' % (addr), False, True)
-    if infosym.startswith('No symbol'):
+class scylla_lsa_sampler(gdb.Command):
+    """Sample the state of LSA, the cache and the memtables of all shards periodically.
+
+    `scylla lsa`, `scylla cache` and `scylla memtables` show the state at a
+    single point in time. This command takes a sample of:
+    * the LSA segment pool: segments in use, free segments, emergency
+      reserve and the reclamation counters (compacted segments, compacted,
+      evicted, allocated and freed memory);
+    * the row cache region: total, used and free memory;
+    * the dirty memory managers: real dirty and unspooled memory;
+    * optionally, each LSA region: total and free memory.
+    of all shards, then detaches from the process, waits for the interval,
+    attaches again and takes the next sample. The process is only stopped
+    while the sample is taken (recorded as `pause_ns`). The process is left
+    attached after the last sample.
+
+    The samples are appended to a columnar file (see `columnar_file`), a
+    directory with a file for each column, of the `shards` and `regions`
+    tables. Timestamps are in nanoseconds since the epoch. The columns are
+    raw int64 arrays, to be loaded with e.g. numpy.fromfile(..., dtype='int64'),
+    or printed as CSV with --dump.
+
+    Meant to be run in gdb's batch mode, which loads the symbols once for
+    all the samples:
+
+        gdb -batch -p $(pgrep -x scylla) -x scylla-gdb.py -ex 'scylla lsa-sampler -o lsa-samples -i 5 -n 120'
+
+    When debugging a core, a single sample is taken.
+    """
+    _tables = {
+        'shards': ['timestamp', 'shard', 'pause_ns',
+                   'segments_in_use', 'free_segments', 'emergency_reserve_goal', 'emergency_reserve_max',
+                   'segments_compacted', 'memory_allocated', 'memory_freed', 'memory_compacted', 'memory_evicted',
+                   'cache_total', 'cache_used', 'cache_free',
+                   'regular_real_dirty', 'regular_unspooled', 'system_real_dirty', 'system_unspooled'],
+        'regions': ['timestamp', 'shard', 'region_id', 'evictable', 'total_space', 'free_space'],
+    }
+
+    def __init__(self):
+        gdb.Command.__init__(self, 'scylla lsa-sampler', gdb.COMMAND_USER, gdb.COMPLETE_COMMAND)
+
+    @staticmethod
+    def _pool_stats(pool):
+        stats = []
+        for name in ('segments_compacted', 'memory_allocated', 'memory_freed', 'memory_compacted', 'memory_evicted'):
+            try:
+                stats.append(int(pool['_stats'][name]))
+            except gdb.error:
+                # Not available in older versions
+                stats.append(0)
+        return stats
+
+    @staticmethod
+    def sample(timestamp, with_regions):
+        """Returns the rows of the shards and the regions tables, for all shards."""
+        shard_rows = []
+        region_rows = []
+        orig = gdb.selected_thread()
+        try:
+            for r in reactors():
+                shard = int(r['_id'])
+                pool = get_lsa_segment_pool()
+                db = find_db()
+                cache_region = lsa_region(db['_row_cache_tracker']['_region'])
+                regular = dirty_mem_mgr(db['_dirty_memory_manager'])
+                system = dirty_mem_mgr(db['_system_dirty_memory_manager'])
+                shard_rows.append([timestamp, shard, 0,
+                                   int(pool['_segments_in_use']), int(pool['_free_segments']),
+                                   int(pool['_current_emergency_reserve_goal']), int(pool['_emergency_reserve_max'])]
+                                  + scylla_lsa_sampler._pool_stats(pool)
+                                  + [cache_region.total(), cache_region.used(), cache_region.free(),
+                                     regular.real_dirty(), regular.unspooled(), system.real_dirty(), system.unspooled()])
+                if with_regions:
+                    for region in lsa_regions():
+                        region_rows.append([timestamp, shard, int(region['_id']), int(bool(region['_evictable'])),
+                                            int(region['_closed_occupancy']['_total_space']),
+                                            int(region['_closed_occupancy']['_free_space'])])
+        finally:
+            orig.switch()
+        return shard_rows, region_rows
+
+    @staticmethod
+    def dump(samples, table):
+        columns = samples.load(table)
+        names = samples.tables[table]
+        gdb.write(','.join(names) + '\n')
+        for row in zip(*(columns[name] for name in names)):
+            gdb.write(','.join(map(str, row)) + '\n')
+
+    def invoke(self, arg, from_tty):
+        parser = argparse.ArgumentParser(description="scylla lsa-sampler")
+        parser.add_argument("-o", "--output", action="store", required=True,
+                help="Directory of the columnar file to append the samples to, created if it doesn't exist.")
+        parser.add_argument("-i", "--interval", action="store", type=float, default=10,
+                help="Seconds between the start of two samples. Default is 10.")
+        parser.add_argument("-n", "--count", action="store", type=int, default=0,
+                help="Number of samples to take, 0 means sampling until interrupted. Default is 0.")
+        parser.add_argument("--no-regions", action="store_true",
+                help="Don't sample the LSA regions, only the per-shard totals.")
+        parser.add_argument("--dump", choices=list(scylla_lsa_sampler._tables), default=None,
+                help="Don't sample, print the given table of the samples in the output as CSV instead.")
+        try:
+            args = parser.parse_args(arg.split())
+        except SystemExit:
+            return
+
+        samples = columnar_file(args.output, scylla_lsa_sampler._tables, 'lsa-samples')
+        if args.dump:
+            scylla_lsa_sampler.dump(samples, args.dump)
+            return
+
+        pid = gdb.selected_inferior().pid
+        live = pid and get_core_file() is None
+        count = args.count if live else 1
+        n = 0
+        attached = True
+        stopped_ns = time.time_ns()
+        try:
+            while True:
+                start = time.time()
+                shard_rows, region_rows = scylla_lsa_sampler.sample(time.time_ns(), not args.no_regions)
+                last = not live or (count and n + 1 >= count)
+                # Leave the process attached after the last sample, like it was found
+                if not last:
+                    gdb.execute('detach', to_string=True)
+                    attached = False
+                pause_ns = time.time_ns() - stopped_ns
+                for row in shard_rows:
+                    row[2] = pause_ns
+                samples.append('shards', shard_rows)
+                samples.append('regions', region_rows)
+                n += 1
+                gdb.write('sample {}: {} shards, {} regions, process stopped for {:.3f}s\n'.format(n, len(shard_rows), len(region_rows), pause_ns / 1e9))
+                if last:
+                    break
+                time.sleep(max(0, args.interval - (time.time() - start)))
+                stopped_ns = time.time_ns()
+                gdb.execute('attach {}'.format(pid), to_string=True)
+                attached = True
+        except KeyboardInterrupt:
+            pass
+        if not attached:
+            gdb.write('Detached from process {}\n'.format(pid))
+        gdb.write('Wrote {} samples to {}\n'.format(n, args.output))
+
+
+class symbol_table:
+    """Sorted address -> symbol table of the scylla executable.
+
+    Resolving addresses with `info symbol` costs a gdb command and parsing its
+    output for each address, which adds up when resolving thousands of
+    vptrs. The symbol table is built once per session from the symtab of the
+    executable (with `nm`), after which resolving an address is a bisect.
+
+    The table is persisted in the cache directory, keyed by the build-id of the
+    executable, so later sessions against the same build start warm. The
+    cache directory is $SCYLLA_GDB_CACHE_DIR, or $XDG_CACHE_HOME/scylla-gdb
+    if the former is not set.
+
+    Addresses outside of the executable (e.g. in shared libraries) are not
+    covered by the table, these still have to be resolved with `info symbol`.
+    """
+    _instance = None # None: not loaded yet, False: the table is not available
+
+    def __init__(self, addrs, sizes, names, bias):
+        self._addrs = array.array('Q', (a + bias for a in addrs))
+        self._sizes = sizes
+        self._names = names
+        if self._addrs:
+            self._start = self._addrs[0]
+            self._end = max(a + s for a, s in zip(self._addrs, self._sizes))
+        else:
+            self._start = self._end = 0
+
+    @staticmethod
+    def cache_dir():
+        try:
+            return os.environ['SCYLLA_GDB_CACHE_DIR']
+        except KeyError:
+            return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'scylla-gdb')
+
+    @staticmethod
+    def _executable():
+        filename = gdb.current_progspace().filename
+        for objfile in gdb.objfiles():
+            if objfile.filename == filename:
+                return objfile
         return None
 
-    name = infosym[:infosym.find('in section')]
-    if startswith and not name.startswith(startswith):
+    @staticmethod
+    def _read_symtab(path):
+        """Returns the (addrs, sizes, names) of the defined symbols of the ELF file, sorted by address."""
+        res = subprocess.run(['nm', '--demangle', '--print-size', '--defined-only', path],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+        symbols = []
+        for line in res.stdout.split('\n'):
+            # Lines are "addr [size] kind name", where the demangled name can
+            # contain spaces and the size is missing for unsized symbols. The
+            # size, when present, is printed with the same width as the address.
+            items = line.split(' ', 3)
+            if len(items) < 3:
+                continue
+            if len(items) == 4 and len(items[1]) == len(items[0]) and len(items[2]) == 1:
+                addr, size, kind, name = items
+            else:
+                addr, kind, name = line.split(' ', 2)
+                size = '0'
+            # Skip absolute and debugging symbols
+            if kind in ('a', 'A', 'n', 'N'):
+                continue
+            symbols.append((int(addr, 16), int(size, 16), name))
+        symbols.sort(key=lambda s: (s[0], -s[1]))
+
+        addrs = array.array('Q')
+        sizes = array.array('Q')
+        names = []
+        for addr, size, name in symbols:
+            # Keep only one of the aliases, prefer the sized one
+            if addrs and addrs[-1] == addr:
+                continue
+            addrs.append(addr)
+            sizes.append(size)
+            names.append(name)
+        return addrs, sizes, names
+
+    @staticmethod
+    def _load(directory):
+        with open(os.path.join(directory, 'addrs'), 'rb') as f:
+            addrs = array.array('Q', f.read())
+        with open(os.path.join(directory, 'sizes'), 'rb') as f:
+            sizes = array.array('Q', f.read())
+        with open(os.path.join(directory, 'names'), 'r') as f:
+            names = f.read().split('\n')
+        if not (len(addrs) == len(sizes) == len(names)):
+            raise ValueError("corrupt symbol table cache in {}".format(directory))
+        return addrs, sizes, names
+
+    @staticmethod
+    def _store(directory, addrs, sizes, names):
+        tmp_directory = '{}.tmp-{}'.format(directory, os.getpid())
+        os.makedirs(tmp_directory, exist_ok=True)
+        with open(os.path.join(tmp_directory, 'addrs'), 'wb') as f:
+            addrs.tofile(f)
+        with open(os.path.join(tmp_directory, 'sizes'), 'wb') as f:
+            sizes.tofile(f)
+        with open(os.path.join(tmp_directory, 'names'), 'w') as f:
+            f.write('\n'.join(names))
+        os.rename(tmp_directory, directory)
+
+    @staticmethod
+    def _create():
+        objfile = symbol_table._executable()
+        if objfile is None:
+            return False
+
+        directory = None
+        if objfile.build_id:
+            directory = os.path.join(symbol_table.cache_dir(), objfile.build_id)
+        try:
+            addrs, sizes, names = symbol_table._load(directory)
+        except (TypeError, OSError, ValueError):
+            addrs, sizes, names = symbol_table._read_symtab(objfile.filename)
+            if directory is not None:
+                try:
+                    symbol_table._store(directory, addrs, sizes, names)
+                except OSError as e:
+                    gdb.write("symbol_table: failed to persist symbol table to {}: {}\n".format(directory, e))
+
+        # Position independent executables are relocated, calculate the load
+        # bias from a known symbol.
+        bias = 0
+        try:
+            main_addr = int(gdb.parse_and_eval('(unsigned long)&main'))
+            bias = main_addr - addrs[names.index('main')]
+        except (gdb.error, ValueError):
+            pass
+
+        return symbol_table(addrs, sizes, names, bias)
+
+    @staticmethod
+    def get():
+        """Returns the symbol table, None if it is not available."""
+        if symbol_table._instance is None:
+            try:
+                symbol_table._instance = symbol_table._create()
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                gdb.write("symbol_table: failed to build symbol table, falling back to `info symbol`: {}\n".format(e))
+                symbol_table._instance = False
+        return symbol_table._instance or None
+
+    def covers(self, addr):
+        return self._start <= addr < self._end
+
+    def lookup(self, addr):
+        """Returns the name of the symbol containing addr, in the same format as `info symbol`.
+
+        Returns None if addr is not inside any symbol.
+        """
+        idx = bisect.bisect_right(self._addrs, addr) - 1
+        if idx < 0:
+            return None
+        offset = addr - self._addrs[idx]
+        if offset >= max(self._sizes[idx], 1):
+            return None
+        if offset:
+            return '{} + {} '.format(self._names[idx], offset)
+        return '{} '.format(self._names[idx])
+
+    def lookup_many(self, addrs):
+        """Returns a dict of addr -> name (or None) of the sorted addrs, see lookup()."""
+        result = {}
+        lo = 0
+        for addr in addrs:
+            lo = bisect.bisect_right(self._addrs, addr, lo)
+            idx = lo - 1
+            offset = addr - self._addrs[idx] if idx >= 0 else -1
+            if offset < 0 or offset >= max(self._sizes[idx], 1):
+                result[addr] = None
+            elif offset:
+                result[addr] = '{} + {} '.format(self._names[idx], offset)
+            else:
+                result[addr] = '{} '.format(self._names[idx])
+        return result
+
+
+names = {}  # addr (int) -> name (str) or None
+
+
+def resolve(addr, cache=True, startswith=None):
+    addr = int(addr)
+    if addr in names:
+        name = names[addr]
+    else:
+        symtab = symbol_table.get()
+        if symtab is not None and symtab.covers(addr):
+            name = symtab.lookup(addr)
+        else:
+            infosym = gdb.execute('info symbol 0x%x' % (addr), False, True)
+            if infosym.startswith('No symbol'):
+                name = None
+            else:
+                name = infosym[:infosym.find('in section')]
+        if cache:
+            names[addr] = name
+
+    if name is None or (startswith and not name.startswith(startswith)):
         return None
-    if cache:
-        names[addr] = name
     return name
 
 
+def resolve_many(addrs):
+    """Resolve a batch of addresses, returns a dict of address -> name (or None).
+
+    The addresses covered by the symbol table are looked up in address
+    order, each lookup continuing from where the previous one stopped.
+    """
+    addrs = set(int(a) for a in addrs)
+    symtab = symbol_table.get()
+    if symtab is not None:
+        names.update(symtab.lookup_many(sorted(a for a in addrs if a not in names and symtab.covers(a))))
+    return {addr: resolve(addr) for addr in addrs}
+
+
 class lsa_regions(object):
     def __init__(self):
         lsa_tracker = std_unique_ptr(gdb.parse_and_eval('\'logalloc::tracker_instance\'._impl'))
@@ -3940,6 +5677,98 @@ class scylla_io_queues(gdb.Command):
                 gdb.write("Completion {}\n".format(op['_completion']))
 
 
+def analyze_pointer(ptr):
+    """Like scylla_ptr.analyze(), but uses the heap index of the current shard when available."""
+    index = heap_index.get()
+    ptr_meta = index.analyze(ptr, gdb.selected_thread()) if index is not None else None
+    if ptr_meta is None:
+        ptr_meta = scylla_ptr.analyze(ptr)
+    return ptr_meta
+
+
+class task_reference_index:
+    """Session-wide index of references to task objects.
+
+    Walking a fiber backwards requires finding the objects which reference
+    a task, which is a full `find` over the seastar heap for each step.
+    This index collects all task objects of all shards (with find_vptrs())
+    and then maps each of them to the addresses that refer to them. The
+    references are collected lazily, with a single scan of the memory of a
+    shard, on the first lookup on that shard. After that, each step is a
+    dictionary lookup.
+
+    Only references to the start of task objects are indexed, lookups for
+    other values return None and should fall back to `scylla find`.
+    The index is cleared by `scylla fiber` when a live process is resumed.
+    """
+    _chunk_size = 1 << 20
+
+    _tasks = None # task address -> (vptr, symbol name, shard)
+    _referrers = {} # shard -> {task address: [referring addresses]}
+
+    @staticmethod
+    def clear():
+        task_reference_index._tasks = None
+        task_reference_index._referrers = {}
+
+    @staticmethod
+    def tasks():
+        if task_reference_index._tasks is None:
+            matcher = task_symbol_matcher()
+            tasks = {}
+            orig = gdb.selected_thread()
+            try:
+                for r in reactors():
+                    shard = int(r['_id'])
+                    for obj_addr, vptr in find_vptrs():
+                        name = resolve(vptr)
+                        if name and matcher(name):
+                            tasks[int(obj_addr)] = (int(vptr), name, shard)
+            finally:
+                orig.switch()
+            task_reference_index._tasks = tasks
+        return task_reference_index._tasks
+
+    @staticmethod
+    def _scan_shard():
+        targets = set(task_reference_index.tasks().keys())
+        referrers = defaultdict(list)
+        inf = gdb.selected_inferior()
+        word_size = _vptr_type().sizeof
+        page_size = int(gdb.parse_and_eval('\'seastar::memory::page_size\''))
+
+        for s in spans():
+            if s.is_free():
+                continue
+            end = s.start + int(s.used_span_size()) * page_size
+            for chunk_start in range(s.start, end, task_reference_index._chunk_size):
+                chunk_size = min(task_reference_index._chunk_size, end - chunk_start)
+                words = memoryview(inf.read_memory(chunk_start, chunk_size)).cast('Q')
+                # Let the set do the heavy lifting, chunks without references
+                # are rejected without iterating over the words in python.
+                hits = targets.intersection(words)
+                if not hits:
+                    continue
+                for i, w in enumerate(words):
+                    if w in hits:
+                        referrers[w].append(chunk_start + i * word_size)
+
+        return dict(referrers)
+
+    @staticmethod
+    def referrers(ptr):
+        """Returns the addresses referring to the task at ptr, in the memory of the current shard.
+
+        Returns None if ptr is not a known task.
+        """
+        if ptr not in task_reference_index.tasks():
+            return None
+        shard = current_shard()
+        if shard not in task_reference_index._referrers:
+            task_reference_index._referrers[shard] = task_reference_index._scan_shard()
+        return task_reference_index._referrers[shard].get(ptr, [])
+
+
 class scylla_fiber(gdb.Command):
     """ Walk the continuation chain starting from the given task
 
@@ -3961,6 +5790,15 @@ class scylla_fiber(gdb.Command):
     4) Pointer to the task's vtable.
     5) Symbol name of the task's vtable.
 
+    The references to tasks are collected into a session-wide index on the
+    first invocation, after that each backward step is a lookup (see
+    task_reference_index). Steps are also memoized, so walking many tasks
+    of the same chain is cheap. Both are dropped when a live process is
+    resumed.
+
+    Use `scylla fiber --all-tasks` to print the fibers of all tasks of the
+    current shard in one go.
+
     Invoke `scylla fiber --help` for more information on usage.
     """
 
@@ -3968,10 +5806,20 @@ class scylla_fiber(gdb.Command):
         gdb.Command.__init__(self, 'scylla fiber', gdb.COMMAND_USER, gdb.COMPLETE_NONE, True)
         self._task_symbol_matcher = task_symbol_matcher()
         self._thread_map = None
+        self._steps = {} # (walk method, task address, scanned region size, using seastar allocator) -> result of the step
+        gdb.events.cont.connect(self._on_cont)
 
     def _name_is_on_whitelist(self, name):
         return self._task_symbol_matcher(name)
 
+    def _clear_cache(self):
+        task_reference_index.clear()
+        self._steps = {}
+
+    def _on_cont(self, event):
+        # The memory of the process changes once it is resumed.
+        self._clear_cache()
+
     def _maybe_log(self, msg, verbose):
         if verbose:
             gdb.write(msg)
@@ -4120,7 +5968,14 @@ class scylla_fiber(gdb.Command):
             ptr_meta.thread.switch()
 
         try:
-            for maybe_tptr_meta, _ in scylla_find.find(ptr_meta.ptr):
+            referrers = task_reference_index.referrers(int(ptr_meta.ptr))
+            if referrers is None:
+                self._maybe_log("Task is not in the task reference index, scanning memory for references\n", verbose)
+                candidates = (m for m, _ in scylla_find.find(ptr_meta.ptr))
+            else:
+                candidates = (m for m in map(analyze_pointer, referrers) if m.is_live)
+
+            for maybe_tptr_meta in candidates:
                 maybe_tptr_meta.ptr -= maybe_tptr_meta.offset_in_object
                 res = self._probe_pointer(maybe_tptr_meta.ptr, scanned_region_size, using_seastar_allocator, verbose)
                 if res is None:
@@ -4145,7 +6000,17 @@ class scylla_fiber(gdb.Command):
                 break
 
             self._maybe_log("_walk() 0x{:x} {}\n".format(int(tptr_meta.ptr), name), verbose)
-            res = walk_method(tptr_meta, name, i + 1, max_depth, scanned_region_size, using_seastar_allocator, verbose)
+            # Steps are memoized, fibers of tasks from the same chain share
+            # most of their steps. Don't use the memoized steps when verbose,
+            # so the log shows how they are done.
+            # The result of a step depends on how tasks are probed, so the
+            # options affecting that are part of the key.
+            step_key = (walk_method.__name__, int(tptr_meta.ptr), scanned_region_size, using_seastar_allocator)
+            if step_key in self._steps and not verbose:
+                res = self._steps[step_key]
+            else:
+                res = walk_method(tptr_meta, name, i + 1, max_depth, scanned_region_size, using_seastar_allocator, verbose)
+                self._steps[step_key] = res
             if res is None:
                 break
 
@@ -4163,6 +6028,51 @@ class scylla_fiber(gdb.Command):
 
         return fiber
 
+    def _print_all_tasks(self, verbose):
+        """Print the wait-for forest of the tasks of the current shard.
+
+        Each task is linked to the first live task which references it, that
+        is, the task it waits on. Trees are rooted at tasks which don't wait on
+        any other task.
+        """
+        shard = current_shard()
+        tasks = {addr: t for addr, t in task_reference_index.tasks().items() if t[2] == shard}
+
+        waits_on = {} # task -> the task it waits on
+        for addr in tasks:
+            for ref in task_reference_index.referrers(addr):
+                ref_meta = analyze_pointer(ref)
+                if not ref_meta.is_live:
+                    continue
+                referrer = int(ref_meta.obj_ptr)
+                if referrer != addr and referrer in tasks:
+                    waits_on[addr] = referrer
+                    break
+
+        nodes = {addr: TreeNode(addr) for addr in tasks}
+        for addr, waited_on in waits_on.items():
+            nodes[waited_on].add(nodes[addr])
+
+        def formatter(node):
+            vptr, name, _ = tasks[node.key]
+            return "(task*) 0x{:016x} 0x{:016x} {}".format(node.key, vptr, name)
+
+        single_tasks = 0
+        for addr in sorted(tasks):
+            if addr in waits_on:
+                continue
+            if not nodes[addr].has_children() and not verbose:
+                single_tasks += 1
+                continue
+            gdb.write("[shard {:2}] ".format(shard))
+            print_tree(nodes[addr], formatter=formatter, printer=gdb.write)
+            gdb.write("\n")
+
+        gdb.write("Found {} tasks, {} of them waiting on another task".format(len(tasks), len(waits_on)))
+        if single_tasks:
+            gdb.write(", omitted {} fibers of a single task".format(single_tasks))
+        gdb.write("\n")
+
     def invoke(self, arg, for_tty):
         parser = argparse.ArgumentParser(description="scylla fiber")
         parser.add_argument("-v", "--verbose", action="store_true", default=False,
@@ -4176,18 +6086,37 @@ class scylla_fiber(gdb.Command):
         parser.add_argument("--force-fallback-mode", action="store_true", default=False,
                 help="Force fallback mode to be used, that is, scan a fixed-size region of memory"
                 " (configurable via --scanned-region-size), instead of relying on `scylla ptr` for determining the size of the task objects.")
-        parser.add_argument("task", action="store", help="An expression that evaluates to a valid `seastar::task*` value. Cannot contain white-space.")
+        parser.add_argument("--all-tasks", action="store_true", default=False,
+                help="Print the wait-for forest of all the tasks of the current shard, instead of the fiber of a single task."
+                " Fibers of a single task are omitted, unless --verbose is used."
+                " Note that this mode only follows plain references between tasks,"
+                " it doesn't have the special handling of threads, when_all() and cross-shard work items of the single-task mode.")
+        parser.add_argument("--clear-cache", action="store_true", default=False,
+                help="Drop the task reference index and the memoized fiber steps before walking."
+                " These are dropped automatically when a live process is resumed.")
+        parser.add_argument("task", action="store", nargs="?", help="An expression that evaluates to a valid `seastar::task*` value. Cannot contain white-space.")
 
         try:
             args = parser.parse_args(arg.split())
         except SystemExit:
             return
 
+        if args.clear_cache:
+            self._clear_cache()
+
         if self._thread_map is None:
             self._thread_map = {}
             for r in reactors():
                 self._thread_map[gdb.selected_thread().num] = int(r['_id'])
 
+        if args.all_tasks:
+            self._print_all_tasks(args.verbose)
+            return
+
+        if args.task is None:
+            gdb.write("Error: a task has to be specified, unless --all-tasks is used\n")
+            return
+
         def format_task_line(i, task_info):
             tptr_meta, vptr, name = task_info
             tptr = tptr_meta.ptr
@@ -4228,9 +6157,25 @@ class scylla_fiber(gdb.Command):
 
 
 def find_objects(mem_start, mem_size, value, size_selector='g', only_live=True):
+    index = heap_index.get()
+    thread = gdb.selected_thread()
+    pointers = pointer_index.get() if size_selector == 'g' and only_live else None
+    # The index has only the aligned pointers into the seastar heaps, values
+    # outside of them (e.g. vtable pointers) are searched for with find.
+    if pointers is not None and pointers.covers(value):
+        for source, offset, _ in pointers.referrers(value, value + 1):
+            ptr = source + offset
+            ptr_meta = index.analyze(ptr, thread) if index is not None else None
+            if ptr_meta is None:
+                ptr_meta = scylla_ptr.analyze(ptr)
+            yield ptr_meta
+        return
     for line in gdb.execute("find/%s 0x%x, +0x%x, 0x%x" % (size_selector, mem_start, mem_size, value), to_string=True).split('\n'):
         if line.startswith('0x'):
-            ptr_meta = scylla_ptr.analyze(int(line, base=16))
+            ptr = int(line, base=16)
+            ptr_meta = index.analyze(ptr, thread) if index is not None else None
+            if ptr_meta is None:
+                ptr_meta = scylla_ptr.analyze(ptr)
             if not only_live or ptr_meta.is_live:
                 yield ptr_meta
 
@@ -4320,6 +6265,7 @@ class scylla_find(gdb.Command):
         }
 
         size_char = size_arg_to_size_char[args.size]
+        index = heap_index.get()
 
         for ptr_meta, offset in scylla_find.find(int(gdb.parse_and_eval(args.value)), size_char, args.value_range, find_all=args.find_all,
                 only_live=(not args.include_free)):
@@ -4328,7 +6274,9 @@ class scylla_find(gdb.Command):
             else:
                 formatted_offset = ""
             if args.resolve:
-                maybe_vptr = int(gdb.Value(ptr_meta.obj_ptr).reinterpret_cast(_vptr_type()).dereference())
+                maybe_vptr = index.first_word(ptr_meta.obj_ptr) if index is not None else None
+                if maybe_vptr is None:
+                    maybe_vptr = int(gdb.Value(ptr_meta.obj_ptr).reinterpret_cast(_vptr_type()).dereference())
                 symbol = resolve(maybe_vptr, cache=False)
                 if symbol is None:
                     gdb.write('{}{}\n'.format(formatted_offset, ptr_meta))
@@ -4719,6 +6667,14 @@ class scylla_generate_object_graph(gdb.Command):
     file will contain the full name of vtable symbols. The graph will only contain
     cropped versions of those to keep the size reasonable.
 
+    The referrers of the objects are looked up in the pointer index of the
+    shard (see the `pointer_index` class), which is built on first use (or
+    with `scylla heap-index build --pointers`), with a single pass over the
+    heap. Without it, each object requires a search of the whole heap for
+    each of its offsets, which limits the practical depth of the graph to 2-3.
+    The referrers of objects whose vtable matches one of the --stop-at
+    patterns are not followed.
+
     See `scylla generate_object_graph --help` for more details on usage.
     Also see `man dot` for more information on supported output formats.
 
@@ -4727,7 +6683,17 @@ class scylla_generate_object_graph(gdb.Command):
         gdb.Command.__init__(self, 'scylla generate-object-graph', gdb.COMMAND_USER, gdb.COMPLETE_COMMAND)
 
     @staticmethod
-    def _traverse_object_graph_breadth_first(address, max_depth, max_vertices, timeout_seconds, value_range_override):
+    def _find_referrers(index, obj, value_range):
+        """Yields the (ptr_meta, offset) of the references to the value_range bytes of obj, like scylla_find.find()."""
+        if index is None:
+            yield from scylla_find.find(obj, value_range=value_range, find_all=True)
+            return
+        for source, offset, target in index.referrers(obj, obj + max(value_range, 1)):
+            yield analyze_pointer(source + offset), target - obj
+
+    @staticmethod
+    def _traverse_object_graph_breadth_first(address, max_depth, max_vertices, timeout_seconds, value_range_override,
+                                             index=None, stop_at=()):
         vertices = dict() # addr -> obj info (ptr metadata, vtable symbol)
         edges = defaultdict(set) # (referrer, referee) -> {(prev_offset1, next_offset1), (prev_offset2, next_offset2), ...}
 
@@ -4748,7 +6714,7 @@ class scylla_generate_object_graph(gdb.Command):
                     value_range = vertices[current_obj][0].size
                 else:
                     value_range = value_range_override
-                for ptr_meta, to_off in scylla_find.find(current_obj, value_range=value_range, find_all=True):
+                for ptr_meta, to_off in scylla_generate_object_graph._find_referrers(index, current_obj, value_range):
                     if timeout_seconds > 0:
                         current_time = time.time()
                         if current_time - start_time > timeout_seconds:
@@ -4764,25 +6730,33 @@ class scylla_generate_object_graph(gdb.Command):
                     symbol_name = resolve(gdb.Value(next_obj).reinterpret_cast(vptr_type).dereference(), cache=False)
                     vertices[next_obj] = (ptr_meta, symbol_name)
 
-                    next_objects.append(next_obj)
+                    # Don't expand objects of the types of the cutoff,
+                    # e.g. containers referenced from everywhere.
+                    if not (symbol_name and any(p.search(symbol_name) for p in stop_at)):
+                        next_objects.append(next_obj)
 
                     if max_vertices > 0 and len(vertices) >= max_vertices:
                         stop = True
                         break
+                if stop:
+                    break
 
             if max_depth > 0 and depth == max_depth:
                 stop = True
                 break
 
+            if not next_objects:
+                break
+
             current_objects = next_objects
             next_objects = []
 
         return edges, vertices
 
     @staticmethod
-    def _do_generate_object_graph(address, output_file, max_depth, max_vertices, timeout_seconds, value_range_override):
+    def _do_generate_object_graph(address, output_file, max_depth, max_vertices, timeout_seconds, value_range_override, index, stop_at):
         edges, vertices = scylla_generate_object_graph._traverse_object_graph_breadth_first(address, max_depth,
-                max_vertices, timeout_seconds, value_range_override)
+                max_vertices, timeout_seconds, value_range_override, index, stop_at)
 
         vptr_type = gdb.lookup_type('uintptr_t').pointer()
         prefix_len = len('vtable for ')
@@ -4806,10 +6780,11 @@ class scylla_generate_object_graph(gdb.Command):
             output_file.write('{} -> {} [label="{}"];\n'.format(a, b, offsets))
 
     @staticmethod
-    def generate_object_graph(address, output_file, max_depth, max_vertices, timeout_seconds, value_range_override):
+    def generate_object_graph(address, output_file, max_depth, max_vertices, timeout_seconds, value_range_override, index=None, stop_at=()):
         with open(output_file, 'w') as f:
             f.write('digraph G {\n')
-            scylla_generate_object_graph._do_generate_object_graph(address, f, max_depth, max_vertices, timeout_seconds, value_range_override)
+            scylla_generate_object_graph._do_generate_object_graph(address, f, max_depth, max_vertices, timeout_seconds, value_range_override,
+                    index, stop_at)
             f.write('}')
 
     def invoke(self, arg, from_tty):
@@ -4830,6 +6805,14 @@ class scylla_generate_object_graph(gdb.Command):
                 help="The portion of the object to find references to. Same as --value-range for `scylla find`."
                 " This can greatly speed up the graph generation when the graph has large objects but references are likely to point to their first X bytes."
                 " Default value is -1, meaning the entire object is scanned (--value-range=sizeof(object)).")
+        parser.add_argument("-s", "--stop-at", action="append", default=[],
+                help="Regular expression, matched against the vtable symbol of the objects. Matching objects are added to the graph,"
+                " but their referrers are not followed. Useful to cut off the graph at widely referenced objects. Can be used multiple times.")
+        parser.add_argument("-m", "--memory-budget", action="store", type=int, default=2048,
+                help="Maximum memory used by the pointer index, in MiB, building it takes several times its final size. The referrers of the objects are looked up in the pointer index of the shard"
+                " (see `scylla heap-index`), built on first use unless there is one already. If the index doesn't fit in this budget"
+                " the referrers are searched for with `scylla find`, which is much slower. Set to 0 for unlimited, set to -1 to not use"
+                " the pointer index at all. Default is 2048.")
         parser.add_argument("object", action="store", help="The object that is the starting point of the graph.")
 
         try:
@@ -4837,6 +6820,8 @@ class scylla_generate_object_graph(gdb.Command):
         except SystemExit:
             return
 
+        stop_at = [re.compile(p) for p in args.stop_at]
+
         supported_extensions = {'dot', 'png', 'jpg', 'jpeg', 'svg', 'pdf'}
         head, tail = os.path.split(args.output_file)
         filename, extension = tail.split('.')
@@ -4853,8 +6838,14 @@ class scylla_generate_object_graph(gdb.Command):
         if args.max_depth == -1 and args.max_vertices == -1 and args.timeout == -1:
             raise ValueError("The search has to be limited by at least one of: MAX_DEPTH, MAX_VERTICES or TIMEOUT")
 
+        index = None
+        if args.memory_budget >= 0:
+            index = pointer_index.get(build=True, memory_budget=args.memory_budget * 1024 * 1024)
+            if index is None:
+                gdb.write("The pointer index doesn't fit in the memory budget of {} MiB, falling back to `scylla find`\n".format(args.memory_budget))
+
         scylla_generate_object_graph.generate_object_graph(int(gdb.parse_and_eval(args.object)), dot_file,
-                args.max_depth, args.max_vertices, args.timeout, args.value_range_override)
+                args.max_depth, args.max_vertices, args.timeout, args.value_range_override, index, stop_at)
 
         if extension != 'dot':
             subprocess.check_call(['dot', '-T' + extension, dot_file, '-o', args.output_file])
@@ -5012,12 +7003,15 @@ class scylla_small_objects(gdb.Command):
     If objects have a vtable, its type is resolved and this will appear in the
     listing.
 
-    Note that to reach a certain page, the command has to traverse the memory
-    spans belonging to the pool linearly, until the desired range of object is
-    found. This can take a long time for well populated pools. To speed this
-    up, the span iterator is saved and reused when possible. This caching can
-    only be exploited within the same pool and only with monotonically
-    increasing pages.
+    Objects are counted per span: the number of slots of the span minus
+    the lengths of the free-lists, without iterating over the objects. To
+    reach a certain page, the span holding its first object is located
+    with a binary search over the prefix sums of the live objects of the
+    spans, only the objects of the spans of the page are iterated over.
+    The span table of the pool is built on first use and reused until a
+    pool of another object size is inspected.
+    When a heap index is available (see `scylla heap-index`), it is used
+    instead.
 
     For usage see: scylla small-objects --help
 
@@ -5051,81 +7045,92 @@ class scylla_small_objects(gdb.Command):
     [2018] 0x635002ecbc40
     [2019] 0x635002ecbc60
     """
-    class small_object_iterator():
-        def __init__(self, small_pools, resolve_symbols):
-            self._small_pools = small_pools
-            self._small_pool_addresses = [small_pool.address for small_pool in small_pools]
-            self._object_size = int(small_pools[0]['_object_size'])
-            self._resolve_symbols = resolve_symbols
-
-            self._text_ranges = get_text_ranges()
-            self._free_object_ptr = gdb.lookup_type('void').pointer().pointer()
-            self._page_size = int(gdb.parse_and_eval('\'seastar::memory::page_size\''))
+    class span_table():
+        """The spans of the small pools of an object size, with the prefix sums of their live objects.
+
+        Built with a single read of the page array of the shard (see
+        heap_layout), the number of live objects of each span is computed
+        as the number of its slots minus the length of its free-list and the
+        number of the objects of the pool's free-list in it. The spans
+        holding a given range of live objects are then located with a
+        bisect over the prefix sums.
+        """
+        def __init__(self, small_pools):
+            self._inf = gdb.selected_inferior()
+            self.object_size = int(small_pools[0]['_object_size'])
+            pool_addresses = set(int(small_pool.address) for small_pool in small_pools)
+            layout = heap_layout()
+            pages = layout.decode_pages(bytes(self._inf.read_memory(layout.pages, layout.nr_pages * layout.page_struct_size)))
+
+            self._starts = array.array('Q')
+            self._slots = array.array('Q')
+            self._freelists = array.array('Q')
+            idx = 1
+            while idx < layout.nr_pages:
+                free, _, span_size, pool, freelist = pages[idx]
+                if span_size == 0:
+                    idx += 1
+                    continue
+                if not free and pool in pool_addresses:
+                    # Like scan_heap(), only the used pages of the span hold objects
+                    self._starts.append(layout.mem_start + idx * layout.page_size)
+                    self._slots.append(layout.used_pages(pages, idx) * layout.page_size // self.object_size)
+                    self._freelists.append(freelist)
+                idx += span_size
+
+            max_free = sum(self._slots)
             self._free_in_pool = set()
-            self._free_in_span = set()
-
-            for small_pool in self._small_pools:
-              pool_next_free = small_pool['_free']
-              while pool_next_free:
-                self._free_in_pool.add(int(pool_next_free))
-                pool_next_free = pool_next_free.reinterpret_cast(self._free_object_ptr).dereference()
-
-            self._span_it = iter(spans())
-            self._obj_it = iter([]) # initialize to exhausted iterator
-
-        def _next_span(self):
-            # Let any StopIteration bubble up, as it signals we are done with
-            # all spans.
-            span = next(self._span_it)
-            while span.pool() not in self._small_pool_addresses:
-                span = next(self._span_it)
-
-            self._free_in_span = set()
-            span_start = int(span.start)
-            span_end = int(span_start + span.size() * self._page_size)
-
-            # span's free list
-            span_next_free = span.page['freelist']
-            while span_next_free:
-                self._free_in_span.add(int(span_next_free))
-                span_next_free = span_next_free.reinterpret_cast(self._free_object_ptr).dereference()
-
-            return span_start, span_end
-
-        def _next_obj(self):
-            try:
-                return next(self._obj_it)
-            except StopIteration:
-                # Don't call self._next_span() here as it might throw another StopIteration.
-                pass
-
-            span_start, span_end = self._next_span()
-            self._obj_it = iter(range(span_start, span_end, int(self._object_size)))
-            return next(self._obj_it)
-
-        def __next__(self):
-            obj = self._next_obj()
-            while obj in self._free_in_span or obj in self._free_in_pool:
-                obj = self._next_obj()
-
-            if self._resolve_symbols:
-                addr = gdb.Value(obj).reinterpret_cast(_vptr_type()).dereference()
-                if addr_in_ranges(self._text_ranges, addr):
-                    return (obj, resolve(addr))
-                else:
-                    return (obj, None)
-            else:
-                return (obj, None)
-
-        def __iter__(self):
-            return self
+            for small_pool in small_pools:
+                self._free_in_pool |= self._free_list(int(small_pool['_free']), max_free)
+            pool_free_per_span = defaultdict(int)
+            for obj in self._free_in_pool:
+                span_idx = bisect.bisect_right(self._starts, obj) - 1
+                if span_idx >= 0:
+                    pool_free_per_span[span_idx] += 1
+
+            self._prefix = array.array('Q', [0])
+            for span_idx in range(len(self._starts)):
+                span_free = len(self._free_list(self._freelists[span_idx], self._slots[span_idx]))
+                live = self._slots[span_idx] - span_free - pool_free_per_span[span_idx]
+                self._prefix.append(self._prefix[-1] + live)
+
+        def _free_list(self, head, limit):
+            """The objects of the free-list starting at head, the walk is bounded by limit, in case the list is corrupt."""
+            objs = set()
+            while head and len(objs) < limit:
+                objs.add(head)
+                head = struct.unpack('=Q', self._inf.read_memory(head, 8))[0]
+            return objs
+
+        def count(self):
+            return self._prefix[-1]
+
+        def objects(self, offset=0, count=0):
+            """Yields the addresses of the live objects, starting at the `offset`-th one.
+
+            Yields at most `count` objects, or all of them if `count` is 0.
+            """
+            span_idx = bisect.bisect_right(self._prefix, offset) - 1
+            skip = offset - self._prefix[span_idx]
+            for span_idx in range(span_idx, len(self._starts)):
+                free = self._free_list(self._freelists[span_idx], self._slots[span_idx])
+                start = self._starts[span_idx]
+                for obj in range(start, start + self._slots[span_idx] * self.object_size, self.object_size):
+                    if obj in free or obj in self._free_in_pool:
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    yield obj
+                    count -= 1
+                    if not count:
+                        return
 
     def __init__(self):
         gdb.Command.__init__(self, 'scylla small-objects', gdb.COMMAND_USER, gdb.COMPLETE_COMMAND)
 
         self._parser = None
-        self._iterator = None
-        self._last_pos = 0
+        self._span_table = None
         self._last_object_size = None
 
     @staticmethod
@@ -5155,33 +7160,56 @@ class scylla_small_objects(gdb.Command):
         parser.add_argument("--random-page", action="store_true", help="Show a random page.")
         parser.add_argument("--summarize", action="store_true",
                 help="Print the number of objects and pages in the pool.")
+        parser.add_argument("-j", "--jobs", action="store", type=int, default=0,
+                help="With --summarize, count the objects in the pools of all shards, with JOBS worker processes reading the core file directly.")
         parser.add_argument("--verbose", action="store_true",
                 help="Print additional details on what is going on.")
 
         self._parser = parser
 
-    def get_objects(self, small_pools, offset=0, count=0, resolve_symbols=False, verbose=False):
-        if self._last_object_size != int(small_pools[0]['_object_size']) or offset < self._last_pos:
-            self._last_pos = 0
-            self._iterator = scylla_small_objects.small_object_iterator(small_pools, resolve_symbols)
-
-        skip = offset - self._last_pos
-        if verbose:
-            gdb.write('get_objects(): offset={}, count={}, last_pos={}, skip={}\n'.format(offset, count, self._last_pos, skip))
+    @staticmethod
+    def _get_objects_from_index(index, object_size, offset, count, resolve_symbols):
+        text_ranges = get_text_ranges() if resolve_symbols else []
+        objects = []
+        for obj, word0 in index.pool_objects(object_size, offset, count):
+            if addr_in_ranges(text_ranges, word0):
+                objects.append((obj, resolve(word0)))
+            else:
+                objects.append((obj, None))
+        return objects
 
-        for _ in range(skip):
-            next(self._iterator)
+    def _get_span_table(self, small_pools, verbose=False):
+        object_size = int(small_pools[0]['_object_size'])
+        if self._span_table is None or self._span_table.object_size != object_size:
+            if verbose:
+                gdb.write('Building the span table of the {} byte pool\n'.format(object_size))
+            self._span_table = scylla_small_objects.span_table(small_pools)
+        return self._span_table
 
-        if count:
-            objects = []
-            for _ in range(count):
-                objects.append(next(self._iterator))
-        else:
-            objects = list(self._iterator)
+    def count_objects(self, small_pools, verbose=False):
+        index = heap_index.get()
+        if index is not None:
+            return index.count_pool_objects(int(small_pools[0]['_object_size']))
+        return self._get_span_table(small_pools, verbose).count()
 
-        self._last_pos += skip
-        self._last_pos += len(objects)
+    def get_objects(self, small_pools, offset=0, count=0, resolve_symbols=False, verbose=False):
+        index = heap_index.get()
+        if index is not None:
+            if verbose:
+                gdb.write('get_objects(): offset={}, count={}, using heap index\n'.format(offset, count))
+            return scylla_small_objects._get_objects_from_index(index, int(small_pools[0]['_object_size']), offset, count, resolve_symbols)
 
+        if verbose:
+            gdb.write('get_objects(): offset={}, count={}, using span table\n'.format(offset, count))
+        text_ranges = get_text_ranges() if resolve_symbols else []
+        objects = []
+        for obj in self._get_span_table(small_pools, verbose).objects(offset, count):
+            if resolve_symbols:
+                addr = gdb.Value(obj).reinterpret_cast(_vptr_type()).dereference()
+                if addr_in_ranges(text_ranges, addr):
+                    objects.append((obj, resolve(addr)))
+                    continue
+            objects.append((obj, None))
         return objects
 
     def invoke(self, arg, from_tty):
@@ -5197,11 +7225,29 @@ class scylla_small_objects(gdb.Command):
         if not small_pools:
             raise ValueError("{} is not a valid object size for any small pools, valid object sizes are: {}", scylla_small_objects.get_object_sizes())
 
+        if args.summarize and args.jobs:
+            total = 0
+            for shard, res in sorted(scan_heaps(args.jobs).items()):
+                count = 0
+                for pool, stats in res['pools'].items():
+                    if stats['object_size'] == args.object_size:
+                        count += stats['slots'] - stats['span_free'] - res['pool_free'][pool]
+                gdb.write("shard {:2}: {} objects\n".format(shard, count))
+                total += count
+            gdb.write("number of objects: {}\n"
+                      "page size        : {}\n"
+                      "number of pages  : {}\n"
+                .format(
+                    total,
+                    args.page_size,
+                    int(total / args.page_size)))
+            return
+
         if args.summarize:
             if self._last_object_size != args.object_size:
                 if args.verbose:
                     gdb.write("Object size changed ({} -> {}), scanning pool.\n".format(self._last_object_size, args.object_size))
-                self._num_objects = len(self.get_objects(small_pools, verbose=args.verbose))
+                self._num_objects = self.count_objects(small_pools, verbose=args.verbose)
                 self._last_object_size = args.object_size
             gdb.write("number of objects: {}\n"
                       "page size        : {}\n"
@@ -5216,7 +7262,7 @@ class scylla_small_objects(gdb.Command):
             if self._last_object_size != args.object_size:
                 if args.verbose:
                     gdb.write("Object size changed ({} -> {}), scanning pool.\n".format(self._last_object_size, args.object_size))
-                self._num_objects = len(self.get_objects(small_pools, verbose=args.verbose))
+                self._num_objects = self.count_objects(small_pools, verbose=args.verbose)
                 self._last_object_size = args.object_size
             page = random.randint(0, int(self._num_objects / args.page_size) - 1)
         else:
@@ -6517,6 +8563,7 @@ scylla_mem_ranges()
 scylla_mem_range()
 scylla_heapprof()
 scylla_lsa()
+scylla_lsa_sampler()
 scylla_lsa_segment()
 scylla_lsa_check()
 scylla_segment_descs()
@@ -6542,6 +8589,7 @@ scylla_sstable_index_cache()
 scylla_sstables()
 scylla_memtables()
 scylla_generate_object_graph()
+scylla_heap_index()
 scylla_smp_queues()
 scylla_features()
 scylla_repairs()
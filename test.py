@@ -49,7 +49,10 @@ from test.pylib.suite.base import (
     prepare_dirs,
     start_3rd_party_services,
 )
+from test.pylib.db.reader import read_tests_history
 from test.pylib.resource_gather import run_resource_watcher
+from test.pylib.rest_client import close_rest_sessions
+from test.pylib.scheduler import TestScheduler
 from test.pylib.util import LogPrefixAdapter, get_configured_modes
 
 if TYPE_CHECKING:
@@ -167,6 +170,10 @@ def parse_cmd_line() -> argparse.Namespace:
     parser.add_argument('--skip',
                         dest="skip_patterns", action="append",
                         help="Skip tests which match the provided pattern")
+    parser.add_argument('--schedule', choices=['lpt', 'fifo'], default='lpt',
+                        help="Order in which tests are started. lpt: longest (and most memory-hungry) first, "
+                             "according to the metrics of previous runs (see --gather-metrics), packed against "
+                             "the CPU and memory of the machine. fifo: in the order they are found.")
     parser.add_argument('--no-parallel-cases', dest="parallel_cases", action="store_false", default=True,
                         help="Do not run individual test cases in parallel")
     parser.add_argument('--cpus', action="store",
@@ -212,6 +219,9 @@ def parse_cmd_line() -> argparse.Namespace:
     parser.add_argument("--cluster-pool-size", action="store", default=None, type=int,
                         help="Set the pool_size for PythonTest and its descendants. Alternatively environment variable "
                              "CLUSTER_POOL_SIZE can be used to achieve the same")
+    parser.add_argument("--cluster-snapshots", action="store_true", default=False,
+                        help="Boot a reference cluster once per suite and start the clusters of the suite's pool "
+                             "from a copy of its data directories, with fresh IPs, instead of bootstrapping them")
     parser.add_argument('--manual-execution', action='store_true', default=False,
                         help='Let me manually run the test executable at the moment this script would run it')
     parser.add_argument('--byte-limit', action="store", default=randint(0, 2000), type=int,
@@ -237,17 +247,22 @@ def parse_cmd_line() -> argparse.Namespace:
     if args.skip_patterns and args.k:
         parser.error(palette.fail('arguments --skip and -k are mutually exclusive, please use only one of them'))
 
-    if not args.jobs:
-        if not args.cpus:
-            nr_cpus = multiprocessing.cpu_count()
-        else:
-            nr_cpus = int(subprocess.check_output(
-                ['taskset', '-c', args.cpus, 'python3', '-c',
-                 'import os; print(len(os.sched_getaffinity(0)))']))
+    if not args.cpus:
+        nr_cpus = multiprocessing.cpu_count()
+    else:
+        nr_cpus = int(subprocess.check_output(
+            ['taskset', '-c', args.cpus, 'python3', '-c',
+             'import os; print(len(os.sched_getaffinity(0)))']))
 
+    sysmem = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    testmem = 6e9 if os.sysconf('SC_PAGE_SIZE') > 4096 else 2e9
+    # Budgets of the scheduler, see TestScheduler
+    args.cpu_budget = nr_cpus
+    args.memory_budget = sysmem - 4e9
+    args.default_test_memory = testmem
+
+    if not args.jobs:
         cpus_per_test_job = 1
-        sysmem = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
-        testmem = 6e9 if os.sysconf('SC_PAGE_SIZE') > 4096 else 2e9
         default_num_jobs_mem = ((sysmem - 4e9) // testmem)
         args.jobs = min(default_num_jobs_mem, nr_cpus // cpus_per_test_job)
 
@@ -432,11 +447,28 @@ async def run_all_tests(signaled: asyncio.Event, options: argparse.Namespace) ->
         failed_tests.extend(result[1])
         console.print_start_blurb()
         TestSuite.artifacts.add_exit_artifact(None, TestSuite.hosts.cleanup)
-        for test in TestSuite.all_tests():
-            # +1 for 'signaled' event
-            if len(pending) > options.jobs:
+        TestSuite.artifacts.add_exit_artifact(None, close_rest_sessions)
+        history = read_tests_history(pathlib.Path(options.tmpdir)) if options.schedule == 'lpt' else {}
+        scheduler = TestScheduler(
+            tests=TestSuite.all_tests(),
+            history=history,
+            jobs=options.jobs,
+            cpu_budget=options.cpu_budget,
+            memory_budget=options.memory_budget,
+            default_memory=options.default_test_memory,
+            lpt=options.schedule == 'lpt',
+        )
+        if options.verbose and scheduler.lpt:
+            print(f"Scheduling tests longest first, with the history of {len(history)} tests")
+        running = {}
+        while scheduler.queue:
+            test = scheduler.next_test()
+            if test is None:
                 # Wait for some task to finish
                 done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task in running:
+                        scheduler.finished(running.pop(task))
                 failed += await reap(done, pending, signaled)
                 if time.perf_counter() > deadline:
                     print("Session timeout reached")
@@ -444,7 +476,10 @@ async def run_all_tests(signaled: asyncio.Event, options: argparse.Namespace) ->
                 if max_failures != 0 and max_failures <= failed:
                     print("Too much failures, stopping")
                     await cancel(pending, "Too much failures, stopping")
-            pending.add(asyncio.create_task(test.suite.run(test, options)))
+                continue
+            task = asyncio.create_task(test.suite.run(test, options))
+            running[task] = test
+            pending.add(task)
         # Wait & reap ALL tasks but signaled_task
         # Do not use asyncio.ALL_COMPLETED to print a nice progress report
         while len(pending) > 1:
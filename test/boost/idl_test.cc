@@ -338,6 +338,30 @@ BOOST_AUTO_TEST_CASE(test_variant)
     auto v3 = wv_view.third();
     auto&& compound2 = boost::apply_visitor(expect_writable_compound(), v3);
     BOOST_REQUIRE_EQUAL(compound2, sc2);
+
+    // Out of order accesses go through the offsets cached by the view
+    auto in2 = ser::as_input_stream(bv);
+    auto wv_view2 = ser::deserialize(in2, std::type_identity<ser::writable_variants_view>());
+    auto v3_2 = wv_view2.third();
+    BOOST_REQUIRE_EQUAL(boost::apply_visitor(expect_writable_compound(), v3_2), sc2);
+    auto v1_2 = wv_view2.first();
+    BOOST_REQUIRE_EQUAL(boost::apply_visitor(expect_compound(), v1_2), sc);
+    BOOST_REQUIRE_EQUAL(wv_view2.id(), 17);
+
+    size_t index = 0;
+    wv_view2.visit_members([&] (auto member) {
+        if constexpr (std::is_same_v<decltype(member), int>) {
+            BOOST_REQUIRE_EQUAL(member, 17);
+        } else if (index == 1) {
+            BOOST_REQUIRE_EQUAL(boost::apply_visitor(expect_compound(), member), sc);
+        } else if (index == 2) {
+            BOOST_REQUIRE_EQUAL(boost::apply_visitor(expect_vector(), member), vec);
+        } else {
+            BOOST_REQUIRE_EQUAL(boost::apply_visitor(expect_writable_compound(), member), sc2);
+        }
+        ++index;
+    });
+    BOOST_REQUIRE_EQUAL(index, 4);
 }
 
 BOOST_AUTO_TEST_CASE(test_compound_with_optional)
@@ -0,0 +1,69 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import logging
+import sqlite3
+from collections import defaultdict
+from pathlib import Path
+
+from attr import define
+
+from test.pylib.db.writer import METRICS_TABLE, TESTS_TABLE
+
+logger = logging.getLogger(__name__)
+
+DB_NAME_PATTERN = 'sqlite_*.db'
+
+
+@define
+class TestHistory:
+    time_taken: float
+    usage_sec: float = None
+    memory_peak: int = None
+    runs: int = 0
+
+
+def read_tests_history(directory: Path, last_runs: int = 5) -> dict[tuple[str, str, str], TestHistory]:
+    """
+    Reads the metrics of the previous test runs from all the databases in the directory.
+
+    Every test.py run writes its own sqlite_<HOST_ID>.db, so the history is
+    spread over all the databases found in the directory.
+
+    Args:
+        directory: The directory of the databases, the tmpdir of test.py.
+        last_runs: How many of the most recent successful runs of a test to take into account.
+
+    Return:
+        dict: (directory, mode, test_name) -> TestHistory with the mean time_taken and usage_sec
+        and the max memory_peak of the last runs of the test.
+    """
+    runs = defaultdict(list)
+    query = f'''
+        SELECT t.directory, t.mode, t.test_name, m.time_start, m.time_taken, m.usage_sec, m.memory_peak
+        FROM {TESTS_TABLE} t JOIN {METRICS_TABLE} m ON m.test_id = t.id
+        WHERE m.success AND m.time_taken IS NOT NULL
+    '''
+    for db_path in sorted(Path(directory).glob(DB_NAME_PATTERN)):
+        try:
+            with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=1) as conn:
+                for directory_name, mode, test_name, time_start, time_taken, usage_sec, memory_peak in conn.execute(query):
+                    runs[(directory_name, mode, test_name)].append((str(time_start), time_taken, usage_sec, memory_peak))
+        except sqlite3.Error as e:
+            logger.warning('Skipping test metrics database %s: %s', db_path, e)
+
+    history = {}
+    for key, test_runs in runs.items():
+        test_runs = sorted(test_runs)[-last_runs:]
+        usages = [usage_sec for _, _, usage_sec, _ in test_runs if usage_sec is not None]
+        memory_peaks = [int(memory_peak) for _, _, _, memory_peak in test_runs if memory_peak is not None]
+        history[key] = TestHistory(
+            time_taken=sum(time_taken for _, time_taken, _, _ in test_runs) / len(test_runs),
+            usage_sec=sum(usages) / len(usages) if usages else None,
+            memory_peak=max(memory_peaks) if memory_peaks else None,
+            runs=len(test_runs),
+        )
+    return history
@@ -5,7 +5,10 @@
 from __future__ import annotations
 
 import asyncio
+import ctypes
 import logging
+import mmap
+import os
 import re
 from pathlib import Path
 from typing import TYPE_CHECKING
@@ -16,11 +19,221 @@ import universalasync
 if TYPE_CHECKING:
     from asyncio import AbstractEventLoop
     from concurrent.futures import ThreadPoolExecutor
-    from typing import Callable
+    from typing import Callable, Iterator
 
 
 logger = logging.getLogger(__name__)
 
+# Logs are read and split into lines in chunks of this size.
+CHUNK_SIZE = 1 << 20
+
+IN_MODIFY = 0x2
+
+
+def _split_lines(data: bytes) -> list[bytes]:
+    """Split data into lines, keeping the line ends. Unlike bytes.splitlines(), only b"\n" ends a line."""
+    parts = data.split(b"\n")
+    lines = [part + b"\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def _iter_lines(file: Path, start: int = 0, end: int | None = None) -> Iterator[tuple[int, str]]:
+    """Yield (end offset, line) for the lines of the file between the start and end offsets.
+
+    The file is mapped to memory and split into lines in large chunks.  A trailing line without a line end is
+    yielded too.
+    """
+    with file.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos < end:
+                chunk_end = min(pos + CHUNK_SIZE, end)
+                if chunk_end < end:
+                    # Don't split a line between chunks.
+                    newline = mm.rfind(b"\n", pos, chunk_end)
+                    if newline < 0:
+                        newline = mm.find(b"\n", chunk_end, end)
+                    chunk_end = end if newline < 0 else newline + 1
+                for raw in _split_lines(mm[pos:chunk_end]):
+                    pos += len(raw)
+                    yield pos, raw.decode(errors="replace")
+
+
+def _inotify_watch(file: Path) -> int | None:
+    """Return a non-blocking inotify file descriptor watching the file for writes, or None if inotify is not
+    available."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(file), IN_MODIFY) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _match_line(line: str, exprs: list[re.Pattern[str]], matches: list[tuple[str, re.Match[str]]]) -> None:
+    for pattern in exprs.copy():
+        if match := pattern.search(line):
+            logger.debug("Found log message: %s", line)
+            matches.append((line, match))
+            exprs.remove(pattern)
+
+
+def _search_lines(file: Path,
+                  start: int,
+                  end: int,
+                  exprs: list[re.Pattern[str]],
+                  matches: list[tuple[str, re.Match[str]]]) -> int | None:
+    """Match the lines of the file between the offsets against exprs, until all of them are found.
+
+    Return the end offset of the line which matched the last expression, None if some are not found.
+    """
+    for position, line in _iter_lines(file, start, end):
+        _match_line(line, exprs, matches)
+        if not exprs:
+            return position
+    return None
+
+
+class _LogWaiter:
+    """A wait_for() call registered with a _LogTail."""
+
+    def __init__(self, exprs: list[re.Pattern[str]], from_mark: int, catch_up_end: int) -> None:
+        self.exprs = exprs
+        self.matches: list[tuple[str, re.Match[str]]] = []
+        self.from_mark = from_mark
+        # The lines before this offset were written before the waiter was registered; wait_for() searches them
+        # itself, and the lines dispatched by the tail in the meantime are kept in `pending`.
+        self.catch_up_end = catch_up_end
+        self.pending: list[tuple[int, int, bytes, str]] | None = []
+        self.position = from_mark
+        self.done = asyncio.get_running_loop().create_future()
+
+    def feed(self, start: int, end: int, raw: bytes, line: str) -> None:
+        if self.done.done() or end <= self.from_mark:
+            return
+        if self.pending is not None:
+            self.pending.append((start, end, raw, line))
+            return
+        if start < self.from_mark:
+            line = raw[self.from_mark - start:].decode(errors="replace")
+        _match_line(line, self.exprs, self.matches)
+        self.position = end
+        if not self.exprs:
+            self.done.set_result(None)
+
+    def caught_up(self, position: int | None) -> None:
+        """Called when the lines before catch_up_end are searched, with the end of the line of the last match."""
+        pending, self.pending = self.pending, None
+        if not self.exprs:
+            self.position = position
+            self.done.set_result(None)
+            return
+        for args in pending:
+            self.feed(*args)
+
+
+class _LogTail:
+    """Follow a log file and dispatch its new lines to all the wait_for() calls waiting on it.
+
+    There is a single tail per log file and event loop, alive while there are waiters.  New data is noticed with
+    inotify (if not available, by polling), read in large chunks and split into lines once.
+    """
+
+    POLL_INTERVAL = 0.01
+    # Even with inotify, check the file once in a while in case an event was missed.
+    INOTIFY_POLL_INTERVAL = 1
+
+    _tails: dict[tuple[AbstractEventLoop, Path], _LogTail] = {}
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+        self.loop = asyncio.get_running_loop()
+        self.waiters: set[_LogWaiter] = set()
+        self.fd = os.open(file, os.O_RDONLY | os.O_CLOEXEC)
+        # The end of the last dispatched line; the file is followed from the start of its last incomplete line.
+        self.position = self._last_line_start()
+        self.partial = b""
+        self.changed = asyncio.Event()
+        self.inotify_fd = _inotify_watch(file)
+        if self.inotify_fd is not None:
+            self.loop.add_reader(self.inotify_fd, self._on_inotify)
+        self.task = self.loop.create_task(self._run())
+
+    @classmethod
+    def get(cls, file: Path) -> _LogTail:
+        key = (asyncio.get_running_loop(), file.resolve())
+        if (tail := cls._tails.get(key)) is None:
+            tail = cls._tails[key] = cls(file)
+        return tail
+
+    def _last_line_start(self) -> int:
+        end = os.fstat(self.fd).st_size
+        while end > 0:
+            start = max(end - CHUNK_SIZE, 0)
+            newline = os.pread(self.fd, end - start, start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+        return 0
+
+    def add_waiter(self, exprs: list[re.Pattern[str]], from_mark: int) -> _LogWaiter:
+        waiter = _LogWaiter(exprs, from_mark, self.position)
+        self.waiters.add(waiter)
+        return waiter
+
+    def remove_waiter(self, waiter: _LogWaiter) -> None:
+        self.waiters.discard(waiter)
+        if not self.waiters:
+            self._close()
+
+    def _close(self) -> None:
+        self._tails.pop((self.loop, self.file.resolve()), None)
+        self.task.cancel()
+        if self.inotify_fd is not None:
+            self.loop.remove_reader(self.inotify_fd)
+            os.close(self.inotify_fd)
+        os.close(self.fd)
+
+    def _on_inotify(self) -> None:
+        try:
+            while os.read(self.inotify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self.changed.set()
+
+    async def _run(self) -> None:
+        poll_interval = self.POLL_INTERVAL if self.inotify_fd is None else self.INOTIFY_POLL_INTERVAL
+        while True:
+            self.changed.clear()
+            self._read()
+            try:
+                await asyncio.wait_for(self.changed.wait(), poll_interval)
+            except TimeoutError:
+                pass
+
+    def _read(self) -> None:
+        while data := os.pread(self.fd, CHUNK_SIZE, self.position + len(self.partial)):
+            data = self.partial + data
+            end = data.rfind(b"\n") + 1
+            self.partial = data[end:]
+            for raw in _split_lines(data[:end]):
+                start, self.position = self.position, self.position + len(raw)
+                line = raw.decode(errors="replace")
+                for waiter in self.waiters.copy():
+                    waiter.feed(start, self.position, raw, line)
+
 
 @universalasync.wrap
 class ScyllaLogFile:
@@ -64,37 +277,35 @@ class ScyllaLogFile:
         long timeouts will make xfailing tests slow.
 
         Return a tuple with the last read position and list of tuples with matched lines and re.Match instances.
+
+        The new lines of the log are read by a tail shared by all the calls waiting on the same log file, see
+        _LogTail.
         """
         logger.debug("Waiting for log message(s): %s", exprs)
 
-        loop = asyncio.get_running_loop()
-
         exprs = [re.compile(pattern) for pattern in exprs]
-        matches = []
-
-        with self.file.open(encoding="utf-8") as log_file:
-            if from_mark is not None:
-                await self._run_in_executor(log_file.seek, from_mark, loop=loop)
-
+        from_mark = from_mark or 0
+        if not exprs:
+            return from_mark, []
+
+        tail = _LogTail.get(self.file)
+        waiter = tail.add_waiter(exprs, from_mark)
+        try:
+            # Because it may take time for the log message to be flushed, and sometimes we may want to look
+            # for messages about various delayed events, this function doesn't give up when it reaches
+            # the end of file, and rather waits for new lines until a given timeout.
             async with asyncio.timeout(timeout):
-                line = ""
-                while exprs:
-                    # Because it may take time for the log message to be flushed, and sometimes we may want to look
-                    # for messages about various delayed events, this function doesn't give up when it reaches
-                    # the end of file, and rather retries until a given timeout.
-                    line += await self._run_in_executor(log_file.readline, loop=loop)
-                    if line:
-                        for pattern in exprs.copy():
-                            if match := pattern.search(line):
-                                logger.debug("Found log message: %s", line)
-                                matches.append((line, match))
-                                exprs.remove(pattern)
-                        if line[-1] == "\n":
-                            line = ""
-                    else:
-                        await asyncio.sleep(0.01)
-
-            return await self._run_in_executor(log_file.tell, loop=loop), matches
+                position = None
+                if from_mark < waiter.catch_up_end:
+                    position = await self._run_in_executor(
+                        _search_lines, self.file, from_mark, waiter.catch_up_end, waiter.exprs, waiter.matches,
+                    )
+                waiter.caught_up(position)
+                await waiter.done
+        finally:
+            tail.remove_waiter(waiter)
+
+        return waiter.position, waiter.matches
 
     async def grep(self,
                    expr: str | re.Pattern[str],
@@ -112,22 +323,19 @@ class ScyllaLogFile:
         Return a list of tuples (line, match), where line is the full line from the log, and match is the re.Match[str]
         object for the matching expression.
         """
-        loop = asyncio.get_running_loop()
-
         expr = re.compile(expr)
         filter_func = re.compile(filter_expr).search if filter_expr else lambda _: False
-        matches = []
 
-        with self.file.open(encoding="utf-8") as log_file:
-            if from_mark:
-                await self._run_in_executor(log_file.seek, from_mark, loop=loop)
-            while line := await self._run_in_executor(log_file.readline, loop=loop):
+        def grep() -> list[tuple[str, re.Match[str]]]:
+            matches = []
+            for _, line in _iter_lines(self.file, from_mark or 0):
                 if match := not filter_func(line) and expr.search(line):
                     matches.append((line, match))
                     if len(matches) == max_count:
                         break
+            return matches
 
-        return matches
+        return await self._run_in_executor(grep)
 
     async def grep_for_errors(self,
                               distinct_errors: bool = False,
@@ -141,29 +349,26 @@ class ScyllaLogFile:
 
         Return a list of error messages.  Error message can be just one line or a list of lines.
         """
-        loop = asyncio.get_running_loop()
-
         # Each line in scylla-*.log starts with log level, so, use re.match to search from the beginning of each line.
         error_pattern = re.compile(r"ERROR\b")
         info_pattern = re.compile(r"INFO\b")
-        matches = []
 
-        with self.file.open(encoding="utf-8") as log_file:
-            if from_mark:
-                await self._run_in_executor(log_file.seek, from_mark, loop=loop)
-            line = await self._run_in_executor(log_file.readline, loop=loop)
-            while line:
+        def grep_for_errors() -> list[str] | list[list[str]]:
+            matches = []
+            in_error = False
+            for _, line in _iter_lines(self.file, from_mark or 0):
+                if in_error:
+                    if not info_pattern.match(line):
+                        matches[-1].append(line)
+                        continue
+                    in_error = False
                 if error_pattern.match(line):
                     if distinct_errors:
                         if line not in matches:
                             matches.append(line)
                     else:
                         matches.append([line])
-                        while line := await self._run_in_executor(log_file.readline, loop=loop):
-                            if info_pattern.match(line):
-                                break
-                            matches[-1].append(line)
-                        continue
-                line = await self._run_in_executor(log_file.readline, loop=loop)
+                        in_error = True
+            return matches
 
-        return matches
+        return await self._run_in_executor(grep_for_errors)
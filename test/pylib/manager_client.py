@@ -16,7 +16,7 @@ from typing import List, Optional, Callable, Any, Awaitable, Dict, Tuple, Union
 from time import time
 import logging
 from test.pylib.log_browsing import ScyllaLogFile
-from test.pylib.rest_client import UnixRESTClient, ScyllaRESTAPIClient, ScyllaMetricsClient
+from test.pylib.rest_client import UnixRESTClient, ScyllaRESTAPIClient, ScyllaMetricsClient, close_rest_sessions
 from test.pylib.util import wait_for, wait_for_cql_and_get_hosts, Host
 from test.pylib.internal_types import ServerNum, IPAddress, HostID, ServerInfo, ServerUpState
 from test.pylib.scylla_cluster import ReplaceConfig, ScyllaServer, ScyllaVersionDescription
@@ -88,6 +88,7 @@ class ManagerClient:
         # TODO: good candidate for safe_gather  https://github.com/scylladb/scylladb/pull/17781
         #  to make sure that all connections is closed
         await asyncio.gather(*[client.shutdown() for client in self.client_for_asyncio_loop.values()])
+        await close_rest_sessions()
 
     async def driver_connect(self, server: Optional[ServerInfo] = None, auth_provider: Optional[AuthProvider] = None) -> None:
         """Connect to cluster"""
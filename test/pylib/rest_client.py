@@ -7,8 +7,11 @@
 """
 from __future__ import annotations                           # Type hints as strings
 
+import asyncio
+import bisect
 import logging
 import os.path
+import weakref
 from abc import ABCMeta
 from collections.abc import Mapping
 from contextlib import asynccontextmanager
@@ -16,7 +19,7 @@ from typing import Any, Optional, AsyncIterator
 
 import pytest
 import universalasync
-from aiohttp import request, BaseConnector, UnixConnector, ClientTimeout
+from aiohttp import BaseConnector, ClientSession, ClientTimeout, ServerDisconnectedError, TCPConnector, UnixConnector
 from cassandra.pool import Host                          # type: ignore # pylint: disable=no-name-in-module
 
 from test.pylib.internal_types import IPAddress, HostID
@@ -24,6 +27,31 @@ from test.pylib.internal_types import IPAddress, HostID
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive connections to each node's REST API, shared by all the TCP clients running in the same event loop.
+REST_CONNECTIONS_PER_HOST = 8
+REST_KEEPALIVE_TIMEOUT = 30
+
+_tcp_sessions: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ClientSession] = weakref.WeakKeyDictionary()
+
+
+def _tcp_session() -> ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _tcp_sessions.get(loop)
+    if session is None or session.closed:
+        session = _tcp_sessions[loop] = ClientSession(connector=TCPConnector(
+            limit=0,
+            limit_per_host=REST_CONNECTIONS_PER_HOST,
+            keepalive_timeout=REST_KEEPALIVE_TIMEOUT,
+        ))
+    return session
+
+
+async def close_rest_sessions() -> None:
+    """Close the keep-alive connections of the TCP REST clients of the running event loop."""
+    session = _tcp_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
 
 class HTTPError(Exception):
     def __init__(self, uri, code, params, json, message):
@@ -41,7 +69,7 @@ class HTTPError(Exception):
 
 # TODO: support ssl and verify_ssl
 class RESTClient(metaclass=ABCMeta):
-    """Base class for sesion-free REST client"""
+    """Base class for REST clients keeping their connections alive between requests"""
     connector: Optional[BaseConnector]
     uri_scheme: str   # e.g. http, http+unix
     default_host: str
@@ -66,9 +94,24 @@ class RESTClient(metaclass=ABCMeta):
         logging.debug(f"RESTClient fetching {method} {uri}")
 
         client_timeout = ClientTimeout(total = timeout if timeout is not None else 300)
-        async with request(method, uri,
-                           connector = self.connector if hasattr(self, "connector") else None,
-                           params = params, json = json, timeout = client_timeout) as resp:
+        try:
+            return await self._request(method, uri, response_type, params, json, client_timeout, allow_failed)
+        except ServerDisconnectedError:
+            # A kept alive connection may have been closed by a restarted server; only retry
+            # requests which are safe to repeat.
+            if method != "GET":
+                raise
+            logging.debug(f"RESTClient retrying {method} {uri} after the server closed the connection")
+            return await self._request(method, uri, response_type, params, json, client_timeout, allow_failed)
+
+    def _session(self) -> ClientSession:
+        return _tcp_session()
+
+    async def _request(self, method: str, uri: str, response_type: Optional[str],
+                       params: Optional[Mapping[str, str]], json: Optional[Mapping],
+                       client_timeout: ClientTimeout, allow_failed: bool) -> Any:
+        async with self._session().request(method, uri, params = params, json = json,
+                                           timeout = client_timeout) as resp:
             if allow_failed:
                 return await resp.json()
             if resp.status != 200:
@@ -135,8 +178,16 @@ class UnixRESTClient(RESTClient):
         self.uri_scheme: str = "http"
         self.default_host: str = f"{os.path.basename(sock_path)}"
         self.connector = UnixConnector(path=sock_path)
+        self.session: Optional[ClientSession] = None
+
+    def _session(self) -> ClientSession:
+        if self.session is None:
+            self.session = ClientSession(connector=self.connector, connector_owner=False)
+        return self.session
 
     async def shutdown(self):
+        if self.session is not None:
+            await self.session.close()
         await self.connector.close()
 
 
@@ -164,6 +215,10 @@ class ScyllaRESTAPIClient:
         host_uuid = host_uuid.lstrip('"').rstrip('"')
         return HostID(host_uuid)
 
+    async def get_host_ids(self, server_ips: list[IPAddress]) -> list[HostID]:
+        """Get the server ids (UUIDs) of many servers, querying them concurrently"""
+        return list(await asyncio.gather(*(self.get_host_id(server_ip) for server_ip in server_ips)))
+
     async def get_host_id_map(self, dst_server_ip: IPAddress) -> list[HostID]:
         """Retrieve the mapping of endpoint to host ID"""
         data = await self.client.get_json("/storage_service/host_id/", dst_server_ip)
@@ -557,6 +612,26 @@ class ScyllaMetricsLine:
 class ScyllaMetrics:
     def __init__(self, lines: list[str]):
         self.lines: list[str] = lines
+        # Parsed on first get(), sorted by name so a prefix selects a contiguous range.
+        self._names: list[str] | None = None
+        self._parsed: list[ScyllaMetricsLine] = []
+
+    def _index(self) -> tuple[list[str], list[ScyllaMetricsLine]]:
+        if self._names is None:
+            parsed = []
+            for l in self.lines:
+                if l.startswith('#'):
+                    continue
+                try:
+                    parsed_line = ScyllaMetricsLine.from_string(l)
+                except ValueError:
+                    logger.debug("Skipping unparsable metrics line: %s", l)
+                    continue
+                if parsed_line is not None:
+                    parsed.append(parsed_line)
+            self._parsed = sorted(parsed, key=lambda parsed_line: parsed_line.name)
+            self._names = [parsed_line.name for parsed_line in self._parsed]
+        return self._names, self._parsed
 
     def lines_by_prefix(self, prefix: str):
         """Returns all metrics whose name starts with a prefix, e.g.
@@ -580,12 +655,13 @@ class ScyllaMetrics:
 
         Returns the sum of all matching metric values, or None if no matches found.
         """
-        values = [
-            parsed_line.value
-            for l in self.lines_by_prefix(name)
-            if (parsed_line := ScyllaMetricsLine.from_string(l)) is not None
-            and self._labels_match(parsed_line.labels, labels)
-        ]
+        names, parsed = self._index()
+        values = []
+        for i in range(bisect.bisect_left(names, name), len(names)):
+            if not names[i].startswith(name):
+                break
+            if self._labels_match(parsed[i].labels, labels):
+                values.append(parsed[i].value)
         return sum(values) if values else None
 
 class ScyllaMetricsClient:
@@ -21,6 +21,7 @@ import pytest
 import yaml
 
 from test import ALL_MODES, DEBUG_MODES, TEST_RUNNER, TOP_SRC_DIR
+from test.pylib.rest_client import close_rest_sessions
 from test.pylib.suite.base import (
     SUITE_CONFIG_FILENAME,
     TestSuite,
@@ -86,6 +87,9 @@ def pytest_addoption(parser: pytest.Parser) -> None:
     parser.addoption("--cluster-pool-size", type=int,
                      help="Set the pool_size for PythonTest and its descendants.  Alternatively environment variable "
                           "CLUSTER_POOL_SIZE can be used to achieve the same")
+    parser.addoption("--cluster-snapshots", action="store_true", default=False,
+                     help="Boot a reference cluster once per suite and start the clusters of the suite's pool "
+                          "from a copy of its data directories, with fresh IPs, instead of bootstrapping them")
     parser.addoption("--extra-scylla-cmdline-options", default=[],
                      help="Passing extra scylla cmdline options for all tests.  Options should be space separated:"
                           " '--logger-log-level raft=trace --default-log-level error'")
@@ -168,6 +172,7 @@ def pytest_sessionstart(session: pytest.Session) -> None:
 
     init_testsuite_globals()
     TestSuite.artifacts.add_exit_artifact(None, TestSuite.hosts.cleanup)
+    TestSuite.artifacts.add_exit_artifact(None, close_rest_sessions)
 
     # Run stuff just once for the pytest session even running under xdist.
     if "xdist" not in sys.modules or not sys.modules["xdist"].is_xdist_worker(request_or_session=session):
@@ -0,0 +1,124 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+from __future__ import annotations
+
+import statistics
+from typing import TYPE_CHECKING
+
+from attr import define
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from test.pylib.db.reader import TestHistory
+    from test.pylib.suite.base import Test
+
+
+@define
+class Estimate:
+    duration: float
+    cpu: float
+    memory: float
+
+
+class TestScheduler:
+    """
+    Decides which test to start next.
+
+    With the history of the previous runs (see read_tests_history()), tests are
+    started longest (and most memory-hungry) first, the LPT (longest processing
+    time) heuristic, so a run doesn't end with a long tail of a single long test.
+    A test is only started when the sum of the estimated CPU and memory usage of
+    the running tests leaves room for it, the next test that fits is started
+    otherwise. Tests without history are estimated with the median of their
+    suite, or of all the tests.
+
+    Without history (or with lpt=False), tests are started in their original order
+    and only the number of jobs is limited.
+    """
+
+    def __init__(self,
+                 tests: Iterable[Test],
+                 history: dict[tuple[str, str, str], TestHistory],
+                 jobs: int,
+                 cpu_budget: float,
+                 memory_budget: float,
+                 default_memory: float,
+                 lpt: bool = True) -> None:
+        self.jobs = jobs
+        self.cpu_budget = cpu_budget
+        self.memory_budget = memory_budget
+        self.lpt = lpt and bool(history)
+        self.cpu_used = 0.0
+        self.memory_used = 0.0
+        self.running: dict[Test, Estimate] = {}
+
+        tests = list(tests)
+        self._estimates = self._estimate(tests, history, default_memory)
+        self.queue = tests
+        if self.lpt:
+            # sort() is stable, tests with the same estimate keep their original order
+            self.queue.sort(key=lambda t: (self._estimates[t].duration, self._estimates[t].memory), reverse=True)
+
+    @staticmethod
+    def _estimate(tests: list[Test],
+                  history: dict[tuple[str, str, str], TestHistory],
+                  default_memory: float) -> dict[Test, Estimate]:
+        known = {}
+        suite_durations = {}
+        for test in tests:
+            h = history.get((test.suite.name, test.mode, test.shortname))
+            if h is None:
+                continue
+            cpu = h.usage_sec / h.time_taken if h.usage_sec and h.time_taken else 1.0
+            known[test] = Estimate(duration=h.time_taken,
+                                   cpu=max(cpu, 0.1),
+                                   memory=h.memory_peak if h.memory_peak is not None else default_memory)
+            suite_durations.setdefault((test.suite.name, test.mode), []).append(h.time_taken)
+        default_duration = statistics.median(e.duration for e in known.values()) if known else 0.0
+
+        estimates = {}
+        for test in tests:
+            if test in known:
+                estimates[test] = known[test]
+                continue
+            durations = suite_durations.get((test.suite.name, test.mode))
+            estimates[test] = Estimate(duration=statistics.median(durations) if durations else default_duration,
+                                       cpu=1.0,
+                                       memory=default_memory)
+        return estimates
+
+    def estimate(self, test: Test) -> Estimate:
+        return self._estimates[test]
+
+    def _fits(self, estimate: Estimate) -> bool:
+        return (self.cpu_used + estimate.cpu <= self.cpu_budget and
+                self.memory_used + estimate.memory <= self.memory_budget)
+
+    def next_test(self) -> Test | None:
+        """Returns the next test to start and marks it as running, None if none can be started now."""
+        if not self.queue or len(self.running) >= self.jobs:
+            return None
+        index = None
+        if not self.lpt or not self.running:
+            # Always run at least one test, even if it doesn't fit the budget
+            index = 0
+        else:
+            index = next((i for i, test in enumerate(self.queue) if self._fits(self._estimates[test])), None)
+            if index is None:
+                return None
+        test = self.queue.pop(index)
+        estimate = self._estimates[test]
+        self.running[test] = estimate
+        self.cpu_used += estimate.cpu
+        self.memory_used += estimate.memory
+        return test
+
+    def finished(self, test: Test) -> None:
+        estimate = self.running.pop(test)
+        self.cpu_used -= estimate.cpu
+        self.memory_used -= estimate.memory
@@ -65,6 +65,15 @@ async def async_rmtree(directory, *args, **kwargs):
     await loop.run_in_executor(io_executor, partial(shutil.rmtree, directory, *args, **kwargs))
 
 
+async def async_copytree(src: pathlib.Path, dst: pathlib.Path) -> None:
+    """Copy a directory tree, sharing the data blocks with the source (reflink)
+    where the filesystem supports it and falling back to a regular copy otherwise.
+    Hardlinks are not an option: commitlog segments are recycled in place."""
+    proc = await asyncio.create_subprocess_exec("cp", "-a", "--reflink=auto", "-T", str(src), str(dst))
+    if await proc.wait() != 0:
+        raise RuntimeError(f"Failed to copy {src} to {dst}")
+
+
 class ReplaceConfig(NamedTuple):
     replaced_id: ServerNum
     reuse_ip_addr: bool
@@ -188,6 +197,12 @@ class ScyllaVersionDescription(NamedTuple):
     config: dict # a dictionary of added scylla.yaml options
     argv: list[str] # a list of added CLI args
 
+
+class ClusterSnapshot(NamedTuple):
+    """The workdirs of the servers of a gracefully stopped cluster, see ScyllaCluster.take_snapshot()"""
+    cluster_name: str
+    workdirs: List[pathlib.Path]
+
 # Returns the description of the current version.
 # (I.e. the one we just built and are now testing).
 #
@@ -530,10 +545,11 @@ class ScyllaServer:
     async def install_and_start(self,
                                 api: ScyllaRESTAPIClient,
                                 expected_error: Optional[str] = None,
-                                expected_server_up_state: ServerUpState = ServerUpState.CQL_QUERIED) -> None:
+                                expected_server_up_state: ServerUpState = ServerUpState.CQL_QUERIED,
+                                snapshot: Optional[pathlib.Path] = None) -> None:
         """Setup and start this server."""
 
-        await self.install()
+        await self.install(snapshot)
 
         self.logger.info("starting server at host %s in %s...", self.ip_addr, self.workdir.name)
 
@@ -560,9 +576,11 @@ class ScyllaServer:
         if not os.access(self.exe, os.X_OK):
             raise RuntimeError(f"{self.exe} is not executable")
 
-    async def install(self) -> None:
+    async def install(self, snapshot: Optional[pathlib.Path] = None) -> None:
         """Create a working directory with all subdirectories, initialize
-        a configuration file."""
+        a configuration file.
+        If `snapshot` is given, the working directory starts as a copy of it,
+        the data of a server of a cluster snapshot."""
 
         self.check_scylla_executable()
 
@@ -572,6 +590,9 @@ class ScyllaServer:
         await async_rmtree(self.workdir, ignore_errors=True)
 
         try:
+            if snapshot is not None:
+                self.workdir.parent.mkdir(parents=True, exist_ok=True)
+                await async_copytree(snapshot, self.workdir)
             self.workdir.mkdir(parents=True, exist_ok=True)
             self.config_filename.parent.mkdir(parents=True, exist_ok=True)
             self._write_config_file()
@@ -993,6 +1014,8 @@ class ScyllaCluster:
         self.host_registry = host_registry
         self.leased_ips = set[IPAddress]()
         self.name = str(uuid.uuid1())
+        # The cluster_name of scylla.yaml, that of the snapshot for clusters started from one
+        self.cluster_name = self.name
         self.replicas = replicas
         self.create_server = create_server
         # Every ScyllaServer is in one of self.running, self.stopped.
@@ -1014,11 +1037,14 @@ class ScyllaCluster:
         self.stop_lock = asyncio.Lock()
         self.logger.info("Created new cluster %s", self.name)
 
-    async def install_and_start(self) -> None:
-        """Setup initial servers and start them.
+    async def install_and_start(self, snapshot: Optional[ClusterSnapshot] = None) -> None:
+        """Setup initial servers and start them, from a snapshot if given.
            Catch and save any startup exception"""
         try:
-            if self.replicas > 0:
+            if snapshot is not None:
+                await self._start_from_snapshot(snapshot)
+                self.keyspace_count = self._get_keyspace_count()
+            elif self.replicas > 0:
                 await self.add_servers(self.replicas)
                 self.keyspace_count = self._get_keyspace_count()
         except Exception as exc:
@@ -1029,6 +1055,61 @@ class ScyllaCluster:
         self.logger.info("Created cluster %s", self)
         self.is_dirty = False
 
+    async def _start_from_snapshot(self, snapshot: ClusterSnapshot) -> None:
+        """Start the initial servers from copies of the workdirs of a snapshot,
+        with fresh IPs. The copies keep the host ids and the cluster name of
+        the snapshot, the servers find each other at the new addresses through
+        the seeds, which are all the new IPs."""
+        assert len(snapshot.workdirs) == self.replicas, \
+            f"snapshot of {len(snapshot.workdirs)} servers for a cluster of {self.replicas}"
+        self.cluster_name = snapshot.cluster_name
+        ips = []
+        for _ in snapshot.workdirs:
+            ip_addr = IPAddress(await self.host_registry.lease_host())
+            self.leased_ips.add(ip_addr)
+            ips.append(ip_addr)
+        self.logger.info("Cluster %s starting from a snapshot with IPs %s", self.name, ips)
+        self.initial_seed = ips[0]
+
+        async def start(ip_addr: IPAddress, workdir: pathlib.Path) -> None:
+            server = self.create_server(ScyllaCluster.CreateServerParams(
+                logger = self.logger,
+                cluster_name = self.cluster_name,
+                ip_addr = ip_addr,
+                seeds = ips,
+                property_file = None,
+                config_from_test = {},
+                cmdline_from_test = [],
+                version = None,
+                server_encryption = "none",
+            ))
+            try:
+                await server.install_and_start(self.api, snapshot=workdir)
+            finally:
+                if server.is_running:
+                    self.running[server.server_id] = server
+                else:
+                    self.stopped[server.server_id] = server
+
+        await gather_safely(*(start(ip, workdir) for ip, workdir in zip(ips, snapshot.workdirs)))
+
+    async def take_snapshot(self, directory: pathlib.Path) -> ClusterSnapshot:
+        """Stop the cluster gracefully and copy the workdirs of its servers to
+        `directory`. Clusters of the same size and configuration can then be
+        started from the snapshot with install_and_start(snapshot), without
+        bootstrapping their servers."""
+        assert self.start_exception is None, f"Can't snapshot cluster {self.name}, it failed to start"
+        assert self.running and not self.stopped, f"Can't snapshot cluster {self.name} with stopped servers"
+        await self.stop_gracefully()
+        workdirs = []
+        for i, server in enumerate(self.stopped.values()):
+            workdir = directory / str(i)
+            await async_rmtree(workdir, ignore_errors=True)
+            await async_copytree(server.workdir, workdir)
+            workdirs.append(workdir)
+        self.logger.info("Cluster %s snapshot taken in %s", self.name, directory)
+        return ClusterSnapshot(self.cluster_name, workdirs)
+
     async def uninstall(self) -> None:
         """Stop running servers and uninstall all servers"""
         self.is_dirty = True
@@ -1133,7 +1214,7 @@ class ScyllaCluster:
 
         params = ScyllaCluster.CreateServerParams(
             logger = self.logger,
-            cluster_name = self.name,
+            cluster_name = self.cluster_name,
             ip_addr = ip_addr,
             seeds = seeds,
             property_file = property_file,
@@ -6,6 +6,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import collections
 import logging
 import os
@@ -18,7 +19,8 @@ from typing import TYPE_CHECKING
 from scripts import coverage
 from test import path_to
 from test.pylib.pool import Pool
-from test.pylib.scylla_cluster import ScyllaCluster, ScyllaServer, merge_cmdline_options, get_current_version_description
+from test.pylib.scylla_cluster import ClusterSnapshot, ScyllaCluster, ScyllaServer, merge_cmdline_options, \
+    get_current_version_description
 from test.pylib.suite.base import Test, TestSuite, read_log, run_test
 from test.pylib.util import LogPrefixAdapter
 
@@ -53,6 +55,8 @@ class PythonTestSuite(TestSuite):
         else:
             pool_size = cfg.get("pool_size", 2)
         self.dirties_cluster = set(cfg.get("dirties_cluster", []))
+        # Boot a reference cluster once and start the pool's clusters from a copy of its workdirs.
+        self.cluster_snapshots = bool(getattr(options, "cluster_snapshots", False)) and cluster_size > 0
 
         self.create_cluster = self.get_cluster_factory(cluster_size, options)
         async def recycle_cluster(cluster: ScyllaCluster) -> None:
@@ -106,6 +110,35 @@ class PythonTestSuite(TestSuite):
 
             return server
 
+        snapshot: Optional[ClusterSnapshot] = None
+        snapshot_lock = asyncio.Lock()
+
+        async def get_snapshot(logger: Union[logging.Logger, logging.LoggerAdapter]) -> Optional[ClusterSnapshot]:
+            """Boot the reference cluster of the suite on first use and snapshot it.
+               If it fails to start, snapshots are disabled for the suite and
+               clusters are bootstrapped as usual."""
+            nonlocal snapshot
+            async with snapshot_lock:
+                if snapshot is not None or not self.cluster_snapshots:
+                    return snapshot
+                reference = ScyllaCluster(logger, self.hosts, cluster_size, create_server)
+                try:
+                    await reference.install_and_start()
+                    if reference.start_exception is not None:
+                        raise reference.start_exception
+                    snapshot = await reference.take_snapshot(self.log_dir / "snapshots" / f"{self.name}-{cluster_size}")
+                except Exception as exc:
+                    logger.warning("Failed to take a cluster snapshot for suite %s, "
+                                   "bootstrapping clusters instead: %s", self.name, exc)
+                    self.cluster_snapshots = False
+                finally:
+                    for srv in reference.servers.values():
+                        if srv.log_file is not None:
+                            srv.log_file.close()
+                        srv.maintenance_socket_dir.cleanup()
+                    await reference.uninstall()
+                return snapshot
+
         async def create_cluster(logger: Union[logging.Logger, logging.LoggerAdapter]) -> ScyllaCluster:
             cluster = ScyllaCluster(logger, self.hosts, cluster_size, create_server)
 
@@ -123,7 +156,7 @@ class PythonTestSuite(TestSuite):
                 self.artifacts.add_suite_artifact(self, uninstall)
             self.artifacts.add_exit_artifact(self, stop)
 
-            await cluster.install_and_start()
+            await cluster.install_and_start(await get_snapshot(logger))
             return cluster
 
         return create_cluster
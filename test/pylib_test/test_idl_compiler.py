@@ -0,0 +1,183 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+"""Tests of the Python decoders generated by idl-compiler.py --python, against hand-built frames."""
+
+import importlib.util
+import ipaddress
+import pathlib
+import struct
+import subprocess
+import sys
+
+import pytest
+
+
+IDL_COMPILER = pathlib.Path(__file__).parents[2] / 'idl-compiler.py'
+
+IDL = '''
+namespace test {
+
+enum class color : uint8_t {
+    red,
+    green = 5,
+};
+
+struct point final {
+    int32_t x;
+    int32_t y;
+};
+
+struct shape {
+    sstring name;
+    test::color color;
+    std::vector<test::point> points;
+    std::optional<int64_t> area;
+    std::variant<int32_t, sstring> tag;
+    gms::inet_address owner;
+    int32_t sides [[version 1.1]] = 4;
+    sstring label [[version 1.2]];
+};
+
+template<typename T>
+struct wrapper {
+    T value;
+};
+
+struct holder {
+    test::wrapper<int32_t> wrapped;
+    boost::variant<test::point, sstring> either;
+    unknown_type unknown;
+};
+
+}
+'''
+
+
+@pytest.fixture(scope='module')
+def idl(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('idl')
+    source = directory / 'test.idl.hh'
+    source.write_text(IDL)
+    output = directory / 'test_idl.py'
+    subprocess.run([sys.executable, str(IDL_COMPILER), '--python', str(output), str(source)], check=True)
+    spec = importlib.util.spec_from_file_location('test_idl', output)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sized(data):
+    """A non-final class, prefixed with its size, which includes the size itself."""
+    return struct.pack('<I', len(data) + 4) + data
+
+
+def string(s):
+    data = s.encode()
+    return struct.pack('<I', len(data)) + data
+
+
+def point(x, y):
+    return struct.pack('<ii', x, y)
+
+
+def shape(name='square', color=5, points=((0, 0), (1, 1)), area=None, tag=b'\x00' + struct.pack('<i', 7),
+          owner=struct.pack('<I', int(ipaddress.IPv4Address('127.0.0.1'))), versioned=b''):
+    data = string(name) + bytes([color])
+    data += struct.pack('<I', len(points)) + b''.join(point(x, y) for x, y in points)
+    data += b'\x00' if area is None else b'\x01' + struct.pack('<q', area)
+    data += tag + owner + versioned
+    return sized(data)
+
+
+def boost_variant(index, data):
+    return struct.pack('<II', len(data) + 8, index) + data
+
+
+def holder(either, unknown=b''):
+    return sized(sized(struct.pack('<i', 1)) + either + unknown)
+
+
+def test_final_class(idl):
+    p = idl.decode('test::point', point(3, -4))
+    assert (p.x(), p.y()) == (3, -4)
+    assert idl.TYPES['test::point'].fixed_size == 8
+
+
+def test_size_prefixed_class(idl):
+    s = idl.decode('test::shape', shape())
+    assert s.name() == 'square'
+    assert s.color() == idl.test_color.green
+    assert [(p.x(), p.y()) for p in s.points()] == [(0, 0), (1, 1)]
+    assert s.area() is None
+    assert s.tag() == 7
+    assert s.owner() == ipaddress.IPv4Address('127.0.0.1')
+    assert idl.TYPES['test::shape'].fixed_size is None
+
+
+def test_missing_versioned_members(idl):
+    # Serialized by a version without sides and label
+    s = idl.decode('test::shape', shape())
+    assert s.sides() == 4
+    assert s.label() == ''
+
+    s = idl.decode('test::shape', shape(versioned=struct.pack('<i', 6)))
+    assert s.sides() == 6
+    assert s.label() == ''
+
+    s = idl.decode('test::shape', shape(versioned=struct.pack('<i', 6) + string('hexagon')))
+    assert (s.sides(), s.label()) == (6, 'hexagon')
+
+
+def test_unknown_trailing_members(idl):
+    # Serialized by a newer version, with a member appended, which is skipped by the size of the class
+    newer = shape(versioned=struct.pack('<i', 6) + string('hexagon') + b'\xff' * 5)
+    data = struct.pack('<I', 2) + newer + shape(name='triangle')
+    shapes, end = idl.Vector(idl.TYPES['test::shape']).read(memoryview(data), 0)
+    assert end == len(data)
+    assert [s.name() for s in shapes] == ['square', 'triangle']
+    assert shapes[0].label() == 'hexagon'
+
+
+def test_optional_vector_and_variants(idl):
+    s = idl.decode('test::shape', shape(points=(), area=42, tag=b'\x01' + string('big')))
+    assert len(s.points()) == 0
+    assert s.area() == 42
+    assert s.tag() == 'big'
+
+    s = idl.decode('test::shape', shape(points=[(i, -i) for i in range(100)]))
+    points = s.points()
+    assert len(points) == 100
+    assert (points[-1].x(), points[-1].y()) == (99, -99)
+    with pytest.raises(IndexError):
+        points[100]
+
+    h = idl.decode('test::holder', holder(boost_variant(0, point(1, 2))))
+    assert h.wrapped().value() == 1
+    assert (h.either().x(), h.either().y()) == (1, 2)
+    assert idl.decode('test::holder', holder(boost_variant(1, string('text')))).either() == 'text'
+    # An alternative added by a newer version
+    assert idl.decode('test::holder', holder(boost_variant(2, b'\x01\x02'))).either() == idl.UnknownVariant(2, b'\x01\x02')
+
+
+def test_hand_serialized_builtin(idl):
+    ipv6 = ipaddress.IPv6Address('2001:db8::1')
+    s = idl.decode('test::shape', shape(owner=struct.pack('<I', 0xffffffff) + ipv6.packed))
+    assert s.owner() == ipv6
+    assert s.sides() == 4
+
+
+def test_unsupported_type(idl):
+    h = idl.decode('test::holder', holder(boost_variant(0, point(1, 2)), unknown=b'\x00'))
+    assert h.wrapped().value() == 1
+    with pytest.raises(NotImplementedError):
+        h.unknown()
+
+
+def test_truncated(idl):
+    data = shape()
+    with pytest.raises(ValueError):
+        idl.decode('test::shape', data[:-1])
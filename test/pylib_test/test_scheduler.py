@@ -0,0 +1,65 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+from types import SimpleNamespace
+
+from test.pylib.db.reader import TestHistory
+from test.pylib.scheduler import TestScheduler
+
+
+class FakeTest:
+    def __init__(self, name, suite='suite', mode='dev'):
+        self.suite = SimpleNamespace(name=suite)
+        self.mode = mode
+        self.shortname = name
+
+
+def make_test(name):
+    return FakeTest(name)
+
+
+def make_scheduler(tests, history, jobs=4, cpu_budget=4, memory_budget=8e9, lpt=True):
+    history = {(t.suite.name, t.mode, t.shortname): h for t, h in history.items()}
+    return TestScheduler(tests, history, jobs=jobs, cpu_budget=cpu_budget, memory_budget=memory_budget,
+                         default_memory=2e9, lpt=lpt)
+
+
+def test_longest_first():
+    a, b, c = make_test('a'), make_test('b'), make_test('c')
+    scheduler = make_scheduler([a, b, c], {a: TestHistory(time_taken=1), b: TestHistory(time_taken=10)})
+    # c has no history, it gets the median of its suite
+    assert scheduler.estimate(c).duration == 5.5
+    assert scheduler.queue == [b, c, a]
+
+
+def test_fifo_without_history():
+    tests = [make_test(name) for name in 'abc']
+    scheduler = make_scheduler(tests, {})
+    assert not scheduler.lpt
+    assert [scheduler.next_test() for _ in tests] == tests
+
+
+def test_memory_budget():
+    big, small1, small2 = make_test('big'), make_test('small1'), make_test('small2')
+    scheduler = make_scheduler([big, small1, small2], {
+        big: TestHistory(time_taken=10, memory_peak=7e9),
+        small1: TestHistory(time_taken=5, memory_peak=1e9),
+        small2: TestHistory(time_taken=4, memory_peak=1e9),
+    })
+    assert scheduler.next_test() is big
+    assert scheduler.next_test() is small1
+    # small2 would exceed the memory budget
+    assert scheduler.next_test() is None
+    scheduler.finished(small1)
+    assert scheduler.next_test() is small2
+
+
+def test_jobs_limit():
+    tests = [make_test(name) for name in 'abc']
+    scheduler = make_scheduler(tests, {t: TestHistory(time_taken=1, memory_peak=1) for t in tests}, jobs=2)
+    assert scheduler.next_test() is not None
+    assert scheduler.next_test() is not None
+    assert scheduler.next_test() is None
@@ -0,0 +1,282 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+"""Tests of scripts/scylla_core against a synthetic core with a hand-built seastar heap."""
+
+import io
+import json
+import pathlib
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[2] / 'scripts'))
+
+from scylla_core import allocator, dwarf, elfcore, reports
+
+
+PAGE_SIZE = 4096
+CPU_MEM_OFFSET = 0x100
+
+# The layouts of the allocator's structures, like type_cache reads them from the DWARF
+TYPES = {
+    allocator.CPU_PAGES: {'size': 88, 'members': {
+        'memory': [0, 64, None],
+        'nr_pages': [64, 32, None],
+        'nr_free_pages': [96, 32, None],
+        'pages': [128, 64, None],
+        'small_pools._u.a': [192, 512, 2],
+    }},
+    allocator.PAGE: {'size': 24, 'members': {
+        'free': [0, 1, None],
+        'offset_in_span': [1, 31, None],
+        'span_size': [32, 32, None],
+        'pool': [64, 64, None],
+        'freelist': [128, 64, None],
+    }},
+    allocator.SMALL_POOL: {'size': 32, 'members': {
+        '_object_size': [0, 32, None],
+        '_free': [64, 64, None],
+        '_free_count': [128, 32, None],
+        '_span_sizes.preferred': [192, 8, None],
+    }},
+    allocator.FREE_OBJECT: {'size': 8, 'members': {}},
+}
+
+TEXT_RANGES = [(0x400000, 0x401800), (0x402000, 0x403000)]
+VPTR_A = 0x401000
+VPTR_B = 0x402000
+
+# Thread pointers of two reactor threads, a thread without memory and a thread whose TLS is not in the core
+TP_HIGH = 0x10000
+TP_LOW = 0x11000
+TP_NO_MEMORY = 0x12000
+TP_NOT_DUMPED = 0x5000000
+
+HIGH_MEM = 0x200000
+HIGH_PAGES = 0x30000
+LOW_MEM = 0x100000
+LOW_PAGES = 0x31000
+
+SPAN_START = HIGH_MEM + PAGE_SIZE
+
+
+def slot(i, object_size=64):
+    return SPAN_START + i * object_size
+
+
+def pool_address(tp, i):
+    return tp + CPU_MEM_OFFSET + 24 + i * 32
+
+
+def cpu_pages(memory, nr_pages, nr_free_pages, pages, pools):
+    buf = struct.pack('<QIIQ', memory, nr_pages, nr_free_pages, pages)
+    for object_size, free, free_count, preferred in pools:
+        buf += struct.pack('<IIQIIB7x', object_size, 0, free, free_count, 0, preferred)
+    return buf
+
+
+def page(free=0, offset_in_span=0, span_size=0, pool=0, freelist=0):
+    return struct.pack('<QQQ', free | offset_in_span << 1 | span_size << 32, pool, freelist)
+
+
+def note(note_type, desc):
+    return struct.pack('<III', 5, len(desc), note_type) + b'CORE\0\0\0\0' + desc + bytes(-len(desc) % 4)
+
+
+def prstatus(tid, fs_base):
+    desc = bytearray(336)
+    struct.pack_into('<i', desc, elfcore._PRSTATUS_PID_OFFSET, tid)
+    struct.pack_into('<Q', desc, elfcore._PRSTATUS_REGS_OFFSET + elfcore._X86_64_FS_BASE * 8, fs_base)
+    return bytes(desc)
+
+
+def write_core(path, segments, threads, auxv):
+    """Writes an x86_64 ELF core with the segments [(vaddr, data, memsz)], the threads [(tid, fs_base)] and auxv."""
+    notes = b''.join(note(elfcore.NT_PRSTATUS, prstatus(tid, tp)) for tid, tp in threads)
+    notes += note(elfcore.NT_AUXV, b''.join(struct.pack('<QQ', k, v) for k, v in list(auxv.items()) + [(0, 0)]))
+    phnum = len(segments) + 1
+    offset = 64 + phnum * 56
+    phdrs = struct.pack('<IIQQQQQQ', elfcore.PT_NOTE, 0, offset, 0, 0, len(notes), 0, 4)
+    contents = notes
+    for vaddr, data, memsz in segments:
+        phdrs += struct.pack('<IIQQQQQQ', elfcore.PT_LOAD, 6, offset + len(contents), vaddr, 0, len(data), memsz, PAGE_SIZE)
+        contents += data
+    header = struct.pack('<16sHHIQQQIHHHHHH', b'\x7fELF\x02\x01\x01', 4, elfcore.EM_X86_64, 1, 0, 64, 0, 0, 64, 56, phnum, 0, 0, 0)
+    path.write_bytes(header + phdrs + contents)
+
+
+class synthetic_binary:
+    """Stands for the elf_binary of the synthetic core: a build id, for the type cache, and the TLS of cpu_mem."""
+    path = 'synthetic'
+    build_id = 'synthetic'
+
+    def symbol(self, *names):
+        assert names == allocator.CPU_MEM_SYMBOLS
+        return CPU_MEM_OFFSET, TYPES[allocator.CPU_PAGES]['size'], 'STT_TLS'
+
+    def tls_address(self, core, thread_pointer, offset):
+        return thread_pointer + offset
+
+
+@pytest.fixture(scope='module')
+def core(tmp_path_factory):
+    tls = bytearray(0x3000)
+    high_pools = [(64, slot(4), 1, 2), (4, 0, 0, 1)]
+    low_pools = [(64, 0, 0, 2), (4, 0, 0, 1)]
+    high_cpu_mem = CPU_MEM_OFFSET
+    low_cpu_mem = TP_LOW - TP_HIGH + CPU_MEM_OFFSET
+    tls[high_cpu_mem:high_cpu_mem + 88] = cpu_pages(HIGH_MEM, 8, 3, HIGH_PAGES, high_pools)
+    tls[low_cpu_mem:low_cpu_mem + 88] = cpu_pages(LOW_MEM, 2, 1, LOW_PAGES, low_pools)
+
+    # Page 0 is never a span. Pages 1-3 are a small span of the 64 byte pool,
+    # of which only the first two pages are used, page 4 is a large
+    # allocation and pages 5-7 are free.
+    pool = pool_address(TP_HIGH, 0)
+    high_pages = (page() +
+                  page(span_size=3, pool=pool, freelist=slot(3)) +
+                  page(offset_in_span=1, pool=pool) +
+                  page(offset_in_span=2) +
+                  page(span_size=1) +
+                  page(free=1, span_size=3) +
+                  page() + page())
+    low_pages = page() + page(free=1, span_size=1)
+    pages = high_pages + bytes(LOW_PAGES - HIGH_PAGES - len(high_pages)) + low_pages
+
+    span = bytearray(3 * PAGE_SIZE)
+    for i, word in {0: VPTR_A, 1: VPTR_A, 2: VPTR_B, 5: 0x999, 6: 0x403000, 7: 0x401900}.items():
+        struct.pack_into('<Q', span, i * 64, word)
+    # Slot 3 is on the free-list of the span, slot 4 on the free-list of the pool
+    heap_memory = bytes(PAGE_SIZE) + bytes(span) + bytes(PAGE_SIZE)
+
+    path = tmp_path_factory.mktemp('core') / 'core'
+    write_core(path,
+               segments=[(TP_HIGH, bytes(tls[:0x1000]), 0x1000),
+                         (TP_LOW, bytes(tls[0x1000:]), 0x2000),
+                         (HIGH_PAGES, pages, 0x2000),
+                         (LOW_MEM, bytes(2 * PAGE_SIZE), 2 * PAGE_SIZE),
+                         # The free pages are not dumped
+                         (HIGH_MEM, heap_memory, 8 * PAGE_SIZE)],
+               threads=[(100, TP_HIGH), (101, TP_LOW), (102, TP_NO_MEMORY), (103, TP_NOT_DUMPED), (104, 0)],
+               auxv={elfcore.AT_ENTRY: 0x401234})
+    return elfcore.core_file(str(path))
+
+
+@pytest.fixture(scope='module')
+def types(tmp_path_factory):
+    cache_directory = tmp_path_factory.mktemp('cache')
+    path = cache_directory / synthetic_binary.build_id / 'types.json'
+    path.parent.mkdir()
+    path.write_text(json.dumps({'version': 1, 'types': TYPES, 'constants': {allocator.PAGE_SIZE: PAGE_SIZE}}))
+    return allocator.load_types(synthetic_binary(), str(cache_directory))
+
+
+@pytest.fixture(scope='module')
+def layouts(core, types):
+    return allocator.find_heaps(core, synthetic_binary(), types)
+
+
+def test_core_file_notes(core):
+    assert core.machine == elfcore.EM_X86_64
+    assert core.threads == [(100, TP_HIGH), (101, TP_LOW), (102, TP_NO_MEMORY), (103, TP_NOT_DUMPED), (104, 0)]
+    assert core.thread_pointers() == [TP_HIGH, TP_LOW, TP_NO_MEMORY, TP_NOT_DUMPED]
+    assert core.auxv == {elfcore.AT_ENTRY: 0x401234, 0: 0}
+
+
+def test_core_file_read(core):
+    assert core.word(slot(0)) == VPTR_A
+    # Across two segments
+    assert core.read(TP_LOW - 4, 8) == bytes(8)
+    # Past the dumped part of a segment
+    assert core.read(HIGH_MEM + 5 * PAGE_SIZE, 16) == bytes(16)
+    assert not core.array(HIGH_MEM + 5 * PAGE_SIZE, np.uint64, 4).any()
+    assert core.array(slot(0), '<u8', 3).tolist() == [VPTR_A, 0, 0]
+    with pytest.raises(ValueError):
+        core.read(TP_NOT_DUMPED, 8)
+    with pytest.raises(ValueError):
+        core.read(HIGH_MEM + 8 * PAGE_SIZE - 4, 8)
+
+
+def test_core_file_not_a_core(tmp_path):
+    path = tmp_path / 'not-a-core'
+    path.write_bytes(b'\x7fELF\x02\x01\x01' + bytes(57))
+    with pytest.raises(ValueError):
+        elfcore.core_file(str(path))
+
+
+def test_heap_layout(layouts):
+    # The heaps are in the order of their addresses, threads without memory are skipped
+    assert [layout.mem_start for layout in layouts] == [LOW_MEM, HIGH_MEM]
+    layout = layouts[1]
+    assert layout.cpu_mem == TP_HIGH + CPU_MEM_OFFSET
+    assert (layout.nr_pages, layout.nr_free_pages, layout.pages) == (8, 3, HIGH_PAGES)
+    assert layout.page_size == PAGE_SIZE
+    assert layout.mem_end == HIGH_MEM + 8 * PAGE_SIZE
+    assert layout.pools == {pool_address(TP_HIGH, 0): 64, pool_address(TP_HIGH, 1): 4}
+    assert layout.pool_free_heads == {pool_address(TP_HIGH, 0): slot(4), pool_address(TP_HIGH, 1): 0}
+    assert layout.pool_span_sizes == {pool_address(TP_HIGH, 0): 2, pool_address(TP_HIGH, 1): 1}
+
+
+def test_spans(core, layouts):
+    h = allocator.heap(core, layouts[1])
+    spans = [(s.index, s.size, s.is_small(), s.is_large(), s.is_free()) for s in h.spans()]
+    assert spans == [(1, 3, True, False, False), (4, 1, False, True, False), (5, 3, False, False, True)]
+    # Only the pages pointing back to the pool are used
+    small = h.span_of(slot(100))
+    assert (small.start, small.used_pages, small.object_size, small.nr_objects) == (SPAN_START, 2, 64, 2 * PAGE_SIZE // 64)
+    assert h.span_of(HIGH_MEM) is None
+    assert h.span_of(LOW_MEM) is None
+
+
+def test_pointer_metadata(core, layouts):
+    h = allocator.heap(core, layouts[1])
+    m = h.pointer_metadata(slot(1) + 8)
+    assert (m.is_small, m.offset_in_object, m.size, m.is_live) == (True, 8, 64, True)
+    assert not h.pointer_metadata(slot(3)).is_live
+    assert not h.pointer_metadata(slot(4) + 1).is_live
+    m = h.pointer_metadata(HIGH_MEM + 4 * PAGE_SIZE + 100)
+    assert (m.is_small, m.offset_in_object, m.size, m.is_live) == (False, 100, PAGE_SIZE, True)
+    assert not h.pointer_metadata(HIGH_MEM + 6 * PAGE_SIZE).is_live
+    assert h.pointer_metadata(LOW_MEM + PAGE_SIZE) is None
+
+
+def test_text_ranges():
+    is_vptr = allocator.text_ranges(TEXT_RANGES)
+    words = np.array([0, 0x3fffff, 0x400000, 0x4017ff, 0x401800, 0x401900, 0x402000, 0x402fff, 0x403000], dtype=np.uint64)
+    assert is_vptr.mask(words).tolist() == [False, False, True, True, False, False, True, True, False]
+
+
+def test_scan(core, layouts):
+    result = allocator.scan(core, layouts[1], TEXT_RANGES)
+    pool = pool_address(TP_HIGH, 0)
+    assert result['pools'] == {pool: {'object_size': 64, 'spans': 1, 'pages': 3, 'used_pages': 2,
+                                      'slots': 128, 'span_free': 1}}
+    assert result['pool_free'] == {pool: 1, pool_address(TP_HIGH, 1): 0}
+    assert result['large'] == {1: 1}
+    assert result['free_spans'] == {3: 1}
+    assert result['histogram'] == {VPTR_A: 2, VPTR_B: 1}
+
+    assert allocator.scan(core, layouts[1], TEXT_RANGES, object_size=32)['histogram'] == {}
+    assert allocator.scan(core, layouts[1], TEXT_RANGES, free_lists=False)['pool_free'] == {}
+
+
+def test_small_objects_report(core, layouts):
+    results = [(i, allocator.scan(core, layout, TEXT_RANGES)) for i, layout in enumerate(layouts)]
+    out = io.StringIO()
+    reports.small_objects(out, results, 64)
+    assert out.getvalue() == 'heap  0: 0 objects\nheap  1: 126 objects\nnumber of objects: 126\n'
+
+
+def test_type_cache_round_trip(tmp_path, types):
+    assert types[allocator.PAGE]['span_size'].bitpos == 32
+    assert types[allocator.CPU_PAGES]['small_pools._u.a'].count == 2
+    assert types.constant(allocator.PAGE_SIZE) == PAGE_SIZE
+    with pytest.raises(KeyError):
+        types['seastar::memory::no_such_type']
+    layout = dwarf.struct_layout.from_json(allocator.PAGE, TYPES[allocator.PAGE])
+    assert layout.to_json() == TYPES[allocator.PAGE]
@@ -60,6 +60,14 @@ def test_gms(gdb):
 def test_heapprof(gdb):
     scylla(gdb, 'heapprof')
 
+def test_heapprof_flame(gdb, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'heapprof --flame -o {tmpdir}/heapprof.stacks')
+
+def test_heapprof_pprof(gdb, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'heapprof --pprof -o {tmpdir}/heapprof.pb.gz')
+
 def test_io_queues(gdb):
     scylla(gdb, 'io-queues')
 
@@ -75,6 +83,14 @@ def test_mem_ranges(gdb):
 def test_memory(gdb):
     scylla(gdb, 'memory')
 
+def test_memory_all_shards(gdb):
+    scylla(gdb, 'memory --all-shards --format csv')
+
+def test_memory_baseline(gdb, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'memory --all-shards --format json -o {tmpdir}/memory.json')
+    scylla(gdb, f'memory --all-shards --baseline {tmpdir}/memory.json')
+
 def test_segment_descs(gdb):
     scylla(gdb, 'segment-descs')
 
@@ -84,6 +100,9 @@ def test_small_object_1(gdb):
 def test_small_object_2(gdb):
     scylla(gdb, 'small-object -o 64 --summarize')
 
+def test_small_object_jobs(gdb):
+    scylla(gdb, 'small-object -o 64 --summarize --jobs 2')
+
 def test_large_objects_1(gdb):
     scylla(gdb, 'large-objects -o 131072 --random-page')
 
@@ -93,6 +112,11 @@ def test_large_objects_2(gdb):
 def test_lsa(gdb):
     scylla(gdb, 'lsa')
 
+def test_lsa_sampler(gdb, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'lsa-sampler -o {tmpdir}/lsa-samples -i 0.1 -n 2')
+    scylla(gdb, f'lsa-sampler -o {tmpdir}/lsa-samples --dump shards')
+
 def test_netw(gdb):
     scylla(gdb, 'netw')
 
@@ -110,6 +134,9 @@ def test_task_histogram_coro(gdb):
     if re.search(r'\) \[clone \.\w+\]', h) is None:
         raise gdb.error('no coroutine entries in task histogram')
 
+def test_task_histogram_jobs(gdb):
+    scylla(gdb, 'task_histogram --jobs 2')
+
 def test_tasks(gdb):
     scylla(gdb, 'tasks')
 
@@ -146,10 +173,28 @@ def test_find(gdb, schema):
 def test_ptr(gdb, schema):
     scylla(gdb, f'ptr {schema}')
 
+def test_heap_index(gdb, schema, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'heap-index build --directory {tmpdir}/heap-index')
+    try:
+        scylla(gdb, 'task_histogram -a')
+        scylla(gdb, 'small-object -o 32 --random-page')
+        scylla(gdb, f'find -r {schema}')
+    finally:
+        scylla(gdb, 'heap-index drop')
+
 def test_generate_object_graph(gdb, schema, request):
     tmpdir = request.config.getoption('scylla_tmp_dir')
     scylla(gdb, f'generate-object-graph -o {tmpdir}/og.dot -d 2 -t 10 {schema}')
 
+def test_generate_object_graph_without_pointer_index(gdb, schema, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'generate-object-graph -o {tmpdir}/og.dot -d 2 -t 10 -m -1 {schema}')
+
+def test_generate_object_graph_stop_at(gdb, schema, request):
+    tmpdir = request.config.getoption('scylla_tmp_dir')
+    scylla(gdb, f'generate-object-graph -o {tmpdir}/og.dot -d 4 -t 10 -s schema {schema}')
+
 # Some commands need a task to work on. The following fixture finds one.
 # Because we stopped Scylla while it was idle, we don't expect to find
 # any ready task with get_local_tasks(), but we can find one with a
@@ -166,6 +211,9 @@ def task(gdb, scylla_gdb):
 def test_fiber(gdb, task):
     scylla(gdb, f'fiber {task}')
 
+def test_fiber_all_tasks(gdb):
+    scylla(gdb, 'fiber --all-tasks')
+
 # Similar to task(), but looks for a coroutine frame.
 @pytest.fixture(scope="module")
 def coro_task(gdb, scylla_gdb):
@@ -0,0 +1,220 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import asyncio
+import logging
+import threading
+import time
+import urllib.parse
+import prometheus
+import snapshot
+
+
+class Node(object):
+    """A single scylla node scraped by Cluster.
+
+    address is either a host, a host:port or the full URL of the
+    Prometheus end-point, optionally followed by @DC, e.g. 10.0.0.1@dc1.
+    """
+    _DEFAULT_PORT = 9180
+    _DEFAULT_PATH = '/metrics'
+
+    def __init__(self, address):
+        address, _, self._dc = address.partition('@')
+        if '://' not in address:
+            address = 'http://' + address
+        url = urllib.parse.urlsplit(address)
+        if url.scheme != 'http':
+            raise ValueError('unsupported end-point {}, only http is supported'.format(address))
+        self._host = url.hostname
+        self._port = url.port or self._DEFAULT_PORT
+        self._path = url.path or self._DEFAULT_PATH
+        if url.query:
+            self._path += '?' + url.query
+        self._name = url.netloc if url.port else url.hostname
+        self._dc = self._dc or None
+        self._latest = None
+        self._connection = _Connection(self._host, self._port)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def dc(self):
+        return self._dc
+
+    @property
+    def latest(self):
+        return self._latest
+
+    async def scrape(self):
+        body = await self._connection.get(self._path)
+        result = prometheus.Prometheus.parse(body.decode('utf-8').splitlines())
+        self._latest = result
+        return result
+
+    def close(self):
+        self._connection.close()
+
+    def __repr__(self):
+        return 'Node({}, dc={})'.format(self._name, self._dc)
+
+
+class _Connection(object):
+    """A minimal HTTP/1.1 client keeping its connection alive between scrapes.
+
+    Scraping dozens of nodes every second spends most of its time in TCP
+    handshakes when every request opens a new connection, so the connection
+    is kept open and only re-established when the node closes it.
+    """
+    def __init__(self, host, port):
+        self._host = host
+        self._port = port
+        self._reader = None
+        self._writer = None
+
+    async def get(self, path):
+        request = 'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: keep-alive\r\n\r\n'.format(
+            path=path, host=self._host, port=self._port).encode('ascii')
+        for attempt in range(2):
+            reused = self._writer is not None
+            if not reused:
+                self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+            try:
+                self._writer.write(request)
+                await self._writer.drain()
+                return await self._response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                # A kept alive connection may have been closed by the node
+                # since the previous scrape, retry once on a new one.
+                if not reused:
+                    raise
+
+    async def _response(self):
+        statusLine = await self._reader.readline()
+        if not statusLine:
+            raise ConnectionResetError('connection closed by {}:{}'.format(self._host, self._port))
+        _, status, reason = statusLine.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._chunked()
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self._reader.read()
+            self.close()
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        if status != '200':
+            raise IOError('{}:{} responded with {} {}'.format(self._host, self._port, status, reason))
+        return body
+
+    async def _chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                break
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readexactly(2)
+        # Skip the trailers
+        while (await self._reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        return b''.join(chunks)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+
+class Cluster(object):
+    """Metric source scraping the Prometheus end-points of several nodes.
+
+    All nodes are scraped concurrently, on a fixed cadence, by an asyncio
+    event loop running in a background thread. Only the latest snapshot of
+    each node is kept, the history of the samples is kept by the metrics.
+    snapshot() merges the latest snapshot of every node into a single one,
+    where each symbol gets a node label (and a dc label, if the node's DC
+    is known), so the views can roll the series up per node, per DC or
+    for the whole cluster.
+    """
+    def __init__(self, addresses, interval, timeout=None):
+        if not addresses:
+            raise ValueError('no nodes to scrape')
+        self._nodes = [Node(address) for address in addresses]
+        self._interval = interval
+        self._timeout = timeout if timeout is not None else max(interval, 1)
+        self._scraped = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def nodes(self):
+        return self._nodes
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._scrapeForever())
+        finally:
+            for node in self._nodes:
+                node.close()
+            self._loop.close()
+
+    async def _scrapeForever(self):
+        deadline = time.monotonic()
+        while True:
+            await asyncio.gather(*[self._scrape(node) for node in self._nodes])
+            self._scraped.set()
+            # Keep a fixed cadence, no matter how long the scrape took
+            deadline = max(deadline + self._interval, time.monotonic())
+            await asyncio.sleep(deadline - time.monotonic())
+
+    async def _scrape(self, node):
+        try:
+            result = await asyncio.wait_for(node.scrape(), self._timeout)
+        except Exception as inst:
+            logging.error('failed scraping {}: {}'.format(node, inst))
+            node.close()
+            return
+        logging.debug('scraped {} metrics from {}'.format(len(result), node))
+
+    def snapshot(self, accept=None):
+        # Wait for the first round of scrapes, there is nothing to show before it
+        self._scraped.wait()
+        result = snapshot.Snapshot()
+        for node in self._nodes:
+            latest = node.latest
+            if latest is None or time.time() - latest.timestamp > self._interval + self._timeout:
+                # The node is not responding, its metrics are absent
+                continue
+            extra = 'node="{}"'.format(node.name)
+            if node.dc is not None:
+                extra = 'dc="{}",{}'.format(node.dc, extra)
+            for symbol in latest.symbols():
+                name, _, labels = symbol.partition('{')
+                labeled = '{}{{{}{}'.format(name, extra, ',' + labels if labels else '}')
+                if accept is not None and not accept(labeled):
+                    continue
+                for key, value in latest.status(symbol).items():
+                    result.add(labeled, labeled if key == symbol else key, value)
+            result.copyMetadata(latest)
+        return result
+
+    def __repr__(self):
+        return 'Cluster({})'.format(', '.join(node.name for node in self._nodes))
@@ -4,6 +4,7 @@ import atexit
 import os
 import parseexception
 import logging
+import snapshot
 
 COLLECTD_EXAMPLE_CONFIGURATION = '\n'.join(['LoadPlugin unixsock',
                                             '',
@@ -41,6 +42,37 @@ class Collectd(object):
     def query_list(self):
         return self.internal_query('LISTVAL')
 
+    def query_vals(self, vals):
+        """GETVAL all of vals, sending all the commands before reading any of the responses."""
+        for val in vals:
+            self._send('GETVAL "{metric}"'.format(metric=val))
+        return [self._readLines() for _ in vals]
+
+    def snapshot(self, accept=None):
+        """List and query all metrics and collect their values into a snapshot.Snapshot.
+
+        accept: optional callable, only the symbols it returns True for are
+        queried and kept in the snapshot.
+        """
+        result = snapshot.Snapshot()
+        symbols = []
+        for line in self.query_list():
+            match = self._METRIC_DISCOVER_PATTERN.search(line)
+            if match is None:
+                continue
+            symbol = match.groupdict()['metric']
+            if accept is None or accept(symbol):
+                symbols.append(symbol)
+        for symbol, response in zip(symbols, self.query_vals(symbols)):
+            if response is None:
+                continue
+            for line in response:
+                match = self._METRIC_INFO_PATTERN.search(line)
+                if match is None:
+                    raise parseexception.ParseException('could not parse metric pattern from line: {0}'.format(line))
+                result.add(symbol, match.groupdict()['key'], match.groupdict()['value'])
+        return result
+
     def internal_query(self, command):
         self._send(command)
         return self._readLines()
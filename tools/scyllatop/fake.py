@@ -1,50 +1,41 @@
-import metric
 import os
 import random
 import collectd
+import prometheus
+import snapshot
 import logging
 
 
-class FakeCollectd(object):
-    def __init__(self, socketName):
-        pass
-
-    def query(self, command):
-        pass
-
-
-Metric = metric.Metric
 if 'MARK_ABSENT_PROBABILITY' in os.environ:
     MARK_ABSENT_PROBABILITY = float(os.environ['MARK_ABSENT_PROBABILITY'])
 else:
     MARK_ABSENT_PROBABILITY = 0
 
 
-class FakeMetric(Metric):
-    def update(self):
-        self._status['value'] = random.randint(0, 100000)
-        if random.random() > 1 - MARK_ABSENT_PROBABILITY:
-            self.markAbsent()
-        logging.info('{} {}'.format(self.symbol, self.status))
-
-    @classmethod
-    def discover(self, unused):
-        results = {}
-
-        def _add_metric(metric, results):
-            m = FakeMetric(metric, None)
-            m.add_to_results(results)
-
+class FakeSource(object):
+    def __init__(self, address):
+        self._symbols = []
         for cpu in range(4):
-            _add_metric('localhost/cpu-{}/cache'.format(cpu))
-            _add_metric('localhost/cpu-{}/storage_proxy'.format(cpu))
-            _add_metric('localhost/cpu-{}/transport'.format(cpu))
+            self._symbols.append('localhost/cpu-{}/cache'.format(cpu))
+            self._symbols.append('localhost/cpu-{}/storage_proxy'.format(cpu))
+            self._symbols.append('localhost/cpu-{}/transport'.format(cpu))
 
         for x in range(100):
-            _add_metric('localhost/fake_{}/{}'.format(x, random.choice('abcdefghijklmnopqrstuvwxyz')))
-        return results
+            self._symbols.append('localhost/fake_{}/{}'.format(x, random.choice('abcdefghijklmnopqrstuvwxyz')))
+
+    def snapshot(self, accept=None):
+        result = snapshot.Snapshot()
+        for symbol in self._symbols:
+            if accept is not None and not accept(symbol):
+                continue
+            # Absent metrics are simply missing from the snapshot
+            if random.random() > 1 - MARK_ABSENT_PROBABILITY:
+                continue
+            result.add(symbol, 'value', random.randint(0, 100000))
+        logging.info('fake snapshot: {} metrics'.format(len(result)))
+        return result
 
 
 def fake():
-    metric.Metric = FakeMetric
-    collectd.Collectd = FakeCollectd
+    collectd.Collectd = FakeSource
+    prometheus.Prometheus = FakeSource
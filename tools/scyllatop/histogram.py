@@ -0,0 +1,149 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import math
+import history
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def quantile(q, buckets):
+    """The q quantile of cumulative (le, count) buckets, sorted by le.
+
+    Interpolates linearly within the bucket the quantile falls in, like
+    Prometheus' histogram_quantile(). Returns None for an empty histogram.
+    """
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lowerBound, lowerCount = 0.0, 0.0
+    for le, count in buckets:
+        if count >= rank:
+            if math.isinf(le):
+                return lowerBound
+            if count == lowerCount:
+                return le
+            return lowerBound + (le - lowerBound) * (rank - lowerCount) / (count - lowerCount)
+        lowerBound, lowerCount = le, count
+    return lowerBound
+
+
+def quantiles(buckets):
+    return {q: quantile(q, buckets) for q in QUANTILES}
+
+
+def merge(histograms):
+    """The quantiles of the sum of the last intervals of histograms.
+
+    Histograms whose buckets differ from the first one's cannot be merged
+    and are left out.
+    """
+    merged = None
+    for histogram in histograms:
+        buckets = histogram.buckets
+        if buckets is None:
+            continue
+        if merged is None:
+            merged = list(buckets)
+        elif len(merged) == len(buckets) and all(le == other for (le, _), (other, _) in zip(merged, buckets)):
+            merged = [(le, count + other) for (le, count), (_, other) in zip(merged, buckets)]
+    return quantiles(merged or [])
+
+
+def collect(snapshot):
+    """Group the _bucket series of snapshot into {histogram symbol: [(le, count)]}.
+
+    The histogram symbol is the name without _bucket, with all the labels of
+    the bucket series but le.
+    """
+    result = {}
+    for name in snapshot.names():
+        if not name.endswith('_bucket'):
+            continue
+        for symbol in snapshot.byName(name):
+            labels = dict(snapshot.labels(symbol))
+            le = labels.pop('le', None)
+            status = snapshot.status(symbol)
+            if le is None or len(status) != 1:
+                continue
+            try:
+                bucket = (float(le), float(next(iter(status.values()))))
+            except ValueError:
+                continue
+            formatted = ','.join('{}="{}"'.format(key, value) for key, value in labels.items())
+            histogramSymbol = name[:-len('_bucket')] + ('{' + formatted + '}' if formatted else '')
+            result.setdefault(histogramSymbol, []).append(bucket)
+    return result
+
+
+class Histogram(object):
+    """A Prometheus histogram, with the percentiles of its last interval.
+
+    The buckets are cumulative counters, so the percentiles are those of the
+    observations made between the last two samples, not over the lifetime
+    of the server. The history keeps the last 99th percentiles.
+    """
+    def __init__(self, symbol):
+        self._symbol = symbol
+        self._previous = None
+        self._buckets = None
+        self._quantiles = quantiles([])
+        self._history = history.History()
+        self._absent = False
+        self._expiration = None
+
+    @property
+    def symbol(self):
+        return self._symbol
+
+    @property
+    def buckets(self):
+        """The (le, count) buckets of the observations of the last interval."""
+        return self._buckets
+
+    @property
+    def quantiles(self):
+        return self._quantiles
+
+    @property
+    def history(self):
+        return self._history
+
+    @property
+    def is_absent(self):
+        return self._absent
+
+    @property
+    def expiration(self):
+        return self._expiration
+
+    def update(self, buckets):
+        buckets = sorted(buckets)
+        self._absent = False
+        self._expiration = None
+        previous = self._previous
+        self._previous = buckets
+        if previous is None or [le for le, _ in previous] != [le for le, _ in buckets]:
+            self._buckets = None
+        elif buckets[-1][1] < previous[-1][1]:
+            # The counters were reset (e.g. the node restarted)
+            self._buckets = buckets
+        else:
+            self._buckets = [(le, count - old) for (le, count), (_, old) in zip(buckets, previous)]
+        self._quantiles = quantiles(self._buckets or [])
+        self._history.append(self._quantiles[QUANTILES[-1]])
+
+    def markAbsent(self, expiration=None):
+        self._absent = True
+        self._expiration = expiration
+        self._previous = None
+        self._buckets = None
+        self._quantiles = quantiles([])
+        self._history.append(None)
+
+    def __repr__(self):
+        return '{0}:{1}'.format(self._symbol, self._quantiles)
@@ -0,0 +1,37 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import array
+import math
+
+
+class History(object):
+    """The last size values of a series, in a fixed size ring of doubles.
+
+    Missing values (e.g. the rate of a counter before its second sample)
+    are kept as NaN, so the ring always covers the last size intervals.
+    """
+    DEFAULT_SIZE = 20
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self._values = array.array('d', [math.nan]) * size
+        self._next = 0
+
+    def append(self, value):
+        self._values[self._next] = math.nan if value is None else value
+        self._next = (self._next + 1) % len(self._values)
+
+    def values(self):
+        """The values, oldest first."""
+        return self._values[self._next:] + self._values[:self._next]
+
+    @property
+    def last(self):
+        value = self._values[self._next - 1]
+        return None if math.isnan(value) else value
+
+    def __len__(self):
+        return len(self._values)
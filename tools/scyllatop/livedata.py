@@ -3,7 +3,9 @@ import parseexception
 import fnmatch
 import time
 import metric
+import histogram
 import defaults
+import recording
 
 
 class LiveData(object):
@@ -13,6 +15,7 @@ class LiveData(object):
             logging.info('absent data will be kept for {} seconds'.format(ttl))
         self._startedAt = time.time()
         self._results = {}
+        self._histograms = {}
         self._interval = interval
         self._ttl = ttl
         self._metric_source = metric_source
@@ -20,7 +23,8 @@ class LiveData(object):
             self._metricPatterns = metricPatterns
         else:
             self._metricPatterns = defaults.DEFAULT_METRIC_PATTERNS
-        self._results = self._discoverMetrics()
+        self._matchCache = {}
+        self._apply(self._metric_source.snapshot(self._accepts))
         self._views = []
         self._stop = False
 
@@ -36,14 +40,18 @@ class LiveData(object):
     def measurements(self):
         return self._results.values()
 
-    def _discoverMetrics(self):
-        results = metric.Metric.discover(self._metric_source)
-        logging.debug('_discoverMetrics: {} results discovered'.format(len(results)))
-        for symbol in list(results):
-            if not self._matches(symbol, self._metricPatterns):
-                results.pop(symbol)
-        logging.debug('_initializeMetrics: {} results matched'.format(len(results)))
-        return results
+    @property
+    def histograms(self):
+        """The histogram.Histogram of every histogram with _bucket series in the measurements."""
+        return self._histograms.values()
+
+    def _accepts(self, symbol):
+        # Scraped symbols are mostly the same from one interval to the next,
+        # only match each of them against the patterns once.
+        accepted = self._matchCache.get(symbol)
+        if accepted is None:
+            accepted = self._matchCache[symbol] = self._matches(symbol, self._metricPatterns)
+        return accepted
 
     def _matches(self, symbol, metricPatterns):
         for pattern in metricPatterns:
@@ -52,30 +60,58 @@ class LiveData(object):
                 return True
         return False
 
-    def go(self, mainLoop):
+    def _apply(self, snapshot):
         num_updated = 0
         num_absent = 0
         num_expired = 0
         num_added = 0
         now = time.time()
+        expiration = now + self._ttl if self._ttl else None
+        for symbol, metric_obj in list(self._results.items()):
+            if symbol in snapshot:
+                metric_obj.update(snapshot)
+                num_updated += 1
+            elif not metric_obj.is_absent:
+                metric_obj.markAbsent(expiration)
+                num_absent += 1
+            elif metric_obj.expiration and now >= metric_obj.expiration:
+                self._results.pop(symbol)
+                num_expired += 1
+            else:
+                num_absent += 1
+        for symbol in snapshot.symbols():
+            if symbol not in self._results:
+                metric_obj = metric.Metric(symbol, self._metric_source, snapshot.help(symbol))
+                metric_obj.update(snapshot)
+                metric_obj.add_to_results(self._results)
+                num_added += 1
+        logging.debug('go: updated {} measurements, added {}, {} marked absent, {} expired'.format(num_updated, num_added, num_absent, num_expired))
+        self._updateHistograms(snapshot)
+
+    def _updateHistograms(self, snapshot):
+        # Histograms expire like the bucket series they are made of
+        now = time.time()
+        buckets = histogram.collect(snapshot)
+        for symbol, histogram_obj in list(self._histograms.items()):
+            if symbol in buckets:
+                continue
+            if not histogram_obj.is_absent:
+                histogram_obj.markAbsent(now + self._ttl if self._ttl else None)
+            elif histogram_obj.expiration and now >= histogram_obj.expiration:
+                self._histograms.pop(symbol)
+        for symbol, series in buckets.items():
+            histogram_obj = self._histograms.get(symbol)
+            if histogram_obj is None:
+                histogram_obj = self._histograms[symbol] = histogram.Histogram(symbol)
+            histogram_obj.update(series)
+
+    def go(self, mainLoop):
         while not self._stop:
-            new_results = self._discoverMetrics();
-            expiration = time.time() + self._ttl if self._ttl else None
-            for metric in self._results:
-                if not metric in new_results:
-                    metric_obj = self._results[metric]
-                    if not metric_obj.is_absent:
-                        metric_obj.markAbsent(expiration)
-                        num_absent += 1
-                    elif metric_obj.expiration and now >= metric_obj.expiration:
-                        self._results.pop(metric)
-                        num_expired += 1
-                    else:
-                        num_absent += 1
-            num_updated = len(self._results) - num_absent
-            num_added = len(new_results) - num_updated
-            self._results.update(new_results)
-            logging.debug('go: updated {} measurements, added {}, {} marked absent, {} expired'.format(num_updated, num_added, num_absent, num_expired))
+            try:
+                self._apply(self._metric_source.snapshot(self._accepts))
+            except recording.EndOfRecording:
+                logging.info('go: end of recording')
+                return
 
             for view in self._views:
                 logging.debug('go: updating view {}'.format(view))
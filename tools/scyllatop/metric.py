@@ -1,4 +1,5 @@
 import logging
+import history
 import parseexception
 
 
@@ -10,6 +11,10 @@ class Metric(object):
         self._help_line = hlp
         self._expiration = None
         self._absent = False
+        self._kind = None
+        self._previous = None
+        self._rate = None
+        self._history = history.History()
 
     @property
     def symbol(self):
@@ -23,6 +28,31 @@ class Metric(object):
     def status(self):
         return self._status
 
+    @property
+    def kind(self):
+        """The Prometheus type of the metric, e.g. counter or gauge, None if unknown."""
+        return self._kind
+
+    @property
+    def value(self):
+        """The value of a single valued metric as a float, None if not available."""
+        if len(self._status) != 1:
+            return None
+        try:
+            return float(next(iter(self._status.values())))
+        except ValueError:
+            return None
+
+    @property
+    def rate(self):
+        """The per second rate of a counter over the last interval, None if not available."""
+        return self._rate
+
+    @property
+    def history(self):
+        """The last rates of a counter, or the last values of any other metric."""
+        return self._history
+
     @property
     def is_absent(self):
         return self._absent
@@ -39,7 +69,10 @@ class Metric(object):
         value = match.groupdict()['value']
         self._status[key] = value
 
-    def update(self):
+    def update(self, snapshot=None):
+        if snapshot is not None:
+            self.updateFromSnapshot(snapshot)
+            return
         response = self._metric_source.query_val(self._symbol)
         if response is None:
             self.markAbsent()
@@ -48,11 +81,38 @@ class Metric(object):
             self.update_info(line)
             logging.debug('update {}: {}'.format(self.symbol, line.strip()))
 
+    def updateFromSnapshot(self, snapshot):
+        status = snapshot.status(self._symbol)
+        if status is None:
+            self.markAbsent()
+            return
+        self._status = dict(status)
+        self._absent = False
+        self._expiration = None
+        self._kind = snapshot.type(self._symbol)
+        self._record(snapshot.timestamp)
+
+    def _record(self, timestamp):
+        value = self.value
+        if self._kind != 'counter':
+            self._history.append(value)
+            return
+        previous = self._previous
+        self._previous = None if value is None else (timestamp, value)
+        if previous is None or value is None or value < previous[1] or timestamp <= previous[0]:
+            # No previous or current sample, or the counter was reset
+            self._rate = None
+        else:
+            self._rate = (value - previous[1]) / (timestamp - previous[0])
+        self._history.append(self._rate)
+
     def markAbsent(self, expiration=None):
         for key in list(self._status.keys()):
             self._status[key] = 'not available'
         self._absent = True
         self._expiration = expiration
+        self._rate = None
+        self._history.append(None)
 
     def add_to_results(self, results):
         if not isinstance(results, dict):
@@ -80,9 +140,19 @@ class Metric(object):
         logging.info('found {} metrics'.format(len(results)))
         return results
 
+    @classmethod
+    def fromSnapshot(cls, metric_source, snapshot):
+        results = {}
+        for symbol in snapshot.symbols():
+            m = cls(symbol, metric_source, snapshot.help(symbol))
+            m.updateFromSnapshot(snapshot)
+            m.add_to_results(results)
+        logging.info('found {} metrics'.format(len(results)))
+        return results
+
     @classmethod
     def discover(cls, metric_source):
-        return cls._discover(metric_source)
+        return cls.fromSnapshot(metric_source, metric_source.snapshot())
 
     @classmethod
     def discover_with_help(cls, metric_source):
@@ -1,5 +1,6 @@
 import urllib.request, urllib.error, urllib.parse
 import re
+import snapshot
 
 
 class Prometheus(object):
@@ -22,3 +23,30 @@ class Prometheus(object):
 
     def query_list(self):
         return self.get_metrics()
+
+    def snapshot(self, accept=None):
+        """Scrape the metrics page once and parse it into a snapshot.Snapshot.
+
+        accept: optional callable, only the symbols it returns True for are
+        kept in the snapshot.
+        """
+        return self.parse(self.get_metrics(), accept)
+
+    @classmethod
+    def parse(cls, lines, accept=None):
+        """Parse the lines of a metrics page into a snapshot.Snapshot, see snapshot()."""
+        result = snapshot.Snapshot()
+        for line in lines:
+            if line.startswith('#'):
+                if line.startswith('# HELP '):
+                    name, _, hlp = line[len('# HELP '):].partition(' ')
+                    result.setHelp(name, ' ' + hlp)
+                elif line.startswith('# TYPE '):
+                    name, _, kind = line[len('# TYPE '):].partition(' ')
+                    result.setType(name, kind.strip())
+                continue
+            symbol, _, value = line.rstrip().rpartition(' ')
+            if not symbol or (accept is not None and not accept(symbol)):
+                continue
+            result.add(symbol, symbol, value)
+        return result
@@ -0,0 +1,134 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import atexit
+import gzip
+import json
+import logging
+import time
+import zlib
+import snapshot
+
+# A recording is a gzip compressed file of JSON lines, a header line followed
+# by a line per snapshot. The help and type lines of the metrics rarely
+# change, so they are only recorded when they do.
+_MAGIC = 'scyllatop-recording'
+_VERSION = 1
+
+
+class EndOfRecording(Exception):
+    pass
+
+
+class Recorder(object):
+    """Metric source recording every snapshot of another metric source into a file.
+
+    Snapshots are recorded unfiltered, so the recording can be replayed
+    later with other metric patterns than the ones used while recording.
+    The file is flushed after every snapshot, so a recording cut short by
+    a crash or a kill can still be replayed up to its last snapshot.
+    """
+    def __init__(self, metric_source, path):
+        self._metric_source = metric_source
+        self._path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'magic': _MAGIC, 'version': _VERSION, 'source': repr(metric_source)})
+        self._help = None
+        self._types = None
+        atexit.register(self.close)
+
+    def snapshot(self, accept=None):
+        result = self._metric_source.snapshot()
+        self.record(result)
+        if accept is None:
+            return result
+        return result.filtered(accept)
+
+    def record(self, recorded):
+        data = recorded.dump()
+        if data['help'] == self._help:
+            del data['help']
+        else:
+            self._help = dict(data['help'])
+        if data['types'] == self._types:
+            del data['types']
+        else:
+            self._types = dict(data['types'])
+        self._write(data)
+
+    def _write(self, data):
+        self._file.write(json.dumps(data, separators=(',', ':')))
+        self._file.write('\n')
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            logging.info('closing recording {}'.format(self._path))
+            self._file.close()
+
+    def __repr__(self):
+        return 'Recorder({}, {})'.format(self._metric_source, self._path)
+
+
+class Replay(object):
+    """Metric source replaying the snapshots of a recording.
+
+    The snapshots are replayed at speed times the pace they were recorded
+    at, or as fast as they can be consumed if speed is 0. snapshot() raises
+    EndOfRecording after the last snapshot of the recording.
+    """
+    def __init__(self, path, speed=1.0):
+        self._path = path
+        self._speed = speed
+        self._file = gzip.open(path, 'rt', encoding='utf-8')
+        header = self._read()
+        if header is None or header.get('magic') != _MAGIC:
+            raise ValueError('{} is not a scyllatop recording'.format(path))
+        if header['version'] > _VERSION:
+            raise ValueError('{} was recorded by a newer version of scyllatop (version {})'.format(path, header['version']))
+        logging.info('replaying {} recorded from {}'.format(path, header['source']))
+        self._help = {}
+        self._types = {}
+        self._firstTimestamp = None
+        self._startedAt = None
+
+    def _read(self):
+        try:
+            line = self._file.readline()
+        except (EOFError, zlib.error):
+            # The recording was cut short
+            logging.warning('{} is truncated'.format(self._path))
+            return None
+        if not line.endswith('\n'):
+            return None
+        return json.loads(line)
+
+    def snapshot(self, accept=None):
+        data = self._read()
+        if data is None:
+            raise EndOfRecording(self._path)
+        self._help = data.setdefault('help', self._help)
+        self._types = data.setdefault('types', self._types)
+        result = snapshot.Snapshot.load(data)
+        self._wait(result.timestamp)
+        if accept is None:
+            return result
+        return result.filtered(accept)
+
+    def _wait(self, timestamp):
+        now = time.monotonic()
+        if self._firstTimestamp is None:
+            self._firstTimestamp = timestamp
+            self._startedAt = now
+            return
+        if self._speed <= 0:
+            return
+        due = self._startedAt + (timestamp - self._firstTimestamp) / self._speed
+        if due > now:
+            time.sleep(due - now)
+
+    def __repr__(self):
+        return 'Replay({}, speed={})'.format(self._path, self._speed)
@@ -8,6 +8,8 @@ import pprint
 import logging
 import collectd
 import prometheus
+import cluster
+import recording
 import metric
 import fake
 import livedata
@@ -28,11 +30,14 @@ def shell():
 
 def fancyUserInterface(metricPatterns, interval, metric_source, ttl):
     aggregateView = views.aggregate.Aggregate()
+    nodeView = views.aggregate.Aggregate('node')
+    dcView = views.aggregate.Aggregate('dc')
+    clusterView = views.aggregate.Aggregate('cluster')
     simpleView = views.simple.Simple()
     userInput = userinput.UserInput()
     loop = urwid.MainLoop(aggregateView.widget(), unhandled_input=userInput)
     userInput.setLoop(loop)
-    userInput.setMap(M=aggregateView, S=simpleView)
+    userInput.setMap(M=aggregateView, S=simpleView, N=nodeView, D=dcView, C=clusterView)
     try:
         liveData = livedata.LiveData(metricPatterns, interval, metric_source, ttl)
     except Exception as inst:
@@ -40,6 +45,9 @@ def fancyUserInterface(metricPatterns, interval, metric_source, ttl):
         sys.exit(1)
     liveData.addView(simpleView)
     liveData.addView(aggregateView)
+    liveData.addView(nodeView)
+    liveData.addView(dcView)
+    liveData.addView(clusterView)
     liveDataThread = threading.Thread(target=lambda: liveData.go(loop))
     liveDataThread.daemon = True
     liveDataThread.start()
@@ -51,7 +59,8 @@ def fancyUserInterface(metricPatterns, interval, metric_source, ttl):
 
 if __name__ == '__main__':
     description = '\n'.join(['A top-like tool for scylladb collectd/prometheus metrics.',
-                             'Keyboard shortcuts: S - simple view, M - aggregate over multiple cores, Q -quits',
+                             'Keyboard shortcuts: S - simple view, M - aggregate over multiple cores, N - aggregate per node,',
+                             '                    D - aggregate per DC, C - aggregate over the whole cluster, Q -quits',
                              '',
                              'By default it would work with the Prometheus API and does not require configuration.',
                              'For collectd, you need to configure the unix-sock plugin for collectd'
@@ -68,6 +77,9 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--interval', help="time resolution in seconds, default: 1", type=float, default=1)
     parser.add_argument('-s', '--socket', default='/var/run/collectd-unixsock', help="unixsock plugin to connect to, default: /var/run/collectd-unixsock")
     parser.add_argument('-p', '--prometheus-address', default='http://localhost:9180/metrics', help="The prometheus end-point")
+    parser.add_argument('-N', '--nodes', default=None,
+                        help="cluster mode - comma separated list of nodes to scrape concurrently, each one is a host, host:port or "
+                             "a prometheus end-point URL, optionally followed by @DC, e.g. 10.0.0.1@dc1,10.0.0.2@dc2")
     parser.add_argument('--print-config', action='store_true',
                         help="print out a configuration to put in your collectd.conf (you can use -s here to define the socket path)")
     parser.add_argument('-l', '--list', action='store_true',
@@ -80,6 +92,12 @@ if __name__ == '__main__':
     parser.add_argument('-F', '--fake', action='store_true', help="fake metric updates - this is for developers only")
     parser.add_argument('-n', '--iterations', type=int, default=None, help="Exit after a given number of iterations. This is only relevant if output is redirected")
     parser.add_argument('-b', '--batch', action='store_true', help="batch mode - dump metrics to stdout instead of using an interactive user session")
+    parser.add_argument('-r', '--record', metavar='FILE', default=None,
+                        help="record every snapshot, compressed, into FILE - all metrics are recorded, regardless of the metric patterns")
+    parser.add_argument('-R', '--replay', metavar='FILE', default=None,
+                        help="replay a recording made with --record instead of connecting to scylla")
+    parser.add_argument('--speed', type=float, default=1,
+                        help="replay speed, relative to the recording's pace, 0 replays as fast as possible (default=1)")
     parser.add_argument('-t', '--ttl', type=int, default=60, help="Keep absent metrics for ttl seconds (default=60)")
     arguments = parser.parse_args()
     stream_log = logging.StreamHandler()
@@ -103,15 +121,27 @@ if __name__ == '__main__':
 
     if arguments.fake:
         fake.fake()
-    if arguments.collectd:
+    if arguments.replay:
+        metric_source = recording.Replay(arguments.replay, arguments.speed)
+        # The replay keeps the recording's pace
+        arguments.interval = 0
+    elif arguments.nodes:
+        metric_source = cluster.Cluster(arguments.nodes.split(','), arguments.interval)
+    elif arguments.collectd:
         metric_source = collectd.Collectd(arguments.socket)
     else:
         metric_source = prometheus.Prometheus(arguments.prometheus_address)
+    if arguments.record:
+        metric_source = recording.Recorder(metric_source, arguments.record)
     if arguments.shell:
         shell()
         quit()
     if arguments.list:
-        pprint.pprint([m.symbol + m.help for m in metric.Metric.discover_with_help(metric_source).values()])
+        if not hasattr(metric_source, 'query_list'):
+            discovered = metric.Metric.discover(metric_source)
+        else:
+            discovered = metric.Metric.discover_with_help(metric_source)
+        pprint.pprint([m.symbol + m.help for m in discovered.values()])
         quit()
 
     logging.debug('arguments={} isatty={}'.format(arguments, sys.stdout.isatty()))
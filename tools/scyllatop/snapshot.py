@@ -0,0 +1,118 @@
+#
+# Copyright (C) 2026-present ScyllaDB
+#
+# SPDX-License-Identifier: LicenseRef-ScyllaDB-Source-Available-1.0
+#
+
+import re
+import time
+
+
+class Snapshot(object):
+    """The values of all metrics of a metric source, taken with a single scrape.
+
+    The scraped data is parsed once, into an index of symbol -> status,
+    where status is the same {key: value} dictionary Metric keeps, and an
+    index of metric name -> symbols of the series with that name.
+    Symbols are the series names with their labels, e.g.
+    scylla_reactor_utilization{shard="0"}.
+    """
+    _HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+    _LABEL_PATTERN = re.compile(r'(?P<key>[a-zA-Z_][a-zA-Z0-9_]*)="(?P<value>(?:[^"\\]|\\.)*)"')
+
+    def __init__(self, timestamp=None):
+        self._timestamp = time.time() if timestamp is None else timestamp
+        self._statuses = {}
+        self._labels = {}
+        self._byName = {}
+        self._help = {}
+        self._types = {}
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    def add(self, symbol, key, value):
+        status = self._statuses.get(symbol)
+        if status is None:
+            status = self._statuses[symbol] = {}
+            name, _, _ = symbol.partition('{')
+            self._byName.setdefault(name, []).append(symbol)
+        status[key] = value
+
+    def setHelp(self, name, hlp):
+        self._help[name] = hlp
+
+    def setType(self, name, kind):
+        self._types[name] = kind
+
+    def copyMetadata(self, other):
+        """Copy the help and type lines of the metrics of snapshot other."""
+        self._help.update(other._help)
+        self._types.update(other._types)
+
+    def filtered(self, accept):
+        """A snapshot of only the series whose symbols accept returns True for."""
+        result = Snapshot(self._timestamp)
+        result.copyMetadata(self)
+        for symbol, status in self._statuses.items():
+            if accept(symbol):
+                for key, value in status.items():
+                    result.add(symbol, key, value)
+        return result
+
+    def dump(self):
+        """The snapshot as a JSON serializable dictionary, see load()."""
+        return {'timestamp': self._timestamp, 'statuses': self._statuses, 'help': self._help, 'types': self._types}
+
+    @classmethod
+    def load(cls, data):
+        result = cls(data['timestamp'])
+        for symbol, status in data['statuses'].items():
+            for key, value in status.items():
+                result.add(symbol, key, value)
+        result._help.update(data.get('help', {}))
+        result._types.update(data.get('types', {}))
+        return result
+
+    def symbols(self):
+        return self._statuses.keys()
+
+    def status(self, symbol):
+        return self._statuses.get(symbol)
+
+    def byName(self, name):
+        return self._byName.get(name, [])
+
+    def names(self):
+        return self._byName.keys()
+
+    def help(self, symbol):
+        return self._help.get(self.name(symbol), '')
+
+    def type(self, symbol):
+        """The Prometheus type of the series, e.g. counter, gauge or histogram, or None."""
+        name = self.name(symbol)
+        kind = self._types.get(name)
+        if kind is None:
+            # The _bucket, _sum and _count series of a histogram are typed by its name
+            for suffix in self._HISTOGRAM_SUFFIXES:
+                if name.endswith(suffix):
+                    return self._types.get(name[:-len(suffix)])
+        return kind
+
+    def name(self, symbol):
+        return symbol.partition('{')[0]
+
+    def labels(self, symbol):
+        labels = self._labels.get(symbol)
+        if labels is None:
+            _, _, text = symbol.partition('{')
+            labels = self._labels[symbol] = {m.group('key'): m.group('value') for m in self._LABEL_PATTERN.finditer(text)}
+        return labels
+
+    def __contains__(self, symbol):
+        return symbol in self._statuses
+
+    def __len__(self):
+        return len(self._statuses)
@@ -2,27 +2,42 @@ from . import groups
 from . import table
 from . import base
 from . import helpers
+import histogram
 
 
 class Aggregate(base.Base):
+    """Aggregates the series of the same metric.
+
+    rollup is None to only aggregate the collectd cpu-N series, or one of
+    groups.ROLLUPS - 'shard', 'node', 'dc' or 'cluster' - to also merge the
+    Prometheus series which differ only by the labels below that level.
+    """
+    def __init__(self, rollup=None):
+        super().__init__()
+        self._rollup = rollup
+
     def update(self, liveData):
         self.clearScreen()
         self.writeStatusLine(liveData.measurements)
-        metricGroups = groups.Groups(liveData.measurements)
-        visible = metricGroups.all()
-        tableForm = self._prepareTable(visible)
+        # Histogram series are shown through their merged percentiles
+        measurements = [metric for metric in liveData.measurements if metric.kind != 'histogram']
+        metricGroups = groups.Groups(measurements, self._rollup)
+        histogramGroups = groups.Groups(liveData.histograms, self._rollup)
+        tableForm = self._prepareTable(metricGroups.all(), histogramGroups.all())
         for row in tableForm.rows():
             self.writeLine(row)
 
         self.refresh()
 
-    def _prepareTable(self, groups):
-        result = table.Table('lr')
+    def _prepareTable(self, groups, histogramGroups=()):
+        result = table.Table('lrrl')
         for group in groups:
             formatted = 'avg[{0}] tot[{1}]'.format(
                 helpers.formatValues(group.aggregate(self._mean)),
                 helpers.formatValues(group.aggregate(self._sum)))
-            result.add(self._label(group), formatted)
+            result.add(self._label(group), formatted, helpers.formatRate(group.rate), helpers.sparkline(group.history()))
+        for group in histogramGroups:
+            result.add(self._label(group), helpers.formatQuantiles(histogram.merge(group.metrics)), '', '')
         return result
 
     def _mean(self, values):
@@ -1,9 +1,22 @@
+import collections
+import math
 import re
 from . import mergeable
 
 
+# Labels dropped from the symbols of the series merged together by each
+# rollup level of the aggregate view.
+ROLLUPS = collections.OrderedDict([
+    ('shard', ()),
+    ('node', ('shard',)),
+    ('dc', ('shard', 'node')),
+    ('cluster', ('shard', 'node', 'dc')),
+])
+
+
 class Group(object):
     _HEAD_PATTERN = re.compile('^([^-]+)-\d+/')
+    _LABEL_PATTERN = re.compile(r'(?P<key>[a-zA-Z_][a-zA-Z0-9_]*)="(?:[^"\\]|\\.)*"')
 
     def __init__(self, label):
         self._label = label
@@ -19,17 +32,62 @@ class Group(object):
     def aggregate(self, mergeMethod):
         merger = mergeable.Mergeable(mergeMethod)
         for metric in self._metrics:
-            merger.add(metric.status)
+            merger.add(self._status(metric))
 
         return merger.merged()
 
+    @property
+    def rate(self):
+        """The total rate of the counters of the group, None if not available."""
+        rates = [metric.rate for metric in self._metrics if metric.rate is not None]
+        if not rates:
+            return None
+        return sum(rates)
+
+    def history(self):
+        """The element-wise total of the histories of the metrics of the group."""
+        total = None
+        for metric in self._metrics:
+            values = metric.history.values()
+            if total is None:
+                total = values
+                continue
+            for i, value in enumerate(values):
+                if math.isnan(total[i]):
+                    total[i] = value
+                elif not math.isnan(value):
+                    total[i] += value
+        return total if total is not None else []
+
+    def _status(self, metric):
+        # Prometheus series keep their value under their own symbol, which
+        # differs between the series merged into the group
+        status = metric.status
+        if metric.symbol in status:
+            status = dict(status)
+            status['value'] = status.pop(metric.symbol)
+        return status
+
     @property
     def label(self):
         return self._label
 
     @classmethod
-    def extractLabel(cls, metric):
-        return cls._HEAD_PATTERN.sub(r'\1-*/', metric.symbol)
+    def extractLabel(cls, metric, dropLabels=()):
+        label = cls._HEAD_PATTERN.sub(r'\1-*/', metric.symbol)
+        if dropLabels:
+            label = cls.dropLabels(label, dropLabels)
+        return label
+
+    @classmethod
+    def dropLabels(cls, symbol, dropLabels):
+        name, brace, labels = symbol.partition('{')
+        if not brace:
+            return symbol
+        kept = [m.group(0) for m in cls._LABEL_PATTERN.finditer(labels) if m.group('key') not in dropLabels]
+        if not kept:
+            return name
+        return '{}{{{}}}'.format(name, ','.join(kept))
 
     @property
     def size(self):
@@ -37,13 +95,14 @@ class Group(object):
 
 
 class Groups(object):
-    def __init__(self, measurements):
+    def __init__(self, measurements, rollup=None):
         self._groups = {}
+        self._dropLabels = ROLLUPS[rollup] if rollup is not None else ()
         self._load(measurements)
 
     def _load(self, measurements):
         for metric in measurements:
-            label = Group.extractLabel(metric)
+            label = Group.extractLabel(metric, self._dropLabels)
             self._groups.setdefault(label, Group(label))
             self._groups[label].add(metric)
 
@@ -1,3 +1,6 @@
+import math
+
+
 def _safeFormat(value):
     try:
         return '{value:.1f}'.format(value=float(value))
@@ -14,3 +17,35 @@ def formatValues(status):
         values.append('{key}: {value}'.format(key=key, value=_safeFormat(value)))
 
     return ' '.join(values)
+
+
+_SPARKS = '\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
+
+
+def sparkline(values):
+    """Draw values as a line of block characters, a space for each missing (NaN) value."""
+    valid = [value for value in values if not math.isnan(value)]
+    if not valid:
+        return ' ' * len(values)
+    low = min(valid)
+    span = max(valid) - low
+    line = []
+    for value in values:
+        if math.isnan(value):
+            line.append(' ')
+        elif span == 0:
+            line.append(_SPARKS[0])
+        else:
+            line.append(_SPARKS[int((value - low) / span * (len(_SPARKS) - 1))])
+    return ''.join(line)
+
+
+def formatRate(rate):
+    if rate is None:
+        return ''
+    return '{rate:.1f}/s'.format(rate=rate)
+
+
+def formatQuantiles(quantiles):
+    return ' '.join('p{q:g}: {value}'.format(q=q * 100, value='-' if value is None else _safeFormat(value))
+                    for q, value in sorted(quantiles.items()))
@@ -7,13 +7,20 @@ class Simple(base.Base):
     def update(self, liveData):
         self.clearScreen()
         self.writeStatusLine(liveData.measurements)
-        tableForm = self._prepareTable(liveData.measurements)
+        tableForm = self._prepareTable(liveData.measurements, liveData.histograms)
         for row in tableForm.rows():
             self.writeLine(row)
         self.refresh()
 
-    def _prepareTable(self, measurements):
-        result = table.Table('lr')
+    def _prepareTable(self, measurements, histograms=()):
+        result = table.Table('lrrl')
         for metric in measurements:
-            result.add(metric.symbol, helpers.formatValues(metric.status))
+            # Histogram series are shown through their percentiles below
+            if metric.kind == 'histogram':
+                continue
+            result.add(metric.symbol, helpers.formatValues(metric.status),
+                       helpers.formatRate(metric.rate), helpers.sparkline(metric.history.values()))
+        for histogram in histograms:
+            result.add(histogram.symbol, helpers.formatQuantiles(histogram.quantiles),
+                       '', helpers.sparkline(histogram.history.values()))
         return result